@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.core.config import settings
+from app.models.bus_alert import BusAlert
+from app.schemas.alerts import AlertChangeOut, AlertOut
+from app.services.alerts import alert_engine, open_alerts_from_db
+
+router = APIRouter(prefix="/alerts", tags=["alerts"])
+
+
+def _active_alerts(db: Session, bus_id: int | None = None) -> list[AlertOut]:
+    alerts = alert_engine.active(bus_id) if settings.ALERTS_ENABLED else open_alerts_from_db(db, bus_id)
+    alerts.sort(key=lambda alert: alert.raised_at)
+    return [AlertOut(**alert.as_dict()) for alert in alerts]
+
+
+@router.get("/active", response_model=list[AlertOut])
+def get_active_alerts(
+    bus_id: int | None = None,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    return _active_alerts(db, bus_id)
+
+
+@router.get("/history", response_model=list[AlertOut])
+def get_alert_history(
+    bus_id: int | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    query = db.query(BusAlert)
+    if bus_id is not None:
+        query = query.filter(BusAlert.bus_id == bus_id)
+    return query.order_by(BusAlert.raised_at.desc()).limit(limit).all()
+
+
+@router.get("/stream")
+async def stream_alert_changes(
+    after: int | None = Query(default=None, ge=0),
+    last_event_id: str | None = Header(default=None),
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Server-Sent Events con los cambios de alertas (solo transiciones). Al
+    conectar sin posición, o si la posición ya salió del feed, se envía
+    primero un evento ``snapshot`` con las alertas activas. Reconectar con
+    ``Last-Event-ID`` (o ``after``) retoma desde el último cambio recibido.
+    """
+    if after is None and last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+
+    def snapshot_event(seq: int) -> str:
+        alerts = [alert.model_dump(mode="json") for alert in _active_alerts(db)]
+        return f"id: {seq}\nevent: snapshot\ndata: {json.dumps(alerts)}\n\n"
+
+    async def events():
+        seq = after
+        if seq is None:
+            seq = alert_engine.last_seq
+            yield snapshot_event(seq)
+        idle = 0.0
+        while True:
+            latest, changes = alert_engine.changes_since(seq)
+            if changes is None:
+                seq = latest
+                yield snapshot_event(seq)
+            elif changes:
+                idle = 0.0
+                for change in changes:
+                    yield f"id: {change['seq']}\ndata: {AlertChangeOut(**change).model_dump_json()}\n\n"
+                seq = latest
+            elif idle >= 15:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(settings.ALERT_STREAM_POLL_SECONDS)
+            idle += settings.ALERT_STREAM_POLL_SECONDS
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
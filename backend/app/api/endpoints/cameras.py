@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.models.bus import Bus
+from app.models.bus_camera import BusCamera
+from app.schemas.camera import BusCameraCreate, BusCameraOut, BusCameraUpdate
+
+router = APIRouter(tags=["cameras"])
+
+
+def _validate_region(crop, mask_polygons, inference_imgsz) -> None:
+    if crop is not None:
+        if len(crop) != 4 or not all(0.0 <= v <= 1.0 for v in crop):
+            raise HTTPException(status_code=400, detail="crop debe ser [x1, y1, x2, y2] en 0..1")
+        if crop[0] >= crop[2] or crop[1] >= crop[3]:
+            raise HTTPException(status_code=400, detail="crop debe cumplir x1 < x2 e y1 < y2")
+    for polygon in mask_polygons or []:
+        if len(polygon) < 3 or any(len(p) != 2 for p in polygon):
+            raise HTTPException(status_code=400, detail="Cada polígono necesita al menos 3 puntos [x, y]")
+    if inference_imgsz is not None and (
+        inference_imgsz < 64 or inference_imgsz > 1920 or inference_imgsz % 32 != 0
+    ):
+        raise HTTPException(
+            status_code=400, detail="inference_imgsz debe ser múltiplo de 32 entre 64 y 1920"
+        )
+
+
+def _camera_out(camera: BusCamera) -> BusCameraOut:
+    return BusCameraOut(
+        id=camera.id,
+        bus_id=camera.bus_id,
+        name=camera.name,
+        is_default=bool(camera.is_default),
+        crop=camera.crop_json,
+        mask_polygons=camera.mask_polygons_json,
+        inference_imgsz=camera.inference_imgsz,
+        created_at=camera.created_at,
+        updated_at=camera.updated_at,
+    )
+
+
+def _clear_other_defaults(db: Session, camera: BusCamera) -> None:
+    db.query(BusCamera).filter(
+        BusCamera.bus_id == camera.bus_id, BusCamera.id != camera.id
+    ).update({BusCamera.is_default: False})
+
+
+@router.get("/buses/{bus_id}/cameras", response_model=list[BusCameraOut])
+def list_bus_cameras(
+    bus_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    cameras = db.query(BusCamera).filter(BusCamera.bus_id == bus_id).order_by(BusCamera.id).all()
+    return [_camera_out(camera) for camera in cameras]
+
+
+@router.post("/buses/{bus_id}/cameras", response_model=BusCameraOut)
+def create_bus_camera(
+    bus_id: int,
+    camera_in: BusCameraCreate,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    if not db.query(Bus).filter(Bus.id == bus_id).first():
+        raise HTTPException(status_code=404, detail="Bus not found")
+    _validate_region(camera_in.crop, camera_in.mask_polygons, camera_in.inference_imgsz)
+
+    camera = BusCamera(
+        bus_id=bus_id,
+        name=camera_in.name,
+        is_default=camera_in.is_default,
+        crop_json=camera_in.crop,
+        mask_polygons_json=camera_in.mask_polygons,
+        inference_imgsz=camera_in.inference_imgsz,
+    )
+    db.add(camera)
+    db.flush()
+    if camera.is_default:
+        _clear_other_defaults(db, camera)
+    db.commit()
+    db.refresh(camera)
+    return _camera_out(camera)
+
+
+@router.put("/cameras/{camera_id}", response_model=BusCameraOut)
+def update_bus_camera(
+    camera_id: int,
+    camera_in: BusCameraUpdate,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    camera = db.query(BusCamera).filter(BusCamera.id == camera_id).first()
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+    data = camera_in.model_dump(exclude_unset=True)
+    _validate_region(data.get("crop"), data.get("mask_polygons"), data.get("inference_imgsz"))
+    if "name" in data:
+        camera.name = data["name"]
+    if "is_default" in data:
+        camera.is_default = data["is_default"]
+    if "crop" in data:
+        camera.crop_json = data["crop"]
+    if "mask_polygons" in data:
+        camera.mask_polygons_json = data["mask_polygons"]
+    if "inference_imgsz" in data:
+        camera.inference_imgsz = data["inference_imgsz"]
+    if camera.is_default:
+        _clear_other_defaults(db, camera)
+    db.commit()
+    db.refresh(camera)
+    return _camera_out(camera)
+
+
+@router.delete("/cameras/{camera_id}")
+def delete_bus_camera(
+    camera_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    camera = db.query(BusCamera).filter(BusCamera.id == camera_id).first()
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    db.delete(camera)
+    db.commit()
+    return {"status": "ok"}
@@ -1,25 +1,27 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.config import settings
 from app.models.bus_state import BusState
 from app.models.bus import Bus
 from app.models.route import Route
-from app.schemas.dashboard import BusStateOut
+from app.schemas.dashboard import BusNearbyOut, BusStateOut, RouteStateOut
+from app.services import geo_index, route_aggregates
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
-@router.get("/buses/state", response_model=list[BusStateOut])
-def get_buses_state(
-    db: Session = Depends(deps.get_db),
-    current_user=Depends(deps.get_current_user),
-):
+def _bus_states(db: Session, bus_ids: list[int] | None = None) -> list[BusStateOut]:
     query = (
         db.query(BusState, Bus, Route)
         .join(Bus, BusState.bus_id == Bus.id)
         .outerjoin(Route, BusState.route_id == Route.id)
     )
+    if bus_ids is not None:
+        if not bus_ids:
+            return []
+        query = query.filter(BusState.bus_id.in_(bus_ids))
 
     results: list[BusStateOut] = []
     for state, bus, route in query:
@@ -38,3 +40,116 @@ def get_buses_state(
         )
 
     return results
+
+
+def _with_distances(db: Session, matches: list[tuple[int, float]]) -> list[BusNearbyOut]:
+    states = {state.bus_id: state for state in _bus_states(db, [bus_id for bus_id, _ in matches])}
+    return [
+        BusNearbyOut(**states[bus_id].model_dump(), distance_km=distance)
+        for bus_id, distance in matches
+        if bus_id in states
+    ]
+
+
+@router.get("/buses/state", response_model=list[BusStateOut])
+def get_buses_state(
+    min_lat: float | None = Query(default=None, ge=-90, le=90),
+    min_lon: float | None = Query(default=None, ge=-180, le=180),
+    max_lat: float | None = Query(default=None, ge=-90, le=90),
+    max_lon: float | None = Query(default=None, ge=-180, le=180),
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Estado en vivo de la flota. Con una caja (min_lat, min_lon, max_lat,
+    max_lon) devuelve solo los buses dentro del área visible del mapa.
+    """
+    bbox = (min_lat, min_lon, max_lat, max_lon)
+    if all(value is None for value in bbox):
+        return _bus_states(db)
+    if any(value is None for value in bbox):
+        raise HTTPException(status_code=400, detail="La caja requiere min_lat, min_lon, max_lat y max_lon")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="Caja inválida: mínimos mayores que máximos")
+
+    if geo_index.use_index():
+        bus_ids = geo_index.bus_positions.within_bbox(*bbox)
+    else:
+        bus_ids = geo_index.db_within_bbox(db, *bbox)
+    return _bus_states(db, bus_ids)
+
+
+@router.get("/buses/nearby", response_model=list[BusNearbyOut])
+def get_buses_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0, le=100),
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """Buses a menos de ``radius_km`` del punto, del más cercano al más lejano."""
+    if geo_index.use_index():
+        matches = geo_index.bus_positions.within_radius(lat, lon, radius_km)
+    else:
+        matches = geo_index.db_within_radius(db, lat, lon, radius_km)
+    return _with_distances(db, matches)
+
+
+@router.get("/buses/nearest", response_model=list[BusNearbyOut])
+def get_buses_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(default=5, ge=1),
+    max_km: float | None = Query(default=None, gt=0),
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """Los ``k`` buses más cercanos al punto (opcionalmente sin pasar de ``max_km``)."""
+    k = min(k, settings.GEO_NEAREST_MAX_RESULTS)
+    if geo_index.use_index():
+        matches = geo_index.bus_positions.nearest(lat, lon, k, max_km)
+    else:
+        matches = geo_index.db_nearest(db, lat, lon, k, max_km)
+    return _with_distances(db, matches)
+
+
+def _route_states(db: Session, route_id: int | None = None) -> list[RouteStateOut]:
+    if route_aggregates.use_aggregates():
+        aggregates = route_aggregates.route_aggregates.snapshot(route_id)
+    else:
+        aggregates = route_aggregates.db_route_aggregates(db, route_id)
+    route_ids = [item["route_id"] for item in aggregates if item["route_id"] is not None]
+    routes = {route.id: route for route in db.query(Route).filter(Route.id.in_(route_ids))} if route_ids else {}
+    results: list[RouteStateOut] = []
+    for item in aggregates:
+        route = routes.get(item["route_id"])
+        results.append(
+            RouteStateOut(
+                **item,
+                route_code=route.code if route else None,
+                route_name=route.name if route else None,
+            )
+        )
+    results.sort(key=lambda state: (state.route_code is None, state.route_code or ""))
+    return results
+
+
+@router.get("/routes/state", response_model=list[RouteStateOut])
+def get_routes_state(
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """Carga agregada por ruta (en memoria; se recalcula desde BD si está desactivado)."""
+    return _route_states(db)
+
+
+@router.get("/routes/{route_id}/state", response_model=RouteStateOut)
+def get_route_state(
+    route_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    states = _route_states(db, route_id)
+    if not states:
+        raise HTTPException(status_code=404, detail="Ruta sin buses en servicio")
+    return states[0]
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api import deps
+from app.schemas.metrics import ProfilingState
+from app.services import metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/metrics/profiling", response_model=ProfilingState)
+def get_profiling(current_user=Depends(deps.get_current_user)):
+    return ProfilingState(enabled=metrics.profiling_enabled())
+
+
+@router.put("/metrics/profiling", response_model=ProfilingState)
+def set_profiling(
+    state: ProfilingState,
+    current_user=Depends(deps.get_current_admin),
+):
+    metrics.set_profiling(state.enabled)
+    return ProfilingState(enabled=metrics.profiling_enabled())
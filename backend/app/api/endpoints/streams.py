@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.models.bus import Bus
+from app.schemas.streams import LiveStreamCreate, LiveStreamOut
+from app.services.live_streams import LiveStreamError, live_stream_manager
+from app.services.roi import load_inference_region
+
+router = APIRouter(prefix="/streams", tags=["streams"])
+
+
+@router.post("/", response_model=LiveStreamOut)
+def start_live_stream(
+    stream_in: LiveStreamCreate,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_admin),
+):
+    """Solo administradores: el servidor abre el origen indicado (ver ``check_source``)."""
+    if db.query(Bus.id).filter(Bus.id == stream_in.bus_id).first() is None:
+        raise HTTPException(status_code=404, detail="Bus not found")
+    region = load_inference_region(db, bus_id=stream_in.bus_id, camera_id=stream_in.camera_id)
+    if stream_in.camera_id is not None and region is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    try:
+        stream = live_stream_manager.start_stream(
+            bus_id=stream_in.bus_id,
+            source=stream_in.source,
+            route_id=stream_in.route_id,
+            realtime=stream_in.realtime,
+            loop=stream_in.loop,
+            region=region,
+        )
+    except LiveStreamError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return stream.describe()
+
+
+@router.get("/", response_model=list[LiveStreamOut])
+def list_live_streams(current_user=Depends(deps.get_current_user)):
+    return [stream.describe() for stream in live_stream_manager.list()]
+
+
+@router.get("/{stream_id}", response_model=LiveStreamOut)
+def get_live_stream(stream_id: str, current_user=Depends(deps.get_current_user)):
+    stream = live_stream_manager.get(stream_id)
+    if not stream:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return stream.describe()
+
+
+@router.delete("/{stream_id}", response_model=LiveStreamOut)
+def stop_live_stream(stream_id: str, current_user=Depends(deps.get_current_user)):
+    stream = live_stream_manager.stop_stream(stream_id)
+    if not stream:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return stream.describe()
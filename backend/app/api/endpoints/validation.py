@@ -1,25 +1,64 @@
+import asyncio
 import os
-import tempfile
 from datetime import datetime
 from typing import Any
 from fastapi import Request
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api import deps
-from app.models.validation import ValidationSession, ValidationFrameStat
+from app.models.validation import ValidationSession, ValidationFrameStat, ValidationOccupancyInterval
 from app.schemas.validation import (
     ValidationSessionCreate,
     ValidationSessionOut,
     ValidationFrameStatOut,
+    ChunkedUploadCreate,
+    ChunkedUploadStatus,
+    ProcessingProgressOut,
+    OccupancyIntervalOut,
 )
 from app.services.video_processing import (
     process_video_with_yolo,
     process_and_persist_validation_session,
 )
+from app.core.config import settings
+from app.services import chunked_uploads
+from app.services.media_delivery import hls_dir_for, media_path_for, media_url_for
+from app.services.occupancy_intervals import OVER_CAPACITY, THRESHOLD
+from app.services.processing_progress import ProgressStore, processing_progress
+from app.services.serialization import negotiated_response, pack_timeline, rows_response
+from app.services.uploads import (
+    MultipartUploadError,
+    UploadTooLargeError,
+    check_content_length,
+    receive_multipart_upload,
+    remove_quietly,
+    safe_filename,
+    temp_upload_path,
+)
 
 router = APIRouter(prefix="/validation", tags=["validation"])
 
+
+def _multipart_body(**fields: dict) -> dict:
+    """
+    ``requestBody`` para OpenAPI de los endpoints que leen el multipart en
+    streaming (no declaran parámetros ``File``/``Form``).
+    """
+    properties = {"file": {"type": "string", "format": "binary"}, **fields}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {"type": "object", "required": ["file"], "properties": properties}
+                }
+            },
+        }
+    }
+
 def _build_public_media_url(path: str | None, request: Request) -> str | None:
     if not path:
         return None
@@ -29,6 +68,14 @@ def _build_public_media_url(path: str | None, request: Request) -> str | None:
     return f"{base}{path}"
 
 
+def _hls_playlist_url(processed_video_path: str | None) -> str | None:
+    local_path = media_path_for(processed_video_path)
+    if not local_path:
+        return None
+    playlist = os.path.join(hls_dir_for(local_path), "index.m3u8")
+    return media_url_for(playlist) if os.path.exists(playlist) else None
+
+
 def _include_media_urls(session: ValidationSession, request: Request) -> ValidationSession:
     session.processed_video_url = _build_public_media_url(
         session.processed_video_path, request
@@ -36,6 +83,9 @@ def _include_media_urls(session: ValidationSession, request: Request) -> Validat
     session.original_video_url = _build_public_media_url(
         session.original_video_path, request
     )
+    session.processed_video_hls_url = _build_public_media_url(
+        _hls_playlist_url(session.processed_video_path), request
+    )
     return session
 
 
@@ -89,46 +139,228 @@ def get_validation_session(
     return _include_media_urls(session, request)
 
 
+def _session_progress(db: Session, session_id: int) -> ProcessingProgressOut:
+    """
+    Progreso desde el store en memoria; si no está (sesión no procesada en
+    este proceso o ya purgada) se leen solo tres columnas, sin cargar la
+    sesión con sus relaciones.
+    """
+    snapshot = processing_progress.get(session_id)
+    if snapshot is not None:
+        return ProcessingProgressOut(session_id=session_id, live=True, **snapshot)
+
+    row = (
+        db.query(
+            ValidationSession.status,
+            ValidationSession.total_frames,
+            ValidationSession.detected_max_occupancy,
+        )
+        .filter(ValidationSession.id == session_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    completed = row.status == "COMPLETED"
+    return ProcessingProgressOut(
+        session_id=session_id,
+        status=row.status,
+        frames_done=(row.total_frames or 0) if completed else 0,
+        total_frames=row.total_frames,
+        percent=100.0 if completed else None,
+        peak_count=row.detected_max_occupancy,
+    )
+
+
+@router.get("/sessions/{session_id}/progress", response_model=ProcessingProgressOut)
+def get_validation_progress(
+    session_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    return _session_progress(db, session_id)
+
+
+@router.get("/sessions/{session_id}/progress/stream")
+async def stream_validation_progress(
+    session_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Server-Sent Events con el progreso: un evento por cada cambio publicado
+    y cierre al terminar (COMPLETED / FAILED).
+    """
+    initial = _session_progress(db, session_id)
+
+    async def events():
+        progress, version, last_version = initial, None, -1
+        idle = 0.0
+        while True:
+            if version != last_version:
+                last_version, idle = version, 0.0
+                yield f"data: {progress.model_dump_json()}\n\n"
+            elif idle >= 15:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            # Sin progreso en memoria (otro nodo o ya purgado) basta con un evento
+            if not progress.live or progress.status in ProgressStore.FINAL_STATUSES:
+                return
+            await asyncio.sleep(settings.PROGRESS_STREAM_POLL_SECONDS)
+            idle += settings.PROGRESS_STREAM_POLL_SECONDS
+            snapshot = processing_progress.get(session_id)
+            if snapshot is not None:
+                version = snapshot["version"]
+                progress = ProcessingProgressOut(session_id=session_id, live=True, **snapshot)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/sessions/{session_id}/frame-stats", response_model=list[ValidationFrameStatOut])
 def get_validation_frame_stats(
     session_id: int,
+    request: Request,
     db: Session = Depends(deps.get_db),
     current_user=Depends(deps.get_current_user),
 ):
-    stats = (
-        db.query(ValidationFrameStat)
+    """
+    Estadísticas por frame. Se leen columnas sueltas y se serializan sin pasar
+    por ``ValidationFrameStatOut`` fila a fila (ver ``services.serialization``
+    para los formatos disponibles).
+    """
+    columns = list(ValidationFrameStatOut.model_fields)
+    rows = (
+        db.query(*(getattr(ValidationFrameStat, name) for name in columns))
         .filter(ValidationFrameStat.validation_session_id == session_id)
         .order_by(ValidationFrameStat.timestamp_relative)
         .all()
     )
-    return stats
+    return rows_response(request, columns, rows)
 
 
-@router.post("/sessions/{session_id}/upload-video", response_model=ValidationSessionOut)
+@router.get("/intervals/search", response_model=list[OccupancyIntervalOut])
+def search_occupancy_intervals(
+    request: Request,
+    min_count: int | None = Query(default=None, ge=1),
+    over_capacity: bool = False,
+    bus_id: int | None = None,
+    session_id: int | None = None,
+    min_duration: float | None = Query(default=None, ge=0),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Busca entre todas las sesiones los tramos con conteo >= ``min_count`` o
+    sobre la capacidad declarada (``over_capacity``; con ``min_count`` se
+    quedan los tramos cuyo pico lo alcanza). Usa el índice de intervalos, no
+    los frames; cada resultado enlaza al momento del video procesado.
+    """
+    if min_count is None and not over_capacity:
+        raise HTTPException(status_code=400, detail="Indica min_count u over_capacity")
+
+    Interval = ValidationOccupancyInterval
+    query = db.query(
+        Interval,
+        ValidationSession.processed_video_path,
+        ValidationSession.max_capacity_declared,
+        ValidationSession.created_at,
+    ).join(ValidationSession, Interval.validation_session_id == ValidationSession.id)
+    if over_capacity:
+        query = query.filter(Interval.kind == OVER_CAPACITY)
+        if min_count is not None:
+            query = query.filter(Interval.peak_count >= min_count)
+    else:
+        query = query.filter(Interval.kind == THRESHOLD, Interval.threshold == min_count)
+    if bus_id is not None:
+        query = query.filter(Interval.bus_id == bus_id)
+    if session_id is not None:
+        query = query.filter(Interval.validation_session_id == session_id)
+    if min_duration is not None:
+        query = query.filter(Interval.end_time - Interval.start_time >= min_duration)
+    if since is not None:
+        query = query.filter(ValidationSession.created_at >= since)
+    if until is not None:
+        query = query.filter(ValidationSession.created_at < until)
+
+    rows = (
+        query.order_by(Interval.peak_count.desc(), Interval.validation_session_id, Interval.start_time)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    results: list[OccupancyIntervalOut] = []
+    for interval, video_path, max_capacity, created_at in rows:
+        video_url = _build_public_media_url(video_path, request)
+        fragment = f"t={interval.start_time:.2f}"
+        if interval.end_time > interval.start_time:
+            fragment += f",{interval.end_time:.2f}"
+        results.append(
+            OccupancyIntervalOut(
+                id=interval.id,
+                session_id=interval.validation_session_id,
+                bus_id=interval.bus_id,
+                kind=interval.kind,
+                threshold=interval.threshold,
+                start_time=interval.start_time,
+                end_time=interval.end_time,
+                duration_seconds=interval.end_time - interval.start_time,
+                start_frame=interval.start_frame,
+                end_frame=interval.end_frame,
+                peak_count=interval.peak_count,
+                peak_time=interval.peak_time,
+                max_capacity_declared=max_capacity,
+                session_created_at=created_at,
+                processed_video_url=video_url,
+                # Media Fragments: el reproductor arranca en el inicio del tramo
+                video_timestamp_url=f"{video_url}#{fragment}" if video_url else None,
+            )
+        )
+    return results
+
+
+@router.post(
+    "/sessions/{session_id}/upload-video",
+    response_model=ValidationSessionOut,
+    openapi_extra=_multipart_body(),
+)
 async def upload_validation_video(
     session_id: int,
-    file: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(deps.get_db),
     current_user=Depends(deps.get_current_user),
-    request: Request = None,
-
 ):
-    session = db.query(ValidationSession).filter(ValidationSession.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    """Recibe el video (campo ``file``) escribiéndolo en disco según llega y lo procesa."""
+    session = _get_session_or_404(db, session_id)
+    session_dir = os.path.join(settings.MEDIA_ROOT, "validation", str(session_id))
 
-    session_dir = os.path.join("media", "validation", str(session_id))
-    os.makedirs(session_dir, exist_ok=True)
-    original_path = os.path.join(session_dir, file.filename)
+    try:
+        check_content_length(request)
+        upload = await receive_multipart_upload(
+            request, lambda filename: os.path.join(session_dir, safe_filename(filename))
+        )
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    except MultipartUploadError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    with open(original_path, "wb") as destination:
-        while True:
-            chunk = await file.read(1024 * 1024)
-            if not chunk:
-                break
-            destination.write(chunk)
+    return await _process_session_video(db, session, upload.path, os.path.basename(upload.path), request)
 
-    session.original_video_path = f"/media/validation/{session_id}/{file.filename}"
+
+async def _process_session_video(
+    db: Session,
+    session: ValidationSession,
+    original_path: str,
+    filename: str,
+    request: Request,
+) -> ValidationSession:
+    session.original_video_path = f"/media/validation/{session.id}/{filename}"
     session.status = "PROCESSING"
     session.processing_started_at = datetime.utcnow()
     db.add(session)
@@ -136,8 +368,12 @@ async def upload_validation_video(
     db.refresh(session)
 
     try:
-        process_and_persist_validation_session(
-            db, session, original_path, max_capacity=session.max_capacity_declared
+        await run_in_threadpool(
+            process_and_persist_validation_session,
+            db,
+            session,
+            original_path,
+            max_capacity=session.max_capacity_declared,
         )
     except Exception as exc:
         session.status = "FAILED"
@@ -150,34 +386,138 @@ async def upload_validation_video(
     return _include_media_urls(session, request)
 
 
-@router.post("/process-video")
+def _get_session_or_404(db: Session, session_id: int) -> ValidationSession:
+    session = db.query(ValidationSession).filter(ValidationSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+def _load_manifest_or_404(session_id: int, upload_id: str) -> dict:
+    try:
+        return chunked_uploads.load_manifest(session_id, upload_id)
+    except chunked_uploads.ChunkedUploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+@router.post("/sessions/{session_id}/uploads", response_model=ChunkedUploadStatus)
+def initiate_chunked_upload(
+    session_id: int,
+    upload_in: ChunkedUploadCreate,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Inicia una subida reanudable. El cliente envía luego cada parte con
+    ``PUT .../chunks/{index}`` y el header ``X-Chunk-SHA256``.
+    """
+    _get_session_or_404(db, session_id)
+    try:
+        manifest = chunked_uploads.create_upload(
+            session_id,
+            upload_in.filename,
+            upload_in.total_size,
+            chunk_size=upload_in.chunk_size,
+            sha256=upload_in.sha256,
+        )
+    except chunked_uploads.ChunkedUploadError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return chunked_uploads.describe_upload(manifest)
+
+
+@router.get("/sessions/{session_id}/uploads/{upload_id}", response_model=ChunkedUploadStatus)
+def get_chunked_upload_status(
+    session_id: int,
+    upload_id: str,
+    current_user=Depends(deps.get_current_user),
+):
+    manifest = _load_manifest_or_404(session_id, upload_id)
+    return chunked_uploads.describe_upload(manifest)
+
+
+@router.put(
+    "/sessions/{session_id}/uploads/{upload_id}/chunks/{index}",
+    response_model=ChunkedUploadStatus,
+)
+async def upload_video_chunk(
+    session_id: int,
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: str | None = Header(None),
+    current_user=Depends(deps.get_current_user),
+):
+    """Recibe el cuerpo crudo de una parte y lo escribe a disco en streaming."""
+    manifest = _load_manifest_or_404(session_id, upload_id)
+    try:
+        return await chunked_uploads.store_chunk(
+            manifest, index, request.stream(), x_chunk_sha256
+        )
+    except (chunked_uploads.ChunkedUploadError, UploadTooLargeError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post(
+    "/sessions/{session_id}/uploads/{upload_id}/finalize",
+    response_model=ValidationSessionOut,
+)
+async def finalize_chunked_upload(
+    session_id: int,
+    upload_id: str,
+    db: Session = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+    request: Request = None,
+):
+    """Ensambla las partes y, solo si todo cuadra, lanza el procesamiento."""
+    session = _get_session_or_404(db, session_id)
+    manifest = _load_manifest_or_404(session_id, upload_id)
+    try:
+        original_path = await run_in_threadpool(chunked_uploads.assemble_upload, manifest)
+    except chunked_uploads.ChunkedUploadError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+    return await _process_session_video(
+        db, session, original_path, manifest["filename"], request
+    )
+
+
+@router.post(
+    "/process-video",
+    openapi_extra=_multipart_body(max_capacity={"type": "integer", "default": 50}),
+)
 async def process_validation_video(
-    file: UploadFile = File(...),
-    max_capacity: int = Form(50),
+    request: Request,
     current_user=Depends(deps.get_current_user),
 ) -> Any:
     """
-    Recibe un video, lo procesa con YOLO y devuelve:
+    Recibe un video (campo ``file``, y ``max_capacity`` opcional), lo procesa
+    con YOLO y devuelve:
       - video_url (ruta accesible en /media/...)
       - métricas globales
       - timeline de detecciones
     (por ahora NO guarda nada en BD; eso lo hacemos luego)
     """
+    tmp_path = None
     try:
-        suffix = os.path.splitext(file.filename)[1] or ".mp4"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
-        result = process_video_with_yolo(tmp_path, max_capacity=max_capacity)
-
-        # limpiar archivo temporal
+        check_content_length(request)
+        upload = await receive_multipart_upload(request, temp_upload_path)
+        tmp_path = upload.path
         try:
-            os.unlink(tmp_path)
-        except OSError:
-            pass
-
-        return result
+            max_capacity = int(upload.fields.get("max_capacity") or 50)
+        except ValueError:
+            raise MultipartUploadError("max_capacity debe ser un entero")
+        result = await run_in_threadpool(
+            process_video_with_yolo, tmp_path, max_capacity=max_capacity
+        )
+        # El timeline puede pesar decenas de MB: serializar fuera del event loop
+        return await run_in_threadpool(negotiated_response, request, result, pack_timeline)
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    except MultipartUploadError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     except Exception as e:
         print(f"[ERROR] procesando video: {e}")
         raise HTTPException(status_code=500, detail="Error procesando video")
+    finally:
+        # limpiar archivo temporal
+        remove_quietly(tmp_path)
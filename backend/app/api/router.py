@@ -7,6 +7,9 @@ from app.api.endpoints import (
     dashboard,
     occupancy_events,
     health,
+    streams,
+    cameras,
+    alerts,
 )
 
 api_router = APIRouter()
@@ -16,3 +19,6 @@ api_router.include_router(validation.router)
 api_router.include_router(dashboard.router)
 api_router.include_router(occupancy_events.router)
 api_router.include_router(health.router)
+api_router.include_router(streams.router)
+api_router.include_router(cameras.router)
+api_router.include_router(alerts.router)
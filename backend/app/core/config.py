@@ -22,6 +22,118 @@ class Settings(BaseSettings):
     # Redis (para caching tiempo real)
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Media y subidas de video
+    MEDIA_ROOT: str = "media"
+    UPLOAD_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 2 GiB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1 MiB
+    UPLOAD_TMP_DIR: str = "data/uploads/tmp"  # subidas en curso (fuera de MEDIA_ROOT, no público)
+    UPLOAD_STAGING_DIR: str = "data/uploads"  # partes de subidas por partes (fuera de MEDIA_ROOT, no público)
+    UPLOAD_CHUNKED_DEFAULT_CHUNK_SIZE: int = 8 * 1024 * 1024  # 8 MiB
+    UPLOAD_CHUNKED_MAX_CHUNK_SIZE: int = 64 * 1024 * 1024  # 64 MiB
+
+    # Entrega de videos procesados
+    MEDIA_FASTSTART_ENABLED: bool = True
+    MEDIA_HLS_ENABLED: bool = False  # requiere ffmpeg
+    MEDIA_HLS_SEGMENT_SECONDS: int = 4
+    MEDIA_CACHE_MAX_AGE: int = 3600  # segundos, solo processed_videos/; se revalida con ETag
+    FFMPEG_BINARY: str = "ffmpeg"
+
+    # Streams en vivo (RTSP / archivos a velocidad real)
+    LIVE_MAX_STREAMS: int = 16
+    LIVE_INFERENCE_TOTAL_FPS: float = 8.0  # presupuesto total del nodo
+    LIVE_INFERENCE_MAX_CONCURRENT: int = 1
+    LIVE_INFERENCE_MAX_FPS_PER_STREAM: float = 2.0
+    LIVE_FRAME_BUFFER_SIZE: int = 2
+    LIVE_MAX_FRAME_AGE_SECONDS: float = 2.0
+    LIVE_SMOOTHING_WINDOW: int = 5
+    LIVE_EMIT_HEARTBEAT_SECONDS: float = 30.0
+    LIVE_RECONNECT_MAX_SECONDS: float = 30.0
+    # Orígenes permitidos (el servidor los abre con OpenCV/FFmpeg). Vacío = ninguno
+    LIVE_ALLOWED_SCHEMES: list[str] = ["rtsp", "rtsps", "rtmp", "http", "https"]
+    LIVE_ALLOWED_HOSTS: list[str] = []  # CIDR ("10.20.0.0/16") o nombre con comodines ("*.camaras.local")
+    LIVE_ALLOWED_FILE_DIRS: list[str] = []  # directorios de videos locales
+
+    # Planificador de inferencia por lotes (compartido por streams y validación)
+    INFERENCE_BATCHING_ENABLED: bool = False
+    INFERENCE_MAX_BATCH_SIZE: int = 8
+    INFERENCE_MAX_LATENCY_SECONDS: float = 0.05
+    INFERENCE_MAX_QUEUE_PER_SOURCE: int = 16
+
+    # Tracking temporal y suavizado de conteos
+    TRACKING_ENABLED: bool = False
+    TRACKING_STRIDE: int = 1  # inferir 1 de cada N frames (solo con tracking)
+    TRACKING_HIGH_CONF: float = 0.5
+    TRACKING_MATCH_IOU: float = 0.3
+    TRACKING_MIN_HITS: int = 3
+    TRACKING_MAX_AGE_FRAMES: int = 30
+    TRACKING_DOOR_LINE: float | None = None  # fracción de la altura; None = sin conteo de cruces
+    TRACKING_DOOR_ENTRY_DIRECTION: str = "down"  # sentido que cuenta como subida
+    COUNT_SMOOTHING_METHOD: str = "none"  # none, median, ema (opcional: cambia count y peak_count)
+    COUNT_SMOOTHING_WINDOW: int = 5
+    COUNT_SMOOTHING_ALPHA: float = 0.3
+
+    # Métricas (/metrics en formato Prometheus) y profiling
+    METRICS_ENABLED: bool = True
+    PROFILING_ENABLED: bool = False  # tiempos por etapa y consultas SQL; conmutable en caliente
+    LOG_FRAME_SAMPLE_EVERY: int = 100  # loguear 1 de cada N frames procesados
+
+    # Progreso en vivo del procesamiento de validación
+    PROGRESS_PUBLISH_INTERVAL_SECONDS: float = 0.5
+    PROGRESS_TTL_SECONDS: float = 600.0  # cuánto se conserva el progreso ya terminado
+    PROGRESS_STREAM_POLL_SECONDS: float = 0.5
+
+    # Historial de ocupación: particiones mensuales (solo PostgreSQL) y retención
+    OCCUPANCY_PARTITIONING_ENABLED: bool = False  # init_db convierte la tabla existente
+    OCCUPANCY_PARTITION_MONTHS_AHEAD: int = 3
+    OCCUPANCY_RAW_RETENTION_DAYS: int = 90  # eventos más antiguos se archivan y se borran
+    OCCUPANCY_ARCHIVE_DIR: str = "archive/occupancy_events"  # fuera de MEDIA_ROOT (no público)
+    OCCUPANCY_ARCHIVE_BATCH_SIZE: int = 5000
+    OCCUPANCY_DEDUP_CACHE_SIZE: int = 100_000  # claves recientes en memoria
+    OCCUPANCY_DEDUP_TTL_SECONDS: float = 3600.0
+
+    # Escritura diferida de eventos de ocupación (responde antes del commit)
+    OCCUPANCY_WRITE_BEHIND_ENABLED: bool = False
+    OCCUPANCY_WRITE_BEHIND_LOG_DIR: str | None = "data/occupancy_wal"  # None = solo memoria
+    OCCUPANCY_WRITE_BEHIND_BATCH_SIZE: int = 500
+    OCCUPANCY_WRITE_BEHIND_FLUSH_SECONDS: float = 0.5
+    OCCUPANCY_WRITE_BEHIND_MAX_PENDING: int = 50_000
+    OCCUPANCY_WRITE_BEHIND_FSYNC_EACH: bool = False  # fsync por evento (sobrevive cortes de luz)
+    OCCUPANCY_WRITE_BEHIND_DEAD_LETTER_PATH: str | None = "data/occupancy_dead_letter.jsonl"  # eventos que la BD rechaza
+
+    # Consultas geoespaciales sobre la posición en vivo de los buses
+    GEO_INDEX_ENABLED: bool = True  # índice en memoria; desactivar con varios workers
+    GEO_INDEX_CELL_DEGREES: float = 0.01  # ~1.1 km de lado
+    GEO_NEAREST_MAX_RESULTS: int = 50
+
+    # Alertas por bus evaluadas en la ingesta
+    ALERTS_ENABLED: bool = True
+    ALERT_CAPACITY_WARNING_PERCENT: float = 85.0  # % de max_capacity
+    ALERT_CAPACITY_CRITICAL_PERCENT: float = 100.0
+    ALERT_CAPACITY_CLEAR_MARGIN_PERCENT: float = 5.0  # histéresis al cerrar
+    ALERT_SUSTAINED_PERCENT: float = 100.0
+    ALERT_SUSTAINED_SECONDS: float = 120.0
+    ALERT_STALE_SECONDS: float = 120.0  # sin eventos -> alerta offline
+    ALERT_SWEEP_INTERVAL_SECONDS: float = 5.0
+    ALERT_FEED_SIZE: int = 1000  # cambios recientes disponibles para reconectar
+    ALERT_STREAM_POLL_SECONDS: float = 0.5
+
+    # Agregados por ruta en memoria (/dashboard/routes/state)
+    ROUTE_AGGREGATES_ENABLED: bool = True
+    ROUTE_ASSIGNMENT_CACHE_SECONDS: float = 60.0  # ruta por BusAssignment si el evento no la trae; retraso máximo ante cambios
+
+    # Serialización de payloads grandes (timeline, frame-stats)
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 16 * 1024  # por debajo no compensa comprimir
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 5  # 11 es demasiado lento para respuestas en línea
+
+    # Reprocesamiento por lotes de sesiones con un modelo nuevo
+    REPROCESS_RESULTS_DIR: str = "data/reprocessing"  # timelines por versión de modelo (no público)
+    REPROCESS_WORKERS: int = 2
+    REPROCESS_LEASE_SECONDS: float = 6 * 3600  # una fila PROCESSING más reciente pertenece a otra ejecución
+
+    # Índice de intervalos de ocupación por sesión (búsqueda entre sesiones)
+    OCCUPANCY_INTERVAL_MAX_GAP_SECONDS: float = 0.5  # huecos menores no parten el tramo
+
     class Config:
         env_file = ".env"
 
@@ -6,4 +6,4 @@ class Base(DeclarativeBase):
 
 
 # Importa modelos aquí para que Alembic los detecte luego (si usas Alembic)
-from app.models import user, bus, route, bus_assignment, occupancy_event, bus_state, validation, system_log  # noqa
+from app.models import user, bus, route, bus_assignment, occupancy_event, bus_state, validation, system_log, bus_camera, occupancy_rollup, bus_alert  # noqa
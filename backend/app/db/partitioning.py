@@ -0,0 +1,192 @@
+"""
+Particionado mensual de ``occupancy_events`` en PostgreSQL.
+
+La tabla se declara normal en el modelo (así funciona igual en SQLite); en
+PostgreSQL ``partition_occupancy_events`` la convierte una sola vez en una
+tabla particionada por rango de ``timestamp`` con una partición por mes y una
+partición DEFAULT de respaldo. ``ensure_monthly_partitions`` crea las
+particiones de los próximos meses y se ejecuta al arrancar y en cada pasada
+de retención.
+"""
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.models.occupancy_event import OccupancyEvent
+
+logger = logging.getLogger(__name__)
+
+TABLE = OccupancyEvent.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+EVENT_ID_INDEX = "uq_occupancy_events_event_id"
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+        {"name": TABLE},
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, Optional[datetime]]]:
+    """Particiones mensuales existentes como (nombre, inicio de mes)."""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name"
+        ),
+        {"name": TABLE},
+    ).scalars()
+    partitions = []
+    for name in rows:
+        suffix = name[len(TABLE) + 1:]
+        try:
+            partitions.append((name, datetime.strptime(suffix, "y%Ym%m")))
+        except ValueError:
+            partitions.append((name, None))  # DEFAULT u otra partición manual
+    return sorted(partitions, key=lambda item: (item[1] is None, item[1] or datetime.min))
+
+
+def create_month_partition(conn: Connection, month: datetime) -> None:
+    start = month_start(month)
+    end = add_months(start, 1)
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+    )
+
+
+def ensure_monthly_partitions(engine: Engine, months_ahead: int = 3, now: Optional[datetime] = None) -> None:
+    """Crea las particiones del mes actual y los ``months_ahead`` siguientes."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return
+        current = month_start(now or datetime.utcnow())
+        for offset in range(months_ahead + 1):
+            create_month_partition(conn, add_months(current, offset))
+
+
+def partition_occupancy_events(engine: Engine, months_ahead: int = 3) -> bool:
+    """
+    Conversión única de la tabla existente a tabla particionada. Copia los
+    datos dentro de una transacción; devuelve False si no aplica (otro motor
+    o ya particionada).
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql" or is_partitioned(conn):
+            return False
+
+        logger.info("Converting %s into a monthly partitioned table", TABLE)
+        legacy = f"{TABLE}_legacy"
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {TABLE}_pkey TO {legacy}_pkey"))
+        # Los índices se recrean sobre la tabla particionada con ensure_occupancy_schema
+        index_names = {"ix_occupancy_events_bus_id"} | {i.name for i in OccupancyEvent.__table__.indexes}
+        for index in sorted(index_names):
+            conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+        # La clave primaria de una tabla particionada debe incluir la columna de partición
+        conn.execute(
+            text(
+                f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (timestamp)"
+            )
+        )
+        conn.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, timestamp)"))
+        conn.execute(text(f"ALTER TABLE {TABLE} ADD FOREIGN KEY (bus_id) REFERENCES buses (id)"))
+        conn.execute(text(f"ALTER TABLE {TABLE} ADD FOREIGN KEY (route_id) REFERENCES routes (id)"))
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+        bounds = conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {legacy}")).one()
+        first = month_start(bounds[0] or datetime.utcnow())
+        last = add_months(month_start(max(bounds[1] or datetime.utcnow(), datetime.utcnow())), months_ahead)
+        month = first
+        while month <= last:
+            create_month_partition(conn, month)
+            month = add_months(month, 1)
+
+        conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {legacy}"))
+        # La secuencia del id pertenece a la tabla vieja: pasarla a la nueva antes de borrarla
+        conn.execute(text(f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+    return True
+
+
+def _index_columns(engine: Engine, name: str) -> Optional[List[str]]:
+    for index in inspect(engine).get_indexes(TABLE):
+        if index["name"] == name:
+            return list(index["column_names"])
+    return None
+
+
+def _ensure_event_id_index(engine: Engine, partitioned: bool) -> None:
+    """
+    Índice único de ``event_id``: (bus_id, event_id), de modo que un
+    reintento con otro timestamp también se descarta. En la tabla
+    particionada PostgreSQL exige la columna de partición, así que ahí es
+    (bus_id, event_id, timestamp) y un reintento con otro timestamp solo se
+    descarta en memoria (``OCCUPANCY_DEDUP_TTL_SECONDS``).
+    """
+    wanted = ["bus_id", "event_id", "timestamp"] if partitioned else ["bus_id", "event_id"]
+    current = _index_columns(engine, EVENT_ID_INDEX)
+    if current == wanted:
+        return
+    try:
+        with engine.begin() as conn:
+            if current is not None:
+                conn.execute(text(f"DROP INDEX {EVENT_ID_INDEX}"))
+            conn.execute(text(f"CREATE UNIQUE INDEX {EVENT_ID_INDEX} ON {TABLE} ({', '.join(wanted)})"))
+    except Exception:  # noqa: BLE001
+        # Típicamente reintentos ya guardados con timestamps distintos
+        logger.exception("Could not create index %s on %s", EVENT_ID_INDEX, TABLE)
+
+
+def ensure_occupancy_schema(engine: Engine) -> None:
+    """
+    Lleva una tabla ya existente al esquema actual del modelo (create_all no
+    altera tablas): columnas nuevas e índices nuevos.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns(TABLE)}
+    if "event_id" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN event_id VARCHAR(64)"))
+
+    with engine.connect() as conn:
+        partitioned = is_partitioned(conn)
+    _ensure_event_id_index(engine, partitioned)
+    for index in OccupancyEvent.__table__.indexes:
+        if index.name == EVENT_ID_INDEX:
+            continue
+        try:
+            index.create(bind=engine, checkfirst=True)
+        except Exception:  # noqa: BLE001
+            # Típicamente duplicados previos que impiden un índice único
+            logger.exception("Could not create index %s on %s", index.name, TABLE)
+
+
+def drop_partition(conn: Connection, name: str) -> None:
+    conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
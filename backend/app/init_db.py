@@ -2,6 +2,10 @@ from sqlalchemy.orm import Session
 
 from app.db.session import engine, SessionLocal
 from app.db.base import Base
+from app.db import partitioning
+from app.core.config import settings
+from app.models.bus_assignment import BusAssignment
+from app.models.bus_state import BusState
 from app.models.user import User
 from app.core.security import get_password_hash
 
@@ -16,6 +20,14 @@ def init_db() -> None:
     print("🔧 Creando tablas en la base de datos (si no existen)...")
     Base.metadata.create_all(bind=engine)
     print("✅ Tablas creadas o ya existentes.")
+    if settings.OCCUPANCY_PARTITIONING_ENABLED:
+        if partitioning.partition_occupancy_events(engine, settings.OCCUPANCY_PARTITION_MONTHS_AHEAD):
+            print("✅ occupancy_events convertida a tabla particionada por mes.")
+        partitioning.ensure_monthly_partitions(engine, settings.OCCUPANCY_PARTITION_MONTHS_AHEAD)
+    partitioning.ensure_occupancy_schema(engine)
+    # create_all no añade índices a tablas existentes
+    for index in (*BusState.__table__.indexes, *BusAssignment.__table__.indexes):
+        index.create(bind=engine, checkfirst=True)
 
     # 2. Crear usuario admin por defecto
     db: Session = SessionLocal()
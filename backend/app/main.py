@@ -1,13 +1,57 @@
+import logging
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.router import api_router
+from app.api.endpoints import metrics as metrics_endpoints
+from app.db import partitioning
+from app.db.session import engine
+from app.services.alerts import start_alert_engine, stop_alert_engine
+from app.services.geo_index import warm_bus_positions_on_startup
+from app.services.ingestion_buffer import start_write_behind, stop_write_behind
+from app.services.route_aggregates import load_route_aggregates_on_startup
+from app.services.metrics import MetricsMiddleware, instrument_engine
+from app.services.media_delivery import MediaStaticFiles
+from app.services.live_streams import live_stream_manager
+from app.services.video_processing import get_model, inference_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_occupancy_partitions() -> None:
+    # Particiones de los próximos meses (no-op si la tabla no está particionada)
+    try:
+        partitioning.ensure_monthly_partitions(engine, settings.OCCUPANCY_PARTITION_MONTHS_AHEAD)
+    except Exception:  # noqa: BLE001 - no debe impedir el arranque
+        logger.exception("Could not ensure occupancy_events partitions")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Precargar YOLO al arrancar para no penalizar la primera petición
+    get_model()
+    ensure_occupancy_partitions()
+    warm_bus_positions_on_startup()
+    start_alert_engine()
+    load_route_aggregates_on_startup()
+    start_write_behind()
+    try:
+        yield
+    finally:
+        live_stream_manager.stop_all()
+        inference_scheduler.stop()
+        # Vaciar a BD todo lo aceptado antes de salir
+        stop_write_behind()
+        stop_alert_engine()
 
 
 def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.PROJECT_NAME,
+        lifespan=lifespan,
     )
 
     origins = [
@@ -24,11 +68,18 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
-    # Servir archivos estáticos (videos procesados, etc.)
-    app.mount("/media", StaticFiles(directory="media"), name="media")
+    # Servir archivos estáticos (videos procesados, etc.) con soporte de Range
+    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+    app.mount("/media", MediaStaticFiles(directory=settings.MEDIA_ROOT), name="media")
 
     app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
+    if settings.METRICS_ENABLED:
+        # /metrics va en la raíz, donde lo espera Prometheus
+        app.add_middleware(MetricsMiddleware)
+        instrument_engine(engine)
+        app.include_router(metrics_endpoints.router)
+
     return app
 
 
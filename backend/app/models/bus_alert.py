@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
+from app.db.base import Base
+
+
+class BusAlert(Base):
+    """Historial de alertas por bus: una fila por alerta, abierta mientras ``cleared_at`` es NULL."""
+
+    __tablename__ = "bus_alerts"
+    __table_args__ = (Index("ix_bus_alerts_bus_raised", "bus_id", "raised_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    bus_id = Column(Integer, ForeignKey("buses.id"), nullable=False)
+    route_id = Column(Integer, ForeignKey("routes.id"), nullable=True)
+    alert_type = Column(String(30), nullable=False)  # capacity, sustained_capacity, offline
+    severity = Column(String(20), nullable=False)  # warning, critical
+    message = Column(Text, nullable=True)
+    value = Column(Float, nullable=True)  # % de capacidad o segundos sin datos
+    peak_value = Column(Float, nullable=True)
+    raised_at = Column(DateTime, nullable=False)
+    cleared_at = Column(DateTime, nullable=True, index=True)
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
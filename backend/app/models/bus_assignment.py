@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -7,6 +7,8 @@ from app.db.base import Base
 
 class BusAssignment(Base):
     __tablename__ = "bus_assignments"
+    # Asignación vigente de un bus al ingerir eventos sin route_id
+    __table_args__ = (Index("ix_bus_assignments_bus_from", "bus_id", "assigned_from"),)
 
     id = Column(Integer, primary_key=True, index=True)
     bus_id = Column(Integer, ForeignKey("buses.id"), nullable=False)
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, JSON, String
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+class BusCamera(Base):
+    __tablename__ = "bus_cameras"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bus_id = Column(Integer, ForeignKey("buses.id"), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    is_default = Column(Boolean, default=False)
+
+    # Coordenadas normalizadas (0..1) para ser independientes de la resolución
+    crop_json = Column(JSON, nullable=True)  # [x1, y1, x2, y2]
+    mask_polygons_json = Column(JSON, nullable=True)  # [[[x, y], ...], ...] zonas a conservar
+    inference_imgsz = Column(Integer, nullable=True)  # None = 640
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
+
+    bus = relationship("Bus", lazy="joined")
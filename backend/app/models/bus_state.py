@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -7,6 +7,8 @@ from app.db.base import Base
 
 class BusState(Base):
     __tablename__ = "bus_state"
+    # Prefiltro por caja de las consultas geo cuando no hay índice en memoria
+    __table_args__ = (Index("ix_bus_state_lat_lon", "latitude", "longitude"),)
 
     bus_id = Column(Integer, ForeignKey("buses.id"), primary_key=True)
     last_update = Column(DateTime, nullable=False)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, JSON, String
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, JSON, String
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -7,9 +7,19 @@ from app.db.base import Base
 
 class OccupancyEvent(Base):
     __tablename__ = "occupancy_events"
+    # Historial por bus: el índice compuesto cubre también las búsquedas solo por bus_id.
+    # En PostgreSQL la tabla puede estar particionada por mes (ver app/db/partitioning.py).
+    # Deduplicación: una misma lectura reenviada choca con uno de los índices únicos.
+    # event_id identifica el evento aunque el reintento traiga otro timestamp; con la
+    # tabla particionada el índice debe incluir timestamp (ver ensure_occupancy_schema).
+    __table_args__ = (
+        Index("ix_occupancy_events_bus_id_timestamp", "bus_id", "timestamp"),
+        Index("uq_occupancy_events_source_bus_ts", "source_id", "bus_id", "timestamp", unique=True),
+        Index("uq_occupancy_events_event_id", "bus_id", "event_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    bus_id = Column(Integer, ForeignKey("buses.id"), nullable=False, index=True)
+    bus_id = Column(Integer, ForeignKey("buses.id"), nullable=False)
     route_id = Column(Integer, ForeignKey("routes.id"), nullable=True, index=True)
     timestamp = Column(DateTime, nullable=False, index=True)
 
@@ -21,6 +31,7 @@ class OccupancyEvent(Base):
     longitude = Column(Float, nullable=True)
 
     source_id = Column(String(100), nullable=True)  # edge device id, etc.
+    event_id = Column(String(64), nullable=True)  # id asignado por el cliente (idempotencia)
     raw_json = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
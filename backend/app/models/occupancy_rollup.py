@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+from app.db.base import Base
+
+
+class OccupancyRollupHourly(Base):
+    """Agregado horario por bus/ruta; se conserva al archivar los eventos crudos."""
+
+    __tablename__ = "occupancy_rollups_hourly"
+    __table_args__ = (Index("ix_occupancy_rollups_bus_bucket", "bus_id", "bucket_start"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    bus_id = Column(Integer, ForeignKey("buses.id"), nullable=False)
+    route_id = Column(Integer, ForeignKey("routes.id"), nullable=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+
+    samples = Column(Integer, nullable=False, default=0)
+    passengers_sum = Column(Integer, nullable=False, default=0)
+    passengers_max = Column(Integer, nullable=False, default=0)
+    boarded_sum = Column(Integer, nullable=False, default=0)
+    alighted_sum = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, JSON, Float
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, JSON, Float, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -48,3 +48,74 @@ class ValidationFrameStat(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     session = relationship("ValidationSession", backref="frame_stats")
+
+
+class ValidationOccupancyInterval(Base):
+    """
+    Tramo continuo de frames de una sesión que cumple una condición de
+    ocupación: ``over_capacity`` (conteo > capacidad declarada) o
+    ``threshold`` (conteo >= ``threshold``). Se calcula al procesar la sesión
+    y permite buscar momentos entre todas las sesiones sin leer los frames.
+    """
+
+    __tablename__ = "validation_occupancy_intervals"
+    __table_args__ = (
+        Index("ix_validation_intervals_kind_threshold_peak", "kind", "threshold", "peak_count"),
+        Index("ix_validation_intervals_bus_kind_threshold", "bus_id", "kind", "threshold"),
+        Index("ix_validation_intervals_session_start", "validation_session_id", "start_time"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    validation_session_id = Column(Integer, ForeignKey("validation_sessions.id"), nullable=False)
+    bus_id = Column(Integer, ForeignKey("buses.id"), nullable=True)  # copiado de la sesión para filtrar
+    kind = Column(String(20), nullable=False)  # over_capacity, threshold
+    threshold = Column(Integer, nullable=False)  # para over_capacity, la capacidad declarada
+
+    start_frame = Column(Integer, nullable=False)
+    end_frame = Column(Integer, nullable=False)
+    start_time = Column(Float, nullable=False)  # segundos desde el inicio del video
+    end_time = Column(Float, nullable=False)
+    peak_count = Column(Integer, nullable=False)
+    peak_time = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    session = relationship("ValidationSession", backref="occupancy_intervals")
+
+
+class ValidationModelResult(Base):
+    """
+    Resultado de reprocesar una sesión con otra versión del modelo. Convive
+    con el resultado original (``ValidationSession`` / ``ValidationFrameStat``)
+    para poder compararlos; el timeline completo va en ``timeline_path``.
+    """
+
+    __tablename__ = "validation_model_results"
+    __table_args__ = (
+        UniqueConstraint("validation_session_id", "model_version", name="uq_validation_model_results_session_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    validation_session_id = Column(Integer, ForeignKey("validation_sessions.id"), nullable=False, index=True)
+    model_version = Column(String(100), nullable=False)
+    model_path = Column(Text, nullable=True)
+
+    status = Column(String(20), default="PENDING")  # PENDING, PROCESSING, COMPLETED, FAILED
+    total_frames = Column(Integer, nullable=True)
+    peak_count = Column(Integer, nullable=True)
+    avg_count = Column(Float, nullable=True)
+    avg_confidence = Column(Float, nullable=True)
+    timeline_path = Column(Text, nullable=True)  # JSON gzip fuera de MEDIA_ROOT
+    processed_video_path = Column(Text, nullable=True)  # solo con --render
+    error = Column(Text, nullable=True)
+    run_id = Column(String(32), nullable=True)  # ejecución que reclamó la fila (PROCESSING)
+
+    processing_started_at = Column(DateTime, nullable=True)
+    processing_finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
+
+    session = relationship("ValidationSession", backref="model_results")
@@ -0,0 +1,24 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class AlertOut(BaseModel):
+    id: int | None  # None si aún no se guardó en BD
+    bus_id: int
+    route_id: int | None
+    alert_type: str  # capacity, sustained_capacity, offline
+    severity: str  # warning, critical
+    message: str | None
+    value: float | None
+    peak_value: float | None
+    raised_at: datetime
+    cleared_at: datetime | None
+
+    class Config:
+        from_attributes = True
+
+
+class AlertChangeOut(BaseModel):
+    seq: int
+    action: str  # raised, updated, cleared
+    alert: AlertOut
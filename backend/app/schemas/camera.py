@@ -0,0 +1,29 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class BusCameraBase(BaseModel):
+    name: str
+    is_default: bool = False
+    crop: list[float] | None = None  # [x1, y1, x2, y2] normalizado 0..1
+    mask_polygons: list[list[list[float]]] | None = None  # polígonos normalizados
+    inference_imgsz: int | None = None
+
+
+class BusCameraCreate(BusCameraBase):
+    pass
+
+
+class BusCameraUpdate(BaseModel):
+    name: str | None = None
+    is_default: bool | None = None
+    crop: list[float] | None = None
+    mask_polygons: list[list[list[float]]] | None = None
+    inference_imgsz: int | None = None
+
+
+class BusCameraOut(BusCameraBase):
+    id: int
+    bus_id: int
+    created_at: datetime
+    updated_at: datetime
@@ -15,3 +15,21 @@ class BusStateOut(BaseModel):
 
   class Config:
       from_attributes = True
+
+
+class BusNearbyOut(BusStateOut):
+  distance_km: float
+
+
+class RouteStateOut(BaseModel):
+  route_id: int | None  # None = buses sin ruta asignada
+  route_code: str | None
+  route_name: str | None
+  bus_count: int
+  total_passengers: int
+  avg_passengers: float
+  total_capacity: int
+  load_percent: float | None
+  full_count: int  # buses en nivel LLENA
+  levels: dict[str, int]
+  last_update: datetime | None
@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class OccupancyEventIn(BaseModel):
@@ -12,4 +12,5 @@ class OccupancyEventIn(BaseModel):
     latitude: float | None = None
     longitude: float | None = None
     source_id: str | None = None
+    event_id: str | None = Field(default=None, max_length=64)  # reintentos con el mismo id se ignoran
     raw_json: dict | None = None
@@ -0,0 +1,26 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class LiveStreamCreate(BaseModel):
+    bus_id: int
+    source: str  # URL rtsp://... o ruta a un archivo local
+    route_id: int | None = None
+    camera_id: int | None = None  # None = cámara por defecto del bus
+    realtime: bool = True  # archivos: reproducir a velocidad real
+    loop: bool = False
+
+
+class LiveStreamOut(BaseModel):
+    stream_id: str
+    bus_id: int
+    route_id: int | None
+    source: str
+    status: str
+    frames_read: int
+    frames_dropped: int
+    inferences: int
+    last_raw_count: int | None
+    last_count: int | None
+    last_emitted_at: datetime | None
+    error: str | None
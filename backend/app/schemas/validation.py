@@ -15,6 +15,7 @@ class ValidationSessionOut(BaseModel):
     original_video_url: str | None = None
     processed_video_path: str | None
     processed_video_url: str | None = None
+    processed_video_hls_url: str | None = None
     status: str
     total_frames: int | None
     detected_max_occupancy: int | None
@@ -27,6 +28,22 @@ class ValidationSessionOut(BaseModel):
         from_attributes = True
 
 
+class ProcessingProgressOut(BaseModel):
+    session_id: int
+    status: str  # PENDING, PROCESSING, PERSISTING, COMPLETED, FAILED
+    frames_done: int = 0
+    total_frames: int | None = None
+    percent: float | None = None
+    fps: float | None = None
+    eta_seconds: float | None = None
+    peak_count: int | None = None
+    elapsed_seconds: float | None = None
+    started_at: datetime | None = None
+    updated_at: datetime | None = None
+    error: str | None = None
+    live: bool = False  # False = valores leídos de la sesión en BD
+
+
 class ValidationFrameStatOut(BaseModel):
     id: int
     frame_index: int | None
@@ -37,3 +54,42 @@ class ValidationFrameStatOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ChunkedUploadCreate(BaseModel):
+    filename: str
+    total_size: int
+    chunk_size: int | None = None
+    sha256: str | None = None  # checksum del archivo completo (opcional)
+
+
+class ChunkedUploadStatus(BaseModel):
+    upload_id: str
+    session_id: int
+    filename: str
+    total_size: int
+    chunk_size: int
+    total_chunks: int
+    received_ranges: list[list[int]]  # rangos [inicio, fin] de partes recibidas
+    missing_chunks: list[int]
+    received_bytes: int
+    complete: bool
+
+
+class OccupancyIntervalOut(BaseModel):
+    id: int
+    session_id: int
+    bus_id: int | None
+    kind: str  # over_capacity, threshold
+    threshold: int
+    start_time: float
+    end_time: float
+    duration_seconds: float
+    start_frame: int
+    end_frame: int
+    peak_count: int
+    peak_time: float
+    max_capacity_declared: int
+    session_created_at: datetime
+    processed_video_url: str | None
+    video_timestamp_url: str | None  # video procesado con #t=inicio,fin
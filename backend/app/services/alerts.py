@@ -0,0 +1,433 @@
+"""
+Motor de alertas por bus evaluado de forma incremental en la ingesta.
+
+Reglas (umbrales en ``settings``):
+
+- ``capacity``: ocupación >= ``ALERT_CAPACITY_WARNING_PERCENT`` de
+  ``max_capacity`` (``critical`` desde ``ALERT_CAPACITY_CRITICAL_PERCENT``).
+  Se cierra al bajar ``ALERT_CAPACITY_CLEAR_MARGIN_PERCENT`` puntos por debajo
+  del umbral de aviso, para no oscilar en el borde.
+- ``sustained_capacity``: ocupación >= ``ALERT_SUSTAINED_PERCENT`` durante al
+  menos ``ALERT_SUSTAINED_SECONDS`` según los timestamps de los eventos.
+- ``offline``: sin eventos durante ``ALERT_STALE_SECONDS``. Lo detecta un
+  barrido periódico que solo mira los buses vencidos (cola ordenada por
+  último evento recibido), no toda la flota.
+
+El estado vive en memoria; cada transición (``raised``, ``updated``,
+``cleared``) se guarda en ``bus_alerts`` y se publica en un feed con número
+de secuencia al que se suscriben los clientes (``/alerts/stream``).
+Como el resto de estado en memoria, es local al proceso.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.bus import Bus
+from app.models.bus_alert import BusAlert
+from app.models.bus_state import BusState
+
+logger = logging.getLogger(__name__)
+
+CAPACITY = "capacity"
+SUSTAINED_CAPACITY = "sustained_capacity"
+OFFLINE = "offline"
+
+
+@dataclass
+class Alert:
+    bus_id: int
+    alert_type: str
+    severity: str
+    message: str
+    value: Optional[float]
+    raised_at: datetime
+    route_id: Optional[int] = None
+    peak_value: Optional[float] = None
+    cleared_at: Optional[datetime] = None
+    id: Optional[int] = None  # fila en bus_alerts, si ya se guardó
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "bus_id": self.bus_id,
+            "route_id": self.route_id,
+            "alert_type": self.alert_type,
+            "severity": self.severity,
+            "message": self.message,
+            "value": self.value,
+            "peak_value": self.peak_value,
+            "raised_at": self.raised_at,
+            "cleared_at": self.cleared_at,
+        }
+
+
+@dataclass
+class AlertTransition:
+    action: str  # raised, updated, cleared
+    alert: Alert  # el objeto vivo (recibe el id al guardarse)
+
+
+@dataclass
+class _BusTrack:
+    max_capacity: int
+    route_id: Optional[int] = None
+    over_since: Optional[datetime] = None
+    active: Dict[str, Alert] = field(default_factory=dict)
+
+
+class AlertEngine:
+    def __init__(
+        self,
+        warning_percent: float = 85.0,
+        critical_percent: float = 100.0,
+        clear_margin_percent: float = 5.0,
+        sustained_percent: float = 100.0,
+        sustained_seconds: float = 120.0,
+        stale_seconds: float = 120.0,
+        feed_size: int = 1000,
+    ):
+        self.warning_percent = warning_percent
+        self.critical_percent = critical_percent
+        self.clear_margin_percent = clear_margin_percent
+        self.sustained_percent = sustained_percent
+        self.sustained_seconds = sustained_seconds
+        self.stale_seconds = stale_seconds
+
+        self._buses: Dict[int, _BusTrack] = {}
+        # bus_id -> instante (monotonic) del último evento; el más antiguo primero
+        self._last_seen: "OrderedDict[int, float]" = OrderedDict()
+        self._feed: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=feed_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- evaluación --------------------------------------------------------
+
+    def observe(
+        self,
+        bus_id: int,
+        route_id: Optional[int],
+        total_passengers: int,
+        max_capacity: int,
+        timestamp: datetime,
+    ) -> List[AlertTransition]:
+        """Evalúa un evento recién ingerido y devuelve las transiciones que provoca."""
+        transitions: List[AlertTransition] = []
+        percent = total_passengers / max_capacity * 100.0 if max_capacity > 0 else 0.0
+        with self._lock:
+            track = self._buses.get(bus_id)
+            if track is None:
+                track = self._buses[bus_id] = _BusTrack(max_capacity=max_capacity)
+            track.max_capacity = max_capacity
+            track.route_id = route_id
+            self._last_seen[bus_id] = time.monotonic()
+            self._last_seen.move_to_end(bus_id)
+
+            self._clear(track, OFFLINE, timestamp, transitions)
+            self._evaluate_capacity(track, bus_id, percent, total_passengers, timestamp, transitions)
+            self._evaluate_sustained(track, bus_id, percent, timestamp, transitions)
+        return transitions
+
+    def _evaluate_capacity(self, track, bus_id, percent, total_passengers, timestamp, transitions) -> None:
+        current = track.active.get(CAPACITY)
+        if percent >= self.critical_percent:
+            severity = "critical"
+        elif percent >= self.warning_percent:
+            severity = "warning"
+        elif current is not None and percent >= self.warning_percent - self.clear_margin_percent:
+            severity = "warning"  # dentro del margen: baja de nivel pero no se cierra
+        else:
+            self._clear(track, CAPACITY, timestamp, transitions)
+            return
+
+        message = f"{total_passengers}/{track.max_capacity} pasajeros ({percent:.0f}% de capacidad)"
+        if current is None:
+            alert = Alert(bus_id, CAPACITY, severity, message, percent, timestamp, track.route_id, percent)
+            track.active[CAPACITY] = alert
+            transitions.append(AlertTransition("raised", alert))
+            return
+        current.value = percent
+        current.message = message
+        current.peak_value = max(current.peak_value or 0.0, percent)
+        if current.severity != severity:
+            current.severity = severity
+            transitions.append(AlertTransition("updated", current))
+
+    def _evaluate_sustained(self, track, bus_id, percent, timestamp, transitions) -> None:
+        if percent < self.sustained_percent:
+            track.over_since = None
+            self._clear(track, SUSTAINED_CAPACITY, timestamp, transitions)
+            return
+        if track.over_since is None or timestamp < track.over_since:
+            track.over_since = timestamp
+        current = track.active.get(SUSTAINED_CAPACITY)
+        if current is not None:
+            current.value = percent
+            current.peak_value = max(current.peak_value or 0.0, percent)
+            return
+        duration = (timestamp - track.over_since).total_seconds()
+        if duration >= self.sustained_seconds:
+            alert = Alert(
+                bus_id,
+                SUSTAINED_CAPACITY,
+                "critical",
+                f"Sobre capacidad durante {duration / 60:.0f} min",
+                percent,
+                timestamp,
+                track.route_id,
+                percent,
+            )
+            track.active[SUSTAINED_CAPACITY] = alert
+            transitions.append(AlertTransition("raised", alert))
+
+    @staticmethod
+    def _clear(track: _BusTrack, alert_type: str, timestamp: datetime, transitions: List[AlertTransition]) -> None:
+        alert = track.active.pop(alert_type, None)
+        if alert is not None:
+            alert.cleared_at = max(timestamp, alert.raised_at)
+            transitions.append(AlertTransition("cleared", alert))
+
+    def sweep(self) -> List[AlertTransition]:
+        """Levanta ``offline`` para los buses sin eventos desde hace ``stale_seconds``."""
+        transitions: List[AlertTransition] = []
+        now = time.monotonic()
+        with self._lock:
+            while self._last_seen:
+                bus_id, seen = next(iter(self._last_seen.items()))
+                idle = now - seen
+                if idle < self.stale_seconds:
+                    break
+                # Sale de la cola: no se vuelve a mirar hasta su próximo evento
+                self._last_seen.popitem(last=False)
+                track = self._buses.get(bus_id)
+                if track is None or OFFLINE in track.active:
+                    continue
+                alert = Alert(
+                    bus_id,
+                    OFFLINE,
+                    "warning",
+                    f"Sin datos desde hace {idle / 60:.0f} min",
+                    idle,
+                    datetime.utcnow() - timedelta(seconds=idle - self.stale_seconds),
+                    track.route_id,
+                )
+                track.active[OFFLINE] = alert
+                transitions.append(AlertTransition("raised", alert))
+        return transitions
+
+    # --- feed de cambios ---------------------------------------------------
+
+    def publish(self, transitions: List[AlertTransition]) -> None:
+        with self._lock:
+            for transition in transitions:
+                self._seq += 1
+                payload = {"seq": self._seq, "action": transition.action, "alert": transition.alert.as_dict()}
+                self._feed.append((self._seq, payload))
+
+    def changes_since(self, seq: int) -> Tuple[int, Optional[List[Dict[str, Any]]]]:
+        """
+        Cambios con secuencia > ``seq``. Devuelve (última secuencia, cambios);
+        cambios es None si ya no están en el feed y el cliente debe resincronizar.
+        """
+        with self._lock:
+            if seq == self._seq:
+                return self._seq, []
+            # Posición posterior a la actual (el servidor se reinició) o ya descartada
+            if seq > self._seq or not self._feed or self._feed[0][0] > seq + 1:
+                return self._seq, None
+            return self._seq, [payload for number, payload in self._feed if number > seq]
+
+    @property
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def active(self, bus_id: Optional[int] = None) -> List[Alert]:
+        with self._lock:
+            tracks = [self._buses.get(bus_id)] if bus_id is not None else list(self._buses.values())
+            return [replace(alert) for track in tracks if track for alert in track.active.values()]
+
+    # --- arranque ----------------------------------------------------------
+
+    def load(self, buses: List[Tuple[int, Optional[int], int, datetime]], open_alerts: List[Alert]) -> None:
+        """
+        Estado inicial: (bus_id, route_id, max_capacity, último evento) de cada
+        bus y las alertas abiertas en BD.
+        """
+        now_wall, now_mono = datetime.utcnow(), time.monotonic()
+        with self._lock:
+            self._buses.clear()
+            self._last_seen.clear()
+            for bus_id, route_id, max_capacity, last_update in sorted(buses, key=lambda row: row[3]):
+                self._buses[bus_id] = _BusTrack(max_capacity=max_capacity, route_id=route_id)
+                age = max((now_wall - last_update).total_seconds(), 0.0)
+                self._last_seen[bus_id] = now_mono - age
+            for alert in open_alerts:
+                track = self._buses.get(alert.bus_id)
+                if track is not None:
+                    track.active[alert.alert_type] = alert
+
+    def start(self, interval: float) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sweep_loop, args=(interval,), name="alert-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _sweep_loop(self, interval: float) -> None:
+        from app.db.session import SessionLocal
+
+        while not self._stop.wait(interval):
+            transitions = self.sweep()
+            if not transitions:
+                continue
+            db = SessionLocal()
+            try:
+                persist_transitions(db, transitions)
+            finally:
+                db.close()
+            self.publish(transitions)
+
+
+# --- persistencia ---------------------------------------------------------------
+
+# El barrido y la ingesta guardan transiciones de la misma alerta desde hilos
+# distintos: se serializan para que un ``cleared`` no se adelante al ``raised``
+_persist_lock = threading.Lock()
+
+
+def persist_transitions(db: Session, transitions: List[AlertTransition]) -> None:
+    """
+    Guarda las transiciones en ``bus_alerts``; un fallo se loguea y no corta la
+    ingesta. El alta se escribe con el estado actual de la alerta (incluido
+    ``cleared_at``), por si se cerró antes de llegar a guardarse.
+    """
+    with _persist_lock:
+        _persist_transitions(db, transitions)
+
+
+def _persist_transitions(db: Session, transitions: List[AlertTransition]) -> None:
+    try:
+        for transition in transitions:
+            alert = transition.alert
+            if transition.action == "raised":
+                row = BusAlert(
+                    bus_id=alert.bus_id,
+                    route_id=alert.route_id,
+                    alert_type=alert.alert_type,
+                    severity=alert.severity,
+                    message=alert.message,
+                    value=alert.value,
+                    peak_value=alert.peak_value,
+                    raised_at=alert.raised_at,
+                    cleared_at=alert.cleared_at,
+                )
+                db.add(row)
+                db.flush()
+                alert.id = row.id
+                continue
+            query = db.query(BusAlert)
+            if alert.id is not None:
+                query = query.filter(BusAlert.id == alert.id)
+            else:
+                # El alta aún no se había guardado (carrera con el barrido)
+                query = query.filter(
+                    BusAlert.bus_id == alert.bus_id,
+                    BusAlert.alert_type == alert.alert_type,
+                    BusAlert.cleared_at.is_(None),
+                )
+            query.update(
+                {
+                    BusAlert.severity: alert.severity,
+                    BusAlert.message: alert.message,
+                    BusAlert.value: alert.value,
+                    BusAlert.peak_value: alert.peak_value,
+                    BusAlert.cleared_at: alert.cleared_at,
+                },
+                synchronize_session=False,
+            )
+        db.commit()
+    except Exception:  # noqa: BLE001
+        db.rollback()
+        logger.exception("Could not persist %s alert transitions", len(transitions))
+
+
+def evaluate_event(db: Session, bus_id: int, route_id: Optional[int], total_passengers: int,
+                   max_capacity: int, timestamp: datetime) -> None:
+    """Punto de entrada desde la ingesta, después del commit del evento."""
+    if not settings.ALERTS_ENABLED:
+        return
+    transitions = alert_engine.observe(bus_id, route_id, total_passengers, max_capacity, timestamp)
+    if transitions:
+        persist_transitions(db, transitions)
+        alert_engine.publish(transitions)
+
+
+def _row_to_alert(row: BusAlert) -> Alert:
+    return Alert(
+        bus_id=row.bus_id,
+        alert_type=row.alert_type,
+        severity=row.severity,
+        message=row.message or "",
+        value=row.value,
+        raised_at=row.raised_at,
+        route_id=row.route_id,
+        peak_value=row.peak_value,
+        cleared_at=row.cleared_at,
+        id=row.id,
+    )
+
+
+def open_alerts_from_db(db: Session, bus_id: Optional[int] = None) -> List[Alert]:
+    query = db.query(BusAlert).filter(BusAlert.cleared_at.is_(None))
+    if bus_id is not None:
+        query = query.filter(BusAlert.bus_id == bus_id)
+    return [_row_to_alert(row) for row in query.order_by(BusAlert.raised_at)]
+
+
+alert_engine = AlertEngine(
+    warning_percent=settings.ALERT_CAPACITY_WARNING_PERCENT,
+    critical_percent=settings.ALERT_CAPACITY_CRITICAL_PERCENT,
+    clear_margin_percent=settings.ALERT_CAPACITY_CLEAR_MARGIN_PERCENT,
+    sustained_percent=settings.ALERT_SUSTAINED_PERCENT,
+    sustained_seconds=settings.ALERT_SUSTAINED_SECONDS,
+    stale_seconds=settings.ALERT_STALE_SECONDS,
+    feed_size=settings.ALERT_FEED_SIZE,
+)
+
+
+def start_alert_engine() -> None:
+    if not settings.ALERTS_ENABLED:
+        return
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        buses = (
+            db.query(BusState.bus_id, BusState.route_id, Bus.max_capacity, BusState.last_update)
+            .join(Bus, BusState.bus_id == Bus.id)
+            .all()
+        )
+        alert_engine.load([tuple(row) for row in buses], open_alerts_from_db(db))
+    except Exception:  # noqa: BLE001 - arranca vacío; se llena con los eventos
+        logger.exception("Could not load alert state from the database")
+    finally:
+        db.close()
+    alert_engine.start(settings.ALERT_SWEEP_INTERVAL_SECONDS)
+
+
+def stop_alert_engine() -> None:
+    alert_engine.stop()
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.uploads import safe_filename, write_stream_to_path
+
+logger = logging.getLogger(__name__)
+
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ChunkedUploadError(Exception):
+    """Petición inválida dentro del protocolo de subida por partes."""
+
+
+class ChunkedUploadNotFound(ChunkedUploadError):
+    pass
+
+
+def session_media_dir(session_id: int) -> str:
+    return os.path.join(settings.MEDIA_ROOT, "validation", str(session_id))
+
+
+def _staging_dir(session_id: int, upload_id: str) -> str:
+    """Partes y manifiesto, fuera de ``MEDIA_ROOT`` (que se sirve sin autenticación)."""
+    if not _UPLOAD_ID_RE.match(upload_id):
+        raise ChunkedUploadNotFound("Upload not found")
+    return os.path.join(settings.UPLOAD_STAGING_DIR, str(session_id), upload_id)
+
+
+def _manifest_path(session_id: int, upload_id: str) -> str:
+    return os.path.join(_staging_dir(session_id, upload_id), "manifest.json")
+
+
+def _chunk_path(manifest: Dict[str, Any], index: int) -> str:
+    return os.path.join(
+        _staging_dir(manifest["session_id"], manifest["upload_id"]), f"{index:06d}.chunk"
+    )
+
+
+def _write_manifest(manifest: Dict[str, Any]) -> None:
+    path = _manifest_path(manifest["session_id"], manifest["upload_id"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_path, path)
+
+
+def _normalize_sha256(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value.startswith("sha256="):
+        value = value[len("sha256="):]
+    if not _SHA256_RE.match(value):
+        raise ChunkedUploadError("Checksum SHA-256 inválido")
+    return value
+
+
+def expected_chunk_size(manifest: Dict[str, Any], index: int) -> int:
+    if index < manifest["total_chunks"] - 1:
+        return manifest["chunk_size"]
+    return manifest["total_size"] - manifest["chunk_size"] * (manifest["total_chunks"] - 1)
+
+
+def create_upload(
+    session_id: int,
+    filename: Optional[str],
+    total_size: int,
+    chunk_size: Optional[int] = None,
+    sha256: Optional[str] = None,
+) -> Dict[str, Any]:
+    chunk_size = chunk_size or settings.UPLOAD_CHUNKED_DEFAULT_CHUNK_SIZE
+    if total_size <= 0:
+        raise ChunkedUploadError("total_size debe ser mayor que 0")
+    if total_size > settings.UPLOAD_MAX_BYTES:
+        raise ChunkedUploadError(
+            f"El archivo supera el tamaño máximo permitido ({settings.UPLOAD_MAX_BYTES} bytes)"
+        )
+    if chunk_size <= 0 or chunk_size > settings.UPLOAD_CHUNKED_MAX_CHUNK_SIZE:
+        raise ChunkedUploadError(
+            f"chunk_size debe estar entre 1 y {settings.UPLOAD_CHUNKED_MAX_CHUNK_SIZE} bytes"
+        )
+
+    upload_id = uuid.uuid4().hex
+    manifest = {
+        "upload_id": upload_id,
+        "session_id": session_id,
+        "filename": safe_filename(filename),
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+        "total_chunks": -(-total_size // chunk_size),
+        "sha256": _normalize_sha256(sha256),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    os.makedirs(_staging_dir(session_id, upload_id), exist_ok=True)
+    _write_manifest(manifest)
+    logger.info(
+        "Chunked upload %s created for session %s (%s bytes, %s chunks)",
+        upload_id,
+        session_id,
+        total_size,
+        manifest["total_chunks"],
+    )
+    return manifest
+
+
+def load_manifest(session_id: int, upload_id: str) -> Dict[str, Any]:
+    path = _manifest_path(session_id, upload_id)
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        raise ChunkedUploadNotFound("Upload not found")
+
+
+def received_chunks(manifest: Dict[str, Any]) -> List[int]:
+    return [
+        index
+        for index in range(manifest["total_chunks"])
+        if os.path.exists(_chunk_path(manifest, index))
+    ]
+
+
+def _as_ranges(indices: List[int]) -> List[List[int]]:
+    """Compacta [0, 1, 2, 5, 6] en [[0, 2], [5, 6]] (extremos incluidos)."""
+    ranges: List[List[int]] = []
+    for index in indices:
+        if ranges and ranges[-1][1] == index - 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ranges
+
+
+def describe_upload(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    received = received_chunks(manifest)
+    received_set = set(received)
+    return {
+        "upload_id": manifest["upload_id"],
+        "session_id": manifest["session_id"],
+        "filename": manifest["filename"],
+        "total_size": manifest["total_size"],
+        "chunk_size": manifest["chunk_size"],
+        "total_chunks": manifest["total_chunks"],
+        "received_ranges": _as_ranges(received),
+        "missing_chunks": [
+            i for i in range(manifest["total_chunks"]) if i not in received_set
+        ],
+        "received_bytes": sum(expected_chunk_size(manifest, i) for i in received),
+        "complete": len(received) == manifest["total_chunks"],
+    }
+
+
+async def store_chunk(
+    manifest: Dict[str, Any],
+    index: int,
+    chunks: AsyncIterator[bytes],
+    checksum: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Guarda la parte ``index`` verificando tamaño y SHA-256. Reenviar una parte
+    ya recibida la sobrescribe, por lo que los reintentos son seguros.
+    """
+    if index < 0 or index >= manifest["total_chunks"]:
+        raise ChunkedUploadError("Índice de parte fuera de rango")
+    expected_checksum = _normalize_sha256(checksum)
+    if expected_checksum is None:
+        raise ChunkedUploadError("Falta el checksum SHA-256 de la parte")
+
+    expected_size = expected_chunk_size(manifest, index)
+    digest = hashlib.sha256()
+
+    async def hashed() -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+
+    staging_path = f"{_chunk_path(manifest, index)}.{uuid.uuid4().hex}.pending"
+    try:
+        written = await write_stream_to_path(hashed(), staging_path, max_bytes=expected_size)
+        if written != expected_size:
+            raise ChunkedUploadError(
+                f"Tamaño de parte inválido: se esperaban {expected_size} bytes, llegaron {written}"
+            )
+        if digest.hexdigest() != expected_checksum:
+            raise ChunkedUploadError("El checksum de la parte no coincide")
+        await run_in_threadpool(os.replace, staging_path, _chunk_path(manifest, index))
+    finally:
+        if os.path.exists(staging_path):
+            os.unlink(staging_path)
+
+    return describe_upload(manifest)
+
+
+def assemble_upload(manifest: Dict[str, Any]) -> str:
+    """
+    Concatena las partes dentro del staging, verifica el checksum global (si
+    se declaró) y solo entonces mueve el archivo a
+    ``media/validation/{session_id}/{filename}``. Elimina el staging y
+    devuelve la ruta final.
+    """
+    missing = describe_upload(manifest)["missing_chunks"]
+    if missing:
+        raise ChunkedUploadError(f"Faltan partes por subir: {missing[:20]}")
+
+    staging_dir = _staging_dir(manifest["session_id"], manifest["upload_id"])
+    destination_path = os.path.join(session_media_dir(manifest["session_id"]), manifest["filename"])
+    partial_path = os.path.join(staging_dir, "assembled.part")
+    digest = hashlib.sha256()
+    try:
+        with open(partial_path, "wb") as destination:
+            for index in range(manifest["total_chunks"]):
+                with open(_chunk_path(manifest, index), "rb") as source:
+                    while True:
+                        block = source.read(settings.UPLOAD_CHUNK_SIZE)
+                        if not block:
+                            break
+                        digest.update(block)
+                        destination.write(block)
+        if os.path.getsize(partial_path) != manifest["total_size"]:
+            raise ChunkedUploadError("El tamaño del archivo ensamblado no coincide")
+        if manifest.get("sha256") and digest.hexdigest() != manifest["sha256"]:
+            raise ChunkedUploadError("El checksum del archivo ensamblado no coincide")
+        os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+        # rename si comparten sistema de archivos; si no, copia
+        shutil.move(partial_path, destination_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    try:
+        os.rmdir(os.path.dirname(staging_dir))  # solo si no quedan otras subidas de la sesión
+    except OSError:
+        pass
+    logger.info(
+        "Chunked upload %s assembled at %s", manifest["upload_id"], destination_path
+    )
+    return destination_path
@@ -0,0 +1,268 @@
+import heapq
+import logging
+import math
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.bus_state import BusState
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+Cell = Tuple[int, int]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Caja (min_lat, min_lon, max_lat, max_lon) que contiene el círculo."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 89.9)))
+    dlon = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+class BusPositionIndex:
+    """
+    Índice espacial en memoria de la última posición de cada bus: una grilla
+    de celdas de ``cell_degrees`` grados (una especie de geohash de precisión
+    fija). Las consultas por caja o radio solo visitan las celdas que la
+    cubren; ``nearest`` recorre anillos de celdas alrededor del punto.
+
+    La ingesta lo actualiza tras cada commit. Es local al proceso: con varios
+    workers cada uno solo ve lo que ingiere él mismo, así que en ese caso hay
+    que desactivarlo (``GEO_INDEX_ENABLED``) y usar el respaldo en BD.
+    """
+
+    def __init__(self, cell_degrees: float = 0.01):
+        self.cell_degrees = cell_degrees
+        self._positions: Dict[int, Tuple[float, float, datetime]] = {}
+        self._cells: Dict[Cell, Set[int]] = {}
+        self._lock = threading.Lock()
+        # Solo se responde desde memoria tras cargar el estado completo de BD
+        self.ready = False
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    # --- escritura ---------------------------------------------------------
+
+    def update(self, bus_id: int, lat: Optional[float], lon: Optional[float], timestamp: datetime) -> None:
+        with self._lock:
+            self._remove_locked(bus_id)
+            if lat is None or lon is None:
+                return
+            self._positions[bus_id] = (lat, lon, timestamp)
+            self._cells.setdefault(self._cell(lat, lon), set()).add(bus_id)
+
+    def remove(self, bus_id: int) -> None:
+        with self._lock:
+            self._remove_locked(bus_id)
+
+    def _remove_locked(self, bus_id: int) -> None:
+        previous = self._positions.pop(bus_id, None)
+        if previous is None:
+            return
+        cell = self._cell(previous[0], previous[1])
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(bus_id)
+            if not members:
+                del self._cells[cell]
+
+    def load(self, rows: Iterable[Tuple[int, Optional[float], Optional[float], datetime]]) -> int:
+        """Reemplaza el contenido con (bus_id, lat, lon, timestamp) y marca el índice listo."""
+        with self._lock:
+            self._positions.clear()
+            self._cells.clear()
+            for bus_id, lat, lon, timestamp in rows:
+                if lat is None or lon is None:
+                    continue
+                self._positions[bus_id] = (lat, lon, timestamp)
+                self._cells.setdefault(self._cell(lat, lon), set()).add(bus_id)
+            self.ready = True
+            return len(self._positions)
+
+    # --- consultas ---------------------------------------------------------
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        min_cell = self._cell(min_lat, min_lon)
+        max_cell = self._cell(max_lat, max_lon)
+        found: List[int] = []
+        with self._lock:
+            span = (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1)
+            if span > len(self._cells):
+                # Caja enorme (zoom lejano): más barato recorrer las celdas ocupadas
+                cells = [members for cell, members in self._cells.items()
+                         if min_cell[0] <= cell[0] <= max_cell[0] and min_cell[1] <= cell[1] <= max_cell[1]]
+            else:
+                cells = [
+                    self._cells[(x, y)]
+                    for x in range(min_cell[0], max_cell[0] + 1)
+                    for y in range(min_cell[1], max_cell[1] + 1)
+                    if (x, y) in self._cells
+                ]
+            for members in cells:
+                for bus_id in members:
+                    lat, lon, _ = self._positions[bus_id]
+                    if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                        found.append(bus_id)
+        return found
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """(bus_id, distancia en km) dentro del radio, ordenados por distancia."""
+        candidates = self.within_bbox(*radius_bbox(lat, lon, radius_km))
+        with self._lock:
+            positions = [(bus_id, self._positions.get(bus_id)) for bus_id in candidates]
+        matches = []
+        for bus_id, position in positions:
+            if position is None:
+                continue
+            distance = haversine_km(lat, lon, position[0], position[1])
+            if distance <= radius_km:
+                matches.append((bus_id, distance))
+        matches.sort(key=lambda item: item[1])
+        return matches
+
+    def nearest(self, lat: float, lon: float, k: int, max_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Los ``k`` buses más cercanos (bus_id, distancia en km)."""
+        if k <= 0:
+            return []
+        center = self._cell(lat, lon)
+        best: List[Tuple[float, int]] = []  # max-heap por distancia negada
+        with self._lock:
+            total = len(self._positions)
+            scanned = 0
+            ring = 0
+            while scanned < total:
+                if (2 * ring + 1) ** 2 > 4 * len(self._cells):
+                    # El vecino está lejos: más barato recorrer todo desde cero
+                    best = []
+                    for bus_id, (b_lat, b_lon, _) in self._positions.items():
+                        self._offer(best, k, haversine_km(lat, lon, b_lat, b_lon), bus_id)
+                    break
+                for cell in self._ring_cells(center, ring):
+                    for bus_id in self._cells.get(cell, ()):
+                        b_lat, b_lon, _ = self._positions[bus_id]
+                        self._offer(best, k, haversine_km(lat, lon, b_lat, b_lon), bus_id)
+                        scanned += 1
+                # Cota inferior de la distancia a cualquier celda aún no visitada
+                reach_lat = min(abs(lat) + (ring + 1) * self.cell_degrees, 89.9)
+                bound = ring * self.cell_degrees * KM_PER_DEGREE_LAT * math.cos(math.radians(reach_lat))
+                if len(best) == k and -best[0][0] <= bound:
+                    break
+                if max_km is not None and bound > max_km:
+                    break
+                ring += 1
+        results = sorted(((bus_id, -neg) for neg, bus_id in best), key=lambda item: item[1])
+        if max_km is not None:
+            results = [item for item in results if item[1] <= max_km]
+        return results
+
+    @staticmethod
+    def _offer(best: List[Tuple[float, int]], k: int, distance: float, bus_id: int) -> None:
+        if len(best) < k:
+            heapq.heappush(best, (-distance, bus_id))
+        elif distance < -best[0][0]:
+            heapq.heapreplace(best, (-distance, bus_id))
+
+    @staticmethod
+    def _ring_cells(center: Cell, ring: int) -> Iterable[Cell]:
+        cx, cy = center
+        if ring == 0:
+            yield center
+            return
+        for dy in range(-ring, ring + 1):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+        for dx in range(-ring + 1, ring):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._positions)
+
+
+bus_positions = BusPositionIndex(cell_degrees=settings.GEO_INDEX_CELL_DEGREES)
+
+
+def use_index() -> bool:
+    return settings.GEO_INDEX_ENABLED and bus_positions.ready
+
+
+def warm_bus_positions(db: Session) -> int:
+    rows = db.query(BusState.bus_id, BusState.latitude, BusState.longitude, BusState.last_update).all()
+    return bus_positions.load(rows)
+
+
+def warm_bus_positions_on_startup() -> None:
+    if not settings.GEO_INDEX_ENABLED:
+        return
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        loaded = warm_bus_positions(db)
+        logger.info("Loaded %s bus positions into the spatial index", loaded)
+    except Exception:  # noqa: BLE001 - sin índice se responde desde BD
+        logger.exception("Could not load bus positions; geo queries will use the database")
+    finally:
+        db.close()
+
+
+# --- respaldo en BD (sin PostGIS) ---------------------------------------------
+
+
+def db_within_bbox(db: Session, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+    rows = (
+        db.query(BusState.bus_id)
+        .filter(
+            BusState.latitude.between(min_lat, max_lat),
+            BusState.longitude.between(min_lon, max_lon),
+        )
+        .all()
+    )
+    return [row[0] for row in rows]
+
+
+def db_within_radius(db: Session, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+    min_lat, min_lon, max_lat, max_lon = radius_bbox(lat, lon, radius_km)
+    rows = (
+        db.query(BusState.bus_id, BusState.latitude, BusState.longitude)
+        .filter(
+            BusState.latitude.between(min_lat, max_lat),
+            BusState.longitude.between(min_lon, max_lon),
+        )
+        .all()
+    )
+    matches = [(bus_id, haversine_km(lat, lon, b_lat, b_lon)) for bus_id, b_lat, b_lon in rows]
+    return sorted((item for item in matches if item[1] <= radius_km), key=lambda item: item[1])
+
+
+def db_nearest(db: Session, lat: float, lon: float, k: int, max_km: Optional[float] = None) -> List[Tuple[int, float]]:
+    query = db.query(BusState.bus_id, BusState.latitude, BusState.longitude).filter(
+        BusState.latitude.isnot(None), BusState.longitude.isnot(None)
+    )
+    if max_km is not None:
+        min_lat, min_lon, max_lat, max_lon = radius_bbox(lat, lon, max_km)
+        query = query.filter(
+            BusState.latitude.between(min_lat, max_lat),
+            BusState.longitude.between(min_lon, max_lon),
+        )
+    distances = ((bus_id, haversine_km(lat, lon, b_lat, b_lon)) for bus_id, b_lat, b_lon in query)
+    if max_km is not None:
+        distances = (item for item in distances if item[1] <= max_km)
+    return heapq.nsmallest(k, distances, key=lambda item: item[1])
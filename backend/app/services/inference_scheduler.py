@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Menor valor = mayor prioridad
+PRIORITY_LIVE = 0
+PRIORITY_VALIDATION = 10
+
+
+@dataclass
+class _InferenceRequest:
+    source_id: str
+    frame: Any
+    future: Future
+    enqueued_at: float
+    batch_key: Hashable = None
+
+
+class InferenceScheduler:
+    """
+    Planificador central de inferencia. Recibe frames de muchas fuentes
+    (streams en vivo, jobs de validación), forma lotes de hasta
+    ``max_batch_size`` frames o los despacha cuando el más antiguo alcanza
+    ``max_latency`` segundos, ejecuta una sola llamada al modelo y devuelve
+    cada resultado a su llamador.
+
+    El lote se llena por prioridad (los streams en vivo primero) y, dentro de
+    cada prioridad, en round-robin entre fuentes, un frame por fuente y
+    vuelta: un job de validación largo no puede acaparar el lote.
+
+    Solo se agrupan frames con el mismo ``batch_key`` (p. ej. la resolución
+    de entrada de su cámara); ``run_batch`` recibe los frames y esa clave.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any], Hashable], List[Any]],
+        max_batch_size: int = 8,
+        max_latency: float = 0.05,
+        max_queue_per_source: int = 16,
+    ):
+        self._run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_queue_per_source = max_queue_per_source
+
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_InferenceRequest]] = {}
+        self._priorities: Dict[str, int] = {}
+        self._rr_offset: Dict[int, int] = {}
+        self._pending = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+        self.batches_run = 0
+        self.frames_run = 0
+
+    # --- API pública -------------------------------------------------------
+
+    def submit(
+        self,
+        frame: Any,
+        source_id: str,
+        priority: int = PRIORITY_VALIDATION,
+        batch_key: Hashable = None,
+    ) -> Future:
+        """
+        Encola un frame y devuelve un ``Future`` con su resultado. Si la cola
+        de la fuente está llena, bloquea hasta que haya hueco (backpressure).
+        """
+        future: Future = Future()
+        with self._cond:
+            self._ensure_started()
+            self._cond.wait_for(
+                lambda: self._stopped
+                or len(self._queues.get(source_id, ())) < self.max_queue_per_source
+            )
+            if self._stopped:
+                raise RuntimeError("El planificador de inferencia está detenido")
+            self._priorities[source_id] = priority
+            self._queues.setdefault(source_id, deque()).append(
+                _InferenceRequest(source_id, frame, future, time.monotonic(), batch_key)
+            )
+            self._pending += 1
+            self._cond.notify_all()
+        return future
+
+    def infer(
+        self,
+        frame: Any,
+        source_id: str,
+        priority: int = PRIORITY_VALIDATION,
+        batch_key: Hashable = None,
+    ) -> Any:
+        return self.submit(frame, source_id, priority, batch_key).result()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+
+    def describe(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": self._pending,
+                "sources": len(self._queues),
+                "batches_run": self.batches_run,
+                "frames_run": self.frames_run,
+                "avg_batch_size": (self.frames_run / self.batches_run) if self.batches_run else 0.0,
+            }
+
+    # --- despacho ----------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._dispatch_loop, name="inference-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        self._fail_pending(RuntimeError("El planificador de inferencia se detuvo"))
+                        return
+                    if self._pending == 0:
+                        self._cond.wait()
+                        continue
+                    if self._pending >= self.max_batch_size:
+                        break
+                    oldest = min(q[0].enqueued_at for q in self._queues.values() if q)
+                    remaining = oldest + self.max_latency - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+                # Despertar a productores bloqueados por backpressure
+                self._cond.notify_all()
+            self._execute(batch)
+
+    def _take_batch(self) -> List[_InferenceRequest]:
+        batch: List[_InferenceRequest] = []
+        batch_key: Hashable = None
+        for priority in sorted(set(self._priorities.values())):
+            sources = [
+                source_id
+                for source_id, p in self._priorities.items()
+                if p == priority and self._queues.get(source_id)
+            ]
+            if not sources:
+                continue
+            offset = self._rr_offset.get(priority, 0) % len(sources)
+            sources = sources[offset:] + sources[:offset]
+            self._rr_offset[priority] = offset + 1
+
+            if not batch:
+                # La clave del lote la fija la primera fuente elegida
+                batch_key = self._queues[sources[0]][0].batch_key
+
+            def has_work(source_id: str) -> bool:
+                queue = self._queues[source_id]
+                return bool(queue) and queue[0].batch_key == batch_key
+
+            while len(batch) < self.max_batch_size and any(has_work(s) for s in sources):
+                for source_id in sources:
+                    if has_work(source_id) and len(batch) < self.max_batch_size:
+                        batch.append(self._queues[source_id].popleft())
+            if len(batch) >= self.max_batch_size:
+                break
+
+        self._pending -= len(batch)
+        # Olvidar fuentes sin trabajo pendiente
+        for source_id in [s for s, q in self._queues.items() if not q]:
+            del self._queues[source_id]
+            del self._priorities[source_id]
+        return batch
+
+    def _execute(self, batch: List[_InferenceRequest]) -> None:
+        try:
+            results = self._run_batch([request.frame for request in batch], batch[0].batch_key)
+        except Exception as exc:  # noqa: BLE001 - se propaga a cada llamador
+            logger.exception("Batched inference failed for %s frames", len(batch))
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+        self.batches_run += 1
+        self.frames_run += len(batch)
+
+    def _fail_pending(self, exc: Exception) -> None:
+        for queue in self._queues.values():
+            while queue:
+                queue.popleft().future.set_exception(exc)
+        self._queues.clear()
+        self._priorities.clear()
+        self._pending = 0
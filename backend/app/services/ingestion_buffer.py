@@ -0,0 +1,368 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Deque, Hashable, List, Optional, Set
+
+from pydantic import ValidationError
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.schemas.occupancy import OccupancyEventIn
+from app.services.occupancy_ingestion import dedup_key, ingest_occupancy_batch, recent_event_keys
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionBufferFull(Exception):
+    pass
+
+
+class WriteBehindBuffer:
+    """
+    Escritura diferida de eventos de ocupación.
+
+    ``submit`` valida, añade el evento al log local (si hay ``log_dir``) y a
+    una cola en memoria acotada, y vuelve sin tocar la BD. Un hilo de fondo
+    vacía la cola por lotes cuando alcanza ``batch_size`` o cada
+    ``flush_interval`` segundos, usando ``ingest_occupancy_batch``.
+
+    El log es append-only en segmentos: en cada vaciado se cierra el segmento
+    actual y se abre otro; el segmento cerrado se borra cuando su lote quedó
+    confirmado en BD. Al arrancar se reinyectan los segmentos que quedaron de
+    una caída; la ingesta idempotente descarta lo que ya se hubiera guardado.
+    Para que eso valga también con eventos sin ``event_id`` ni ``source_id``,
+    ``submit`` les asigna un ``event_id`` propio antes de escribirlos en el log.
+
+    Solo los errores de conexión reintentan el lote. Cualquier otro fallo
+    (p. ej. un ``bus_id`` inexistente) hace que el lote se escriba evento a
+    evento; los que la BD sigue rechazando van a ``dead_letter_path`` y no
+    bloquean al resto.
+    """
+
+    def __init__(
+        self,
+        log_dir: Optional[str],
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_pending: int = 50_000,
+        fsync_each: bool = False,
+        dead_letter_path: Optional[str] = None,
+    ):
+        self.log_dir = log_dir or None
+        self.dead_letter_path = dead_letter_path or None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync_each = fsync_each
+
+        self._cond = threading.Condition()
+        self._pending: Deque[OccupancyEventIn] = deque()
+        # Claves aceptadas y aún sin confirmar en BD. No van a ``recent_event_keys``
+        # hasta el commit: la ingesta por lotes las tomaría por duplicados
+        self._accepted_keys: Set[Hashable] = set()
+        # Lote tomado por el flusher y aún no confirmado, con sus segmentos de log
+        self._inflight: List[OccupancyEventIn] = []
+        self._inflight_segments: List[str] = []
+        self._closed_segments: List[str] = []
+        self._segment = None
+        self._segment_path: Optional[str] = None
+        self._segment_seq = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.accepted = 0
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+
+    # --- API pública -------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._replay_segments()
+            self._open_segment()
+        self._thread = threading.Thread(target=self._flush_loop, name="occupancy-write-behind", daemon=True)
+        self._thread.start()
+        logger.info("Occupancy write-behind buffer started (log dir: %s)", self.log_dir or "memory only")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Detiene el flusher tras vaciar todo lo pendiente."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        if self.pending_count():
+            logger.warning("Write-behind stopped with %s events still pending", self.pending_count())
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+            if os.path.getsize(self._segment_path) == 0:
+                os.remove(self._segment_path)
+
+    def submit(self, event: OccupancyEventIn) -> bool:
+        """
+        Acepta el evento para escritura diferida. Devuelve False si es un
+        duplicado reciente; lanza ``IngestionBufferFull`` si se alcanzó el
+        límite de memoria (el cliente debe reintentar).
+        """
+        key = dedup_key(event)
+        if key is None:
+            # Clave propia: un reintento tras una caída (replay del log) no duplica el evento
+            event = event.model_copy(update={"event_id": uuid.uuid4().hex})
+            key = dedup_key(event)
+        elif recent_event_keys.seen(key):
+            return False
+        line = event.model_dump_json() + "\n" if self.log_dir else None
+        with self._cond:
+            if key is not None and key in self._accepted_keys:
+                return False
+            if len(self._pending) + len(self._inflight) >= self.max_pending:
+                raise IngestionBufferFull("El buffer de ingesta está lleno, reintenta más tarde")
+            if self._stopping:
+                raise IngestionBufferFull("El buffer de ingesta se está deteniendo")
+            if line is not None:
+                self._segment.write(line)
+                self._segment.flush()
+                if self.fsync_each:
+                    os.fsync(self._segment.fileno())
+            self._pending.append(event)
+            self.accepted += 1
+            if key is not None:
+                # Ya aceptado (y en el log): los reintentos del cliente se descartan aquí
+                self._accepted_keys.add(key)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending) + len(self._inflight)
+
+    def describe(self) -> dict:
+        with self._cond:
+            return {
+                "running": self.running,
+                "pending": len(self._pending) + len(self._inflight),
+                "accepted": self.accepted,
+                "flushed": self.flushed,
+                "failed_flushes": self.failed_flushes,
+                "dead_lettered": self.dead_lettered,
+                "log_dir": self.log_dir,
+            }
+
+    # --- log local ---------------------------------------------------------
+
+    def _open_segment(self) -> None:
+        self._segment_seq += 1
+        self._segment_path = os.path.join(self.log_dir, f"wal-{time.time_ns():020d}-{self._segment_seq:06d}.log")
+        self._segment = open(self._segment_path, "a", encoding="utf-8")
+
+    def _rotate_segment(self) -> None:
+        """Cierra el segmento actual (con fsync) y abre uno nuevo. Con el lock tomado."""
+        if self._segment is None:
+            return
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._segment.close()
+        self._closed_segments.append(self._segment_path)
+        self._open_segment()
+
+    def _replay_segments(self) -> None:
+        segments = sorted(glob.glob(os.path.join(self.log_dir, "wal-*.log")))
+        replayed = 0
+        for path in segments:
+            with open(path, encoding="utf-8") as fh:
+                for number, line in enumerate(fh, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        event = OccupancyEventIn.model_validate_json(line)
+                    except ValidationError:
+                        # Última línea cortada por la caída
+                        logger.warning("Skipping unreadable write-behind record %s:%s", path, number)
+                        continue
+                    self._inflight.append(event)
+                    key = dedup_key(event)
+                    if key is not None:
+                        self._accepted_keys.add(key)
+                    replayed += 1
+            self._inflight_segments.append(path)
+        if replayed:
+            logger.info("Replaying %s occupancy events from %s write-behind segments", replayed, len(segments))
+
+    # --- vaciado -----------------------------------------------------------
+
+    def _flush_loop(self) -> None:
+        backoff = self.flush_interval
+        while True:
+            with self._cond:
+                if not self._inflight:
+                    self._cond.wait_for(
+                        lambda: self._stopping or len(self._pending) >= self.batch_size,
+                        timeout=self.flush_interval,
+                    )
+                    if not self._pending and self._stopping:
+                        return
+                    if self._pending:
+                        self._take_batch()
+            if not self._inflight:
+                continue
+
+            if self._write_inflight():
+                backoff = self.flush_interval
+                continue
+            # BD caída: se reintenta el mismo lote con espera creciente
+            with self._cond:
+                if self._stopping:
+                    return
+                self._cond.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _take_batch(self) -> None:
+        """Pasa lo pendiente a ``_inflight``. Con el lock tomado."""
+        if self.log_dir:
+            self._rotate_segment()
+            self._inflight_segments.extend(self._closed_segments)
+            self._closed_segments = []
+        self._inflight = list(self._pending)
+        self._pending.clear()
+
+    def _write_inflight(self) -> bool:
+        """
+        Escribe ``_inflight`` por sub-lotes, cada uno en su transacción, y lo
+        va recortando según se confirma: un reintento solo reenvía lo que aún
+        no está en BD. Devuelve False ante un error de conexión.
+        """
+        while True:
+            with self._cond:
+                chunk = self._inflight[:self.batch_size]
+            if not chunk:
+                break
+            try:
+                self._commit(chunk)
+            except Exception as exc:  # noqa: BLE001 - se clasifica abajo
+                if _is_transient(exc):
+                    return self._flush_failed(exc)
+                logger.warning(
+                    "Write-behind batch of %s occupancy events rejected (%s); retrying one by one",
+                    len(chunk), exc.__class__.__name__,
+                )
+                for event in chunk:
+                    try:
+                        self._commit([event])
+                    except Exception as exc:  # noqa: BLE001
+                        if _is_transient(exc):
+                            return self._flush_failed(exc)
+                        self._dead_letter(event, exc)
+                        self._mark_written(1, stored=False)
+                        continue
+                    self._mark_written(1)
+                continue
+            self._mark_written(len(chunk))
+
+        with self._cond:
+            segments, self._inflight_segments = self._inflight_segments, []
+            self._cond.notify_all()
+        self._discard_segments(segments)
+        return True
+
+    @staticmethod
+    def _commit(events: List[OccupancyEventIn]) -> None:
+        db = SessionLocal()
+        try:
+            ingest_occupancy_batch(db, events)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _mark_written(self, count: int, stored: bool = True) -> None:
+        """Saca del lote los ``count`` primeros eventos, ya confirmados o apartados."""
+        with self._cond:
+            done, self._inflight = self._inflight[:count], self._inflight[count:]
+            if stored:
+                self.flushed += count
+            else:
+                self.dead_lettered += count
+            # ``ingest_occupancy_batch`` ya pasó las claves a ``recent_event_keys``
+            for event in done:
+                key = dedup_key(event)
+                if key is not None:
+                    self._accepted_keys.discard(key)
+
+    def _flush_failed(self, exc: Exception) -> bool:
+        self.failed_flushes += 1
+        logger.error(
+            "Write-behind flush failed (%s: %s); %s occupancy events kept for retry",
+            exc.__class__.__name__, exc, len(self._inflight),
+        )
+        return False
+
+    def _dead_letter(self, event: OccupancyEventIn, exc: Exception) -> None:
+        logger.error("Occupancy event for bus %s rejected by the database: %s", event.bus_id, exc)
+        if not self.dead_letter_path:
+            return
+        record = {
+            "failed_at": datetime.utcnow().isoformat(),
+            "error": f"{exc.__class__.__name__}: {exc}",
+            "event": json.loads(event.model_dump_json()),
+        }
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        with open(self.dead_letter_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+    @staticmethod
+    def _discard_segments(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _is_transient(exc: Exception) -> bool:
+    """Errores de conexión/servidor: el mismo lote puede entrar al reintentar."""
+    if isinstance(exc, (OperationalError, InterfaceError, DisconnectionError)):
+        return True
+    return bool(getattr(exc, "connection_invalidated", False))
+
+
+def _create_buffer() -> WriteBehindBuffer:
+    return WriteBehindBuffer(
+        log_dir=settings.OCCUPANCY_WRITE_BEHIND_LOG_DIR,
+        batch_size=settings.OCCUPANCY_WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=settings.OCCUPANCY_WRITE_BEHIND_FLUSH_SECONDS,
+        max_pending=settings.OCCUPANCY_WRITE_BEHIND_MAX_PENDING,
+        fsync_each=settings.OCCUPANCY_WRITE_BEHIND_FSYNC_EACH,
+        dead_letter_path=settings.OCCUPANCY_WRITE_BEHIND_DEAD_LETTER_PATH,
+    )
+
+
+occupancy_write_behind = _create_buffer()
+
+
+def start_write_behind() -> None:
+    if settings.OCCUPANCY_WRITE_BEHIND_ENABLED:
+        occupancy_write_behind.start()
+
+
+def stop_write_behind() -> None:
+    if occupancy_write_behind.running:
+        occupancy_write_behind.stop()
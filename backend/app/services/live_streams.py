@@ -0,0 +1,407 @@
+import fnmatch
+import ipaddress
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import cv2
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.schemas.occupancy import OccupancyEventIn
+from app.services.occupancy_ingestion import ingest_occupancy_event
+from app.services.inference_scheduler import PRIORITY_LIVE
+from app.services.roi import DEFAULT_IMGSZ, InferenceRegion
+from app.services.tracking import CountSmoother
+from app.services.video_processing import extract_detections, get_model, inference_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class LiveStreamError(Exception):
+    pass
+
+
+def _host_allowed(host: str, patterns: List[str]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        address = None
+    for pattern in patterns:
+        try:
+            network = ipaddress.ip_network(pattern, strict=False)
+        except ValueError:
+            # Nombre: solo contra nombres, nunca contra una IP literal
+            if address is None and fnmatch.fnmatchcase(host, pattern.lower()):
+                return True
+            continue
+        if address is not None and address in network:
+            return True
+    return False
+
+
+def check_source(source: str) -> None:
+    """
+    El servidor abre ``source`` con OpenCV/FFmpeg, así que solo se aceptan
+    URLs con esquema y host en ``LIVE_ALLOWED_SCHEMES``/``LIVE_ALLOWED_HOSTS``
+    o archivos dentro de ``LIVE_ALLOWED_FILE_DIRS``.
+    """
+    if "://" in source:
+        parts = urlsplit(source)
+        host = (parts.hostname or "").lower()
+        if parts.scheme.lower() not in settings.LIVE_ALLOWED_SCHEMES or not host:
+            raise LiveStreamError("Esquema de origen no permitido")
+        if not _host_allowed(host, settings.LIVE_ALLOWED_HOSTS):
+            raise LiveStreamError(f"Host de origen no permitido: {host}")
+        return
+    path = os.path.realpath(source)
+    for directory in settings.LIVE_ALLOWED_FILE_DIRS:
+        root = os.path.realpath(directory)
+        if os.path.commonpath([path, root]) == root:
+            if not os.path.isfile(path):
+                raise LiveStreamError("El archivo de origen no existe")
+            return
+    raise LiveStreamError("Ruta de origen fuera de los directorios permitidos")
+
+
+class LatestFrameBuffer:
+    """
+    Buffer acotado de frames. El consumidor siempre toma el más reciente y
+    descarta el resto: si la inferencia va más lenta que la cámara se pierden
+    frames intermedios, nunca se acumula retraso.
+    """
+
+    def __init__(self, maxlen: int):
+        self._frames: Deque[Tuple[float, Any]] = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, frame) -> None:
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append((time.monotonic(), frame))
+            self._cond.notify()
+
+    def get_latest(self, timeout: float, max_age: float) -> Optional[Tuple[float, Any]]:
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._frames) > 0, timeout=timeout):
+                return None
+            captured_at, frame = self._frames.pop()
+            self.dropped += len(self._frames)
+            self._frames.clear()
+        if time.monotonic() - captured_at > max_age:
+            self.dropped += 1
+            return None
+        return captured_at, frame
+
+
+class InferenceBudget:
+    """
+    Presupuesto fijo de inferencia por nodo, repartido entre todos los streams
+    activos: como máximo ``total_fps`` inferencias por segundo en total y
+    ``max_concurrent`` ejecutándose a la vez.
+    """
+
+    def __init__(self, total_fps: float, max_concurrent: int, max_fps_per_stream: float):
+        self.total_fps = total_fps
+        self.max_fps_per_stream = max_fps_per_stream
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def interval_for(self, active_streams: int) -> float:
+        share = self.total_fps / max(active_streams, 1)
+        return 1.0 / min(share, self.max_fps_per_stream)
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._semaphore.release()
+
+
+def infer_person_count(
+    frame, source_id: str, budget: InferenceBudget, imgsz: int = DEFAULT_IMGSZ
+) -> int:
+    if settings.INFERENCE_BATCHING_ENABLED:
+        # El planificador limita la concurrencia y da prioridad a lo en vivo
+        results = inference_scheduler.infer(
+            frame, source_id=source_id, priority=PRIORITY_LIVE, batch_key=imgsz
+        )
+    else:
+        with budget:
+            results = get_model()(frame, imgsz=imgsz, conf=0.3, verbose=False)[0]
+    _, persons = extract_detections(results)
+    return persons
+
+
+class LiveStream:
+    """Un stream en vivo: hilo lector (cámara/archivo) + hilo de inferencia."""
+
+    def __init__(
+        self,
+        manager: "LiveStreamManager",
+        bus_id: int,
+        source: str,
+        route_id: Optional[int] = None,
+        realtime: bool = True,
+        loop: bool = False,
+        region: Optional[InferenceRegion] = None,
+    ):
+        self.stream_id = uuid.uuid4().hex
+        self.manager = manager
+        self.bus_id = bus_id
+        self.route_id = route_id
+        self.source = source
+        self.is_file = "://" not in source
+        self.realtime = realtime
+        self.loop = loop
+        self.region = region
+        self.imgsz = region.imgsz if region else DEFAULT_IMGSZ
+
+        self.buffer = LatestFrameBuffer(settings.LIVE_FRAME_BUFFER_SIZE)
+        self.smoother = CountSmoother(settings.LIVE_SMOOTHING_WINDOW)
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.frames_read = 0
+        self.inferences = 0
+        self.last_raw_count: Optional[int] = None
+        self.last_count: Optional[int] = None
+        self.last_emitted_at: Optional[datetime] = None
+        self._last_emit_monotonic = 0.0
+
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._read_loop, name=f"live-read-{self.stream_id}", daemon=True),
+            threading.Thread(target=self._infer_loop, name=f"live-infer-{self.stream_id}", daemon=True),
+        ]
+
+    # --- ciclo de vida -----------------------------------------------------
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+        if self.status not in ("finished", "failed"):
+            self.status = "stopped"
+
+    @property
+    def running(self) -> bool:
+        return not self._stop.is_set()
+
+    # --- lectura -----------------------------------------------------------
+
+    def _open_capture(self):
+        cap = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            # RTSP: no queremos que OpenCV acumule su propio backlog
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _read_loop(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            cap = self._open_capture()
+            if not cap.isOpened():
+                cap.release()
+                if self.is_file:
+                    self._fail("No se pudo abrir el video de origen")
+                    return
+                logger.warning("Stream %s: cannot open %s, retrying in %.0fs", self.stream_id, self.source, backoff)
+                self.status = "reconnecting"
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, settings.LIVE_RECONNECT_MAX_SECONDS)
+                continue
+
+            backoff = 1.0
+            self.status = "running"
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25
+            prepared_region = None
+            if self.region:
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                prepared_region = self.region.prepare(width, height)
+            started = time.monotonic()
+            frame_index = 0
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if self.is_file and self.realtime:
+                    # Reproducir el archivo a velocidad real, como una cámara
+                    delay = started + frame_index / fps - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                frame_index += 1
+                self.frames_read += 1
+                # Se recorta al leer: el buffer solo guarda la ROI
+                self.buffer.put(prepared_region.apply(frame) if prepared_region else frame)
+            cap.release()
+
+            if self._stop.is_set():
+                return
+            if self.is_file and not self.loop:
+                self.status = "finished"
+                self._stop.set()
+                return
+            if not self.is_file:
+                logger.warning("Stream %s: lost connection to %s", self.stream_id, self.source)
+                self.status = "reconnecting"
+
+    # --- inferencia --------------------------------------------------------
+
+    def _infer_loop(self) -> None:
+        budget = self.manager.budget
+        next_due = time.monotonic()
+        while not self._stop.is_set():
+            wait = next_due - time.monotonic()
+            if wait > 0 and self._stop.wait(wait):
+                return
+            next_due = time.monotonic() + budget.interval_for(self.manager.active_count())
+
+            item = self.buffer.get_latest(timeout=1.0, max_age=settings.LIVE_MAX_FRAME_AGE_SECONDS)
+            if item is None:
+                continue
+            _, frame = item
+            try:
+                raw_count = infer_person_count(
+                    frame, f"stream:{self.stream_id}", budget, imgsz=self.imgsz
+                )
+            except Exception as exc:  # noqa: BLE001 - el stream no debe morir por un frame
+                logger.exception("Stream %s: inference failed", self.stream_id)
+                self.error = str(exc)
+                continue
+
+            self.inferences += 1
+            self.last_raw_count = raw_count
+            self._maybe_emit(self.smoother.update(raw_count), raw_count)
+
+    def _maybe_emit(self, count: int, raw_count: int) -> None:
+        now = time.monotonic()
+        heartbeat_due = now - self._last_emit_monotonic >= settings.LIVE_EMIT_HEARTBEAT_SECONDS
+        if count == self.last_count and not heartbeat_due:
+            return
+
+        event = OccupancyEventIn(
+            bus_id=self.bus_id,
+            route_id=self.route_id,
+            timestamp=datetime.utcnow(),
+            total_passengers=count,
+            source_id=f"stream:{self.stream_id}",
+            raw_json={"raw_count": raw_count, "source": "live_stream"},
+        )
+        db = SessionLocal()
+        try:
+            ingest_occupancy_event(db, event)
+        except Exception as exc:  # noqa: BLE001
+            db.rollback()
+            logger.exception("Stream %s: could not ingest occupancy event", self.stream_id)
+            self.error = str(exc)
+            return
+        finally:
+            db.close()
+
+        self.last_count = count
+        self.last_emitted_at = event.timestamp
+        self._last_emit_monotonic = now
+
+    def _fail(self, message: str) -> None:
+        logger.error("Stream %s failed: %s", self.stream_id, message)
+        self.status = "failed"
+        self.error = message
+        self._stop.set()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "stream_id": self.stream_id,
+            "bus_id": self.bus_id,
+            "route_id": self.route_id,
+            "source": self.source,
+            "status": self.status,
+            "frames_read": self.frames_read,
+            "frames_dropped": self.buffer.dropped,
+            "inferences": self.inferences,
+            "last_raw_count": self.last_raw_count,
+            "last_count": self.last_count,
+            "last_emitted_at": self.last_emitted_at,
+            "error": self.error,
+        }
+
+
+class LiveStreamManager:
+    def __init__(self):
+        self.budget = InferenceBudget(
+            total_fps=settings.LIVE_INFERENCE_TOTAL_FPS,
+            max_concurrent=settings.LIVE_INFERENCE_MAX_CONCURRENT,
+            max_fps_per_stream=settings.LIVE_INFERENCE_MAX_FPS_PER_STREAM,
+        )
+        self._streams: Dict[str, LiveStream] = {}
+        self._lock = threading.Lock()
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for s in self._streams.values() if s.running)
+
+    def start_stream(
+        self,
+        bus_id: int,
+        source: str,
+        route_id: Optional[int] = None,
+        realtime: bool = True,
+        loop: bool = False,
+        region: Optional[InferenceRegion] = None,
+    ) -> LiveStream:
+        check_source(source)
+        with self._lock:
+            active = [s for s in self._streams.values() if s.running]
+            if len(active) >= settings.LIVE_MAX_STREAMS:
+                raise LiveStreamError("Se alcanzó el máximo de streams por nodo")
+            if any(s.bus_id == bus_id for s in active):
+                raise LiveStreamError(f"El bus {bus_id} ya tiene un stream activo")
+            stream = LiveStream(
+                self,
+                bus_id,
+                source,
+                route_id=route_id,
+                realtime=realtime,
+                loop=loop,
+                region=region,
+            )
+            self._streams[stream.stream_id] = stream
+        stream.start()
+        logger.info("Started live stream %s for bus %s from %s", stream.stream_id, bus_id, source)
+        return stream
+
+    def get(self, stream_id: str) -> Optional[LiveStream]:
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def list(self) -> List[LiveStream]:
+        with self._lock:
+            return list(self._streams.values())
+
+    def stop_stream(self, stream_id: str) -> Optional[LiveStream]:
+        with self._lock:
+            stream = self._streams.pop(stream_id, None)
+        if stream:
+            stream.stop()
+            logger.info("Stopped live stream %s", stream_id)
+        return stream
+
+    def stop_all(self) -> None:
+        for stream in self.list():
+            self.stop_stream(stream.stream_id)
+
+
+live_stream_manager = LiveStreamManager()
@@ -0,0 +1,221 @@
+import logging
+import os
+import shutil
+import struct
+import subprocess
+from typing import List, Optional, Tuple
+
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Átomos MP4 que contienen otros átomos y que hay que recorrer hasta stco/co64
+_CONTAINER_ATOMS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Post-procesado de salidas: faststart (moov al inicio) y segmentos HLS
+# ---------------------------------------------------------------------------
+
+
+def _read_top_level_atoms(fh, file_size: int) -> List[Tuple[bytes, int, int]]:
+    atoms: List[Tuple[bytes, int, int]] = []
+    offset = 0
+    while offset + 8 <= file_size:
+        fh.seek(offset)
+        size, atom_type = struct.unpack(">I4s", fh.read(8))
+        if size == 1:
+            (size,) = struct.unpack(">Q", fh.read(8))
+        elif size == 0:
+            size = file_size - offset
+        if size < 8:
+            raise ValueError(f"Átomo MP4 inválido en offset {offset}")
+        atoms.append((atom_type, offset, size))
+        offset += size
+    return atoms
+
+
+def _patch_chunk_offsets(moov: bytearray, start: int, end: int, shift: int) -> None:
+    """Suma ``shift`` a todos los offsets de stco/co64 dentro de [start, end)."""
+    offset = start
+    while offset + 8 <= end:
+        size, atom_type = struct.unpack_from(">I4s", moov, offset)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", moov, offset + 8)
+            header = 16
+        if size < header or offset + size > end:
+            raise ValueError("Átomo MP4 inválido dentro de moov")
+
+        if atom_type in _CONTAINER_ATOMS:
+            _patch_chunk_offsets(moov, offset + header, offset + size, shift)
+        elif atom_type in (b"stco", b"co64"):
+            (count,) = struct.unpack_from(">I", moov, offset + header + 4)
+            entry_fmt, entry_size = (">I", 4) if atom_type == b"stco" else (">Q", 8)
+            entries_start = offset + header + 8
+            for i in range(count):
+                pos = entries_start + i * entry_size
+                (value,) = struct.unpack_from(entry_fmt, moov, pos)
+                value += shift
+                if atom_type == b"stco" and value > 0xFFFFFFFF:
+                    raise OverflowError("stco no admite offsets de 64 bits")
+                struct.pack_into(entry_fmt, moov, pos, value)
+        offset += size
+
+
+def _copy_range(src, dst, offset: int, length: int) -> None:
+    src.seek(offset)
+    remaining = length
+    while remaining > 0:
+        block = src.read(min(_COPY_BLOCK_SIZE, remaining))
+        if not block:
+            break
+        dst.write(block)
+        remaining -= len(block)
+
+
+def apply_faststart(path: str) -> bool:
+    """
+    Reubica el átomo ``moov`` delante de ``mdat`` (equivalente a
+    ``qt-faststart``) para que el navegador pueda empezar a reproducir sin
+    descargar el final del archivo. Devuelve True si se reescribió.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as fh:
+        atoms = _read_top_level_atoms(fh, file_size)
+        types = [atom[0] for atom in atoms]
+        if b"moov" not in types or b"mdat" not in types:
+            return False
+        moov_index = types.index(b"moov")
+        mdat_index = types.index(b"mdat")
+        if moov_index < mdat_index:
+            return False  # ya optimizado
+
+        _, moov_offset, moov_size = atoms[moov_index]
+        fh.seek(moov_offset)
+        moov = bytearray(fh.read(moov_size))
+        moov_header = 16 if struct.unpack_from(">I", moov, 0)[0] == 1 else 8
+        _patch_chunk_offsets(moov, moov_header, len(moov), moov_size)
+
+        tmp_path = f"{path}.faststart"
+        try:
+            with open(tmp_path, "wb") as out:
+                for atom_type, offset, size in atoms[:mdat_index]:
+                    _copy_range(fh, out, offset, size)
+                out.write(moov)
+                for atom_type, offset, size in atoms[mdat_index:]:
+                    if atom_type != b"moov":
+                        _copy_range(fh, out, offset, size)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    return True
+
+
+def hls_dir_for(video_path: str) -> str:
+    stem, _ = os.path.splitext(video_path)
+    return f"{stem}_hls"
+
+
+def segment_to_hls(video_path: str) -> Optional[str]:
+    """
+    Genera una playlist HLS VOD (``index.m3u8`` + segmentos ``.ts``) junto al
+    video, sin recodificar. Requiere ``ffmpeg``; si no está disponible
+    devuelve None.
+    """
+    ffmpeg = shutil.which(settings.FFMPEG_BINARY)
+    if not ffmpeg:
+        logger.warning("ffmpeg not found, skipping HLS segmentation for %s", video_path)
+        return None
+
+    output_dir = hls_dir_for(video_path)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir, exist_ok=True)
+    playlist_path = os.path.join(output_dir, "index.m3u8")
+    command = [
+        ffmpeg,
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        video_path,
+        "-c",
+        "copy",
+        "-f",
+        "hls",
+        "-hls_time",
+        str(settings.MEDIA_HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_filename",
+        os.path.join(output_dir, "seg_%05d.ts"),
+        playlist_path,
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        logger.warning("HLS segmentation failed for %s: %s", video_path, completed.stderr)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return None
+    return playlist_path
+
+
+def prepare_for_delivery(video_path: str) -> Optional[str]:
+    """
+    Post-procesa un MP4 recién escrito por ``cv2.VideoWriter``: faststart y,
+    si está habilitado, segmentos HLS. Devuelve la ruta de la playlist HLS o
+    None. Los fallos se registran pero nunca invalidan el video original.
+    """
+    if settings.MEDIA_FASTSTART_ENABLED:
+        try:
+            if apply_faststart(video_path):
+                logger.info("Applied faststart to %s", video_path)
+        except (OSError, ValueError, OverflowError, struct.error) as exc:
+            logger.warning("Could not apply faststart to %s: %s", video_path, exc)
+
+    if settings.MEDIA_HLS_ENABLED:
+        return segment_to_hls(video_path)
+    return None
+
+
+def media_url_for(path: str) -> str:
+    """Convierte una ruta bajo MEDIA_ROOT en su URL pública ``/media/...``."""
+    relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+    return f"/media/{relative}"
+
+
+def media_path_for(url: str) -> Optional[str]:
+    """Inversa de ``media_url_for``: ruta local de una URL ``/media/...``."""
+    if not url or not url.startswith("/media/"):
+        return None
+    return os.path.join(settings.MEDIA_ROOT, *url[len("/media/"):].split("/"))
+
+
+# ---------------------------------------------------------------------------
+# Entrega: StaticFiles con cabeceras de caché
+# ---------------------------------------------------------------------------
+
+
+class MediaStaticFiles(StaticFiles):
+    """
+    ``StaticFiles`` para ``/media``. Los Range (scrubbing del video sin
+    descargarlo entero), If-Range y 416 los resuelve ``FileResponse``; aquí
+    solo se añade ``Cache-Control``: público y revalidable por ETag para los
+    videos procesados, ``no-store`` para el resto (subidas originales).
+    """
+
+    public_cache_dirs = ("processed_videos",)
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        relative = os.path.relpath(full_path, os.path.realpath(self.directory)).replace(os.sep, "/")
+        if relative.split("/", 1)[0] in self.public_cache_dirs:
+            response.headers["cache-control"] = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+        else:
+            response.headers["cache-control"] = "private, no-store"
+        return response
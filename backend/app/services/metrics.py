@@ -0,0 +1,237 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Contador monotónico con etiquetas (formato de exposición de Prometheus)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos y etiquetas."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [conteos por bucket..., +Inf], suma
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[labels] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def collect(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.register(
+    Histogram(
+        "cpatbus_http_request_duration_seconds",
+        "Latencia de las peticiones HTTP por ruta.",
+        ("method", "route", "status"),
+    )
+)
+DB_QUERIES = registry.register(
+    Counter(
+        "cpatbus_db_queries_total",
+        "Consultas SQL ejecutadas, por ruta HTTP (solo con profiling activo).",
+        ("route",),
+    )
+)
+STAGE_LATENCY = registry.register(
+    Histogram(
+        "cpatbus_pipeline_stage_duration_seconds",
+        "Duración de cada etapa del pipeline de video (solo con profiling activo).",
+        ("stage",),
+    )
+)
+OCCUPANCY_DUPLICATES = registry.register(
+    Counter(
+        "cpatbus_occupancy_duplicates_total",
+        "Eventos de ocupación repetidos descartados, por capa (memory / database).",
+        ("layer",),
+    )
+)
+
+# --- profiling conmutable en caliente -------------------------------------
+
+_profiling = settings.PROFILING_ENABLED
+
+
+def profiling_enabled() -> bool:
+    return _profiling
+
+
+def set_profiling(enabled: bool) -> None:
+    global _profiling
+    _profiling = bool(enabled)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_LATENCY.observe(seconds, name)
+
+
+# --- consultas SQL por petición ---------------------------------------------
+
+_request_queries: ContextVar[Optional[List[int]]] = ContextVar("request_queries", default=None)
+
+
+def _count_query(*_args, **_kwargs) -> None:
+    # El contador es mutable: el contexto copiado al threadpool lo comparte
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def instrument_engine(engine) -> None:
+    from sqlalchemy import event
+
+    if not event.contains(engine, "before_cursor_execute", _count_query):
+        event.listen(engine, "before_cursor_execute", _count_query)
+
+
+@contextmanager
+def count_queries() -> Iterator[List[int]]:
+    """
+    Cuenta las consultas SQL ejecutadas dentro del bloque (y en el threadpool
+    que este lance) sobre un engine instrumentado; el total queda en ``[0]``.
+    """
+    counter = [0]
+    token = _request_queries.set(counter)
+    try:
+        yield counter
+    finally:
+        _request_queries.reset(token)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia por ruta (plantilla de path, no la URL con ids)
+    y, con profiling activo, número de consultas SQL por ruta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        counter = [0] if _profiling else None
+        token = _request_queries.set(counter) if counter is not None else None
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            if token is not None:
+                _request_queries.reset(token)
+                # Un count_queries() exterior (p. ej. la prueba de carga) también las ve
+                outer = _request_queries.get()
+                if outer is not None:
+                    outer[0] += counter[0]
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or (
+                "/media" if scope["path"].startswith("/media/") else "unmatched"
+            )
+            REQUEST_LATENCY.observe(elapsed, scope["method"], route_label, str(status["code"]))
+            if counter is not None:
+                DB_QUERIES.inc(counter[0], route_label)
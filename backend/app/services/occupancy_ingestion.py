@@ -0,0 +1,235 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.bus import Bus
+from app.models.bus_state import BusState
+from app.models.occupancy_event import OccupancyEvent
+from app.schemas.occupancy import OccupancyEventIn
+from app.services.alerts import evaluate_event
+from app.services.geo_index import bus_positions
+from app.services.metrics import OCCUPANCY_DUPLICATES
+from app.services.route_aggregates import route_aggregates, route_assignments
+
+
+def map_occupancy_level(total_passengers: int, max_capacity: int) -> str:
+    # Puedes parametrizar estos umbrales luego
+    if total_passengers <= 9:
+        return "POCA"
+    elif total_passengers <= 22:
+        return "MEDIA"
+    return "LLENA"
+
+
+class RecentKeyFilter:
+    """
+    Claves de eventos ingeridos recientemente (LRU acotado a ``max_size``,
+    con caducidad ``ttl``). Descarta en memoria la mayoría de los reintentos
+    antes de llegar a la BD; el índice único sigue siendo la garantía.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._keys: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            added_at = self._keys.get(key)
+            if added_at is None:
+                return False
+            if now - added_at > self.ttl:
+                del self._keys[key]
+                return False
+            return True
+
+    def add(self, key: Hashable) -> None:
+        with self._lock:
+            self._keys[key] = time.monotonic()
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+
+recent_event_keys = RecentKeyFilter(
+    max_size=settings.OCCUPANCY_DEDUP_CACHE_SIZE,
+    ttl=settings.OCCUPANCY_DEDUP_TTL_SECONDS,
+)
+
+
+def dedup_key(event: OccupancyEventIn) -> Optional[Hashable]:
+    """
+    Clave de idempotencia: (bus_id, event_id) si el cliente envía un id (un
+    reintento puede traer otro timestamp), si no (source_id, bus_id,
+    timestamp). Sin ninguno de los dos no se deduplica.
+    """
+    if event.event_id:
+        return ("event", event.bus_id, event.event_id)
+    if event.source_id:
+        return ("source", event.source_id, event.bus_id, event.timestamp)
+    return None
+
+
+def _insert_event(db: Session, values: dict) -> bool:
+    """INSERT con semántica de conflicto-ignorado; False si ya existía."""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(OccupancyEvent).values(**values).on_conflict_do_nothing()
+        return db.execute(statement).rowcount > 0
+    try:
+        with db.begin_nested():
+            db.add(OccupancyEvent(**values))
+        return True
+    except IntegrityError:
+        return False
+
+
+def _resolve_route_id(db: Session, event: OccupancyEventIn) -> Optional[int]:
+    """La ruta del evento o, si no la trae, la asignada al bus en ese momento."""
+    if event.route_id is not None:
+        return event.route_id
+    return route_assignments.resolve(db, event.bus_id, event.timestamp)
+
+
+def _event_values(event: OccupancyEventIn, route_id: Optional[int]) -> dict:
+    return dict(
+        bus_id=event.bus_id,
+        route_id=route_id,
+        timestamp=event.timestamp,
+        boarded=event.boarded,
+        alighted=event.alighted,
+        total_passengers=event.total_passengers,
+        latitude=event.latitude,
+        longitude=event.longitude,
+        source_id=event.source_id,
+        event_id=event.event_id,
+        raw_json=event.raw_json,
+    )
+
+
+def _update_bus_state(db: Session, event: OccupancyEventIn, route_id: Optional[int]) -> int:
+    """Actualiza (o crea) el estado en tiempo real del bus; devuelve su ``max_capacity``."""
+    bus_state = db.query(BusState).filter(BusState.bus_id == event.bus_id).first()
+    if not bus_state:
+        bus_state = BusState(
+            bus_id=event.bus_id,
+            last_update=event.timestamp,
+            total_passengers=event.total_passengers,
+            occupancy_level="POCA",  # se recalcula luego
+            latitude=event.latitude,
+            longitude=event.longitude,
+            route_id=route_id,
+            status="online",
+            updated_at=datetime.utcnow(),
+        )
+        db.add(bus_state)
+
+    # Para obtener max_capacity real deberíamos join con Bus
+    bus = db.query(Bus).filter(Bus.id == event.bus_id).first()
+    max_capacity = bus.max_capacity if bus else 50
+
+    bus_state.total_passengers = event.total_passengers
+    bus_state.last_update = event.timestamp
+    bus_state.latitude = event.latitude
+    bus_state.longitude = event.longitude
+    bus_state.route_id = route_id
+    bus_state.occupancy_level = map_occupancy_level(event.total_passengers, max_capacity)
+    bus_state.updated_at = datetime.utcnow()
+    return max_capacity
+
+
+def _after_commit(event: OccupancyEventIn, route_id: Optional[int], max_capacity: int) -> None:
+    """Vistas en memoria derivadas del evento ya confirmado."""
+    bus_positions.update(event.bus_id, event.latitude, event.longitude, event.timestamp)
+    route_aggregates.update(
+        event.bus_id,
+        route_id,
+        event.total_passengers,
+        max_capacity,
+        map_occupancy_level(event.total_passengers, max_capacity),
+        event.timestamp,
+    )
+
+
+def ingest_occupancy_event(db: Session, event: OccupancyEventIn) -> bool:
+    """
+    Guarda el evento histórico y actualiza ``BusState``. Es el punto único de
+    entrada tanto para dispositivos externos (``/events/occupancy``) como para
+    los streams de video en vivo.
+
+    Es idempotente: un evento repetido (mismo ``event_id`` o mismo
+    ``source_id``/bus/timestamp) no se guarda ni modifica el estado del bus.
+    Devuelve False en ese caso.
+    """
+    key = dedup_key(event)
+    if key is not None and recent_event_keys.seen(key):
+        OCCUPANCY_DUPLICATES.inc(1, "memory")
+        return False
+
+    route_id = _resolve_route_id(db, event)
+
+    # Guardar evento histórico
+    if not _insert_event(db, _event_values(event, route_id)):
+        db.rollback()
+        OCCUPANCY_DUPLICATES.inc(1, "database")
+        if key is not None:
+            recent_event_keys.add(key)
+        return False
+
+    max_capacity = _update_bus_state(db, event, route_id)
+    db.commit()
+    if key is not None:
+        recent_event_keys.add(key)
+    _after_commit(event, route_id, max_capacity)
+    evaluate_event(db, event.bus_id, route_id, event.total_passengers, max_capacity, event.timestamp)
+    return True
+
+
+def ingest_occupancy_batch(db: Session, events: List[OccupancyEventIn]) -> int:
+    """
+    Variante por lotes (escritura diferida): inserta todos los eventos con la
+    misma deduplicación, actualiza ``BusState`` una vez por bus con su último
+    evento del lote y hace un solo commit. Devuelve cuántos se insertaron.
+    """
+    # Cada evento insertado con su ruta resuelta
+    inserted_events: List[Tuple[OccupancyEventIn, Optional[int]]] = []
+    latest: Dict[int, Tuple[OccupancyEventIn, Optional[int]]] = {}
+    inserted_keys: List[Hashable] = []
+    for event in events:
+        key = dedup_key(event)
+        if key is not None and recent_event_keys.seen(key):
+            OCCUPANCY_DUPLICATES.inc(1, "memory")
+            continue
+        route_id = _resolve_route_id(db, event)
+        if not _insert_event(db, _event_values(event, route_id)):
+            OCCUPANCY_DUPLICATES.inc(1, "database")
+            if key is not None:
+                recent_event_keys.add(key)
+            continue
+        inserted_events.append((event, route_id))
+        latest[event.bus_id] = (event, route_id)
+        if key is not None:
+            inserted_keys.append(key)
+
+    capacities = {bus_id: _update_bus_state(db, event, route_id) for bus_id, (event, route_id) in latest.items()}
+    db.commit()
+    for key in inserted_keys:
+        recent_event_keys.add(key)
+    for bus_id, (event, route_id) in latest.items():
+        _after_commit(event, route_id, capacities[bus_id])
+    # Todos los eventos en orden: las reglas sostenidas necesitan la secuencia completa
+    for event, route_id in inserted_events:
+        evaluate_event(
+            db, event.bus_id, route_id, event.total_passengers, capacities[event.bus_id], event.timestamp
+        )
+    return len(inserted_events)
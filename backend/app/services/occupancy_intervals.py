@@ -0,0 +1,159 @@
+"""
+Índice de intervalos de ocupación por sesión de validación.
+
+Al persistir una sesión se guardan los tramos continuos de frames:
+
+- ``over_capacity``: conteo > capacidad declarada.
+- ``threshold``: conteo >= N para cada N entero de 1 al pico de la sesión.
+
+Una búsqueda "conteo >= X" lee directamente los tramos de nivel X, con sus
+propios inicio, fin y duración, sin tocar ``validation_frame_stats``. Con
+conteos de pasajeros el pico es de unas decenas, así que indexar todos los
+niveles cuesta pocas filas por sesión.
+
+Para sesiones procesadas antes de existir el índice (desde ``backend/``)::
+
+    python -m app.services.occupancy_intervals [--session-ids 1,2]
+"""
+import argparse
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.validation import ValidationFrameStat, ValidationOccupancyInterval, ValidationSession
+
+logger = logging.getLogger(__name__)
+
+OVER_CAPACITY = "over_capacity"
+THRESHOLD = "threshold"
+
+# (frame_index, segundos, conteo)
+FramePoint = Tuple[int, float, int]
+
+
+def threshold_levels(peak: int) -> List[int]:
+    return list(range(1, peak + 1))
+
+
+def find_runs(points: Sequence[FramePoint], minimum: int, max_gap: float) -> List[Dict[str, float]]:
+    """
+    Tramos de frames con conteo >= ``minimum``. Dos tramos separados por
+    menos de ``max_gap`` segundos se funden (un frame con un conteo más bajo
+    no parte el intervalo).
+    """
+    runs: List[Dict[str, float]] = []
+    current: Optional[Dict[str, float]] = None
+    for frame_index, seconds, count in points:
+        if count < minimum:
+            continue
+        if current is not None and seconds - current["end_time"] <= max_gap:
+            current["end_frame"] = frame_index
+            current["end_time"] = seconds
+            if count > current["peak_count"]:
+                current["peak_count"] = count
+                current["peak_time"] = seconds
+            continue
+        current = {
+            "start_frame": frame_index,
+            "end_frame": frame_index,
+            "start_time": seconds,
+            "end_time": seconds,
+            "peak_count": count,
+            "peak_time": seconds,
+        }
+        runs.append(current)
+    return runs
+
+
+def build_intervals(
+    session: ValidationSession,
+    points: Sequence[FramePoint],
+    max_gap: Optional[float] = None,
+) -> List[ValidationOccupancyInterval]:
+    max_gap = settings.OCCUPANCY_INTERVAL_MAX_GAP_SECONDS if max_gap is None else max_gap
+    peak = max((count for _, _, count in points), default=0)
+
+    specs = [(THRESHOLD, level, level) for level in threshold_levels(peak)]
+    if session.max_capacity_declared is not None:
+        # "más de la capacidad": conteo >= capacidad + 1
+        specs.append((OVER_CAPACITY, session.max_capacity_declared, session.max_capacity_declared + 1))
+
+    intervals = []
+    for kind, threshold, minimum in specs:
+        for run in find_runs(points, minimum, max_gap):
+            intervals.append(
+                ValidationOccupancyInterval(
+                    validation_session_id=session.id,
+                    bus_id=session.bus_id,
+                    kind=kind,
+                    threshold=threshold,
+                    **run,
+                )
+            )
+    return intervals
+
+
+def timeline_points(timeline: Iterable[dict]) -> List[FramePoint]:
+    """Puntos desde el timeline de ``process_video_with_yolo``."""
+    return [
+        (index, float(frame.get("timestamp") or 0.0), int(frame.get("count") or 0))
+        for index, frame in enumerate(timeline)
+    ]
+
+
+def index_session(db: Session, session: ValidationSession, points: Sequence[FramePoint]) -> int:
+    """Reemplaza los intervalos de la sesión. No hace commit."""
+    db.query(ValidationOccupancyInterval).filter(
+        ValidationOccupancyInterval.validation_session_id == session.id
+    ).delete(synchronize_session=False)
+    intervals = build_intervals(session, points)
+    db.add_all(intervals)
+    return len(intervals)
+
+
+def reindex_session(db: Session, session: ValidationSession) -> int:
+    """Reconstruye los intervalos a partir de ``validation_frame_stats``."""
+    rows = (
+        db.query(
+            ValidationFrameStat.frame_index,
+            ValidationFrameStat.timestamp_relative,
+            ValidationFrameStat.detected_passengers,
+        )
+        .filter(ValidationFrameStat.validation_session_id == session.id)
+        .order_by(ValidationFrameStat.timestamp_relative, ValidationFrameStat.frame_index)
+        .all()
+    )
+    points = [(index or 0, seconds or 0.0, count) for index, seconds, count in rows]
+    return index_session(db, session, points)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Reconstruye el índice de intervalos de ocupación")
+    parser.add_argument("--session-ids", type=lambda value: [int(item) for item in value.split(",") if item])
+    args = parser.parse_args(argv)
+
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[ValidationOccupancyInterval.__table__])
+    db = SessionLocal()
+    summary = {"sessions": 0, "intervals": 0}
+    try:
+        query = db.query(ValidationSession).filter(ValidationSession.status == "COMPLETED")
+        if args.session_ids:
+            query = query.filter(ValidationSession.id.in_(args.session_ids))
+        for session in query.order_by(ValidationSession.id).all():
+            summary["intervals"] += reindex_session(db, session)
+            summary["sessions"] += 1
+            db.commit()
+    finally:
+        db.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Retención del historial crudo de ocupación.
+
+Los eventos más antiguos que ``OCCUPANCY_RAW_RETENTION_DAYS`` se exportan mes
+a mes a archivos JSONL comprimidos con gzip bajo ``OCCUPANCY_ARCHIVE_DIR``, se
+agregan en ``occupancy_rollups_hourly`` y se borran de la tabla. En PostgreSQL
+particionado un mes ya vencido por completo se elimina soltando su partición
+en lugar de borrar fila por fila.
+
+El archivo se escribe (y renombra) antes de la transacción que guarda los
+agregados y borra las filas: si el proceso muere entre ambos pasos la
+siguiente pasada vuelve a exportar esas filas a otro archivo, así que al leer
+los archivos hay que deduplicar por ``id``.
+
+Uso (desde ``backend/``)::
+
+    python -m app.services.occupancy_retention [--dry-run]
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import partitioning
+from app.models.occupancy_event import OccupancyEvent
+from app.models.occupancy_rollup import OccupancyRollupHourly
+
+logger = logging.getLogger(__name__)
+
+RollupKey = Tuple[int, Optional[int], datetime]
+
+
+def _hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _serialize(event: OccupancyEvent) -> Dict[str, Any]:
+    return {
+        "id": event.id,
+        "bus_id": event.bus_id,
+        "route_id": event.route_id,
+        "timestamp": event.timestamp.isoformat(),
+        "boarded": event.boarded,
+        "alighted": event.alighted,
+        "total_passengers": event.total_passengers,
+        "latitude": event.latitude,
+        "longitude": event.longitude,
+        "source_id": event.source_id,
+        "event_id": event.event_id,
+        "raw_json": event.raw_json,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+    }
+
+
+def _accumulate(rollups: Dict[RollupKey, Dict[str, int]], event: OccupancyEvent) -> None:
+    key = (event.bus_id, event.route_id, _hour(event.timestamp))
+    bucket = rollups.get(key)
+    if bucket is None:
+        bucket = rollups[key] = {
+            "samples": 0,
+            "passengers_sum": 0,
+            "passengers_max": 0,
+            "boarded_sum": 0,
+            "alighted_sum": 0,
+        }
+    bucket["samples"] += 1
+    bucket["passengers_sum"] += event.total_passengers
+    bucket["passengers_max"] = max(bucket["passengers_max"], event.total_passengers)
+    bucket["boarded_sum"] += event.boarded or 0
+    bucket["alighted_sum"] += event.alighted or 0
+
+
+def _merge_rollups(db: Session, rollups: Dict[RollupKey, Dict[str, int]]) -> None:
+    for (bus_id, route_id, bucket_start), values in rollups.items():
+        row = (
+            db.query(OccupancyRollupHourly)
+            .filter(
+                OccupancyRollupHourly.bus_id == bus_id,
+                OccupancyRollupHourly.route_id.is_(None)
+                if route_id is None
+                else OccupancyRollupHourly.route_id == route_id,
+                OccupancyRollupHourly.bucket_start == bucket_start,
+            )
+            .first()
+        )
+        if row is None:
+            db.add(OccupancyRollupHourly(bus_id=bus_id, route_id=route_id, bucket_start=bucket_start, **values))
+            continue
+        # Eventos tardíos de una hora ya archivada se suman al agregado existente
+        row.samples += values["samples"]
+        row.passengers_sum += values["passengers_sum"]
+        row.passengers_max = max(row.passengers_max, values["passengers_max"])
+        row.boarded_sum += values["boarded_sum"]
+        row.alighted_sum += values["alighted_sum"]
+
+
+def _archive_window(
+    db: Session, start: datetime, end: datetime, archive_dir: str, batch_size: int, dry_run: bool
+) -> Tuple[int, int, Dict[RollupKey, Dict[str, int]], Optional[str]]:
+    """
+    Exporta los eventos de [start, end) a un gzip. Devuelve (filas, último id
+    exportado, agregados, ruta del archivo).
+    """
+    rollups: Dict[RollupKey, Dict[str, int]] = {}
+    path = os.path.join(archive_dir, f"occupancy_events_{start:%Y_%m}_{uuid.uuid4().hex[:8]}.jsonl.gz")
+    tmp_path = f"{path}.part"
+    exported = 0
+    last_id = 0
+
+    fh = None if dry_run else gzip.open(tmp_path, "wt", encoding="utf-8")
+    try:
+        while True:
+            # Paginación por id: memoria acotada a un lote
+            batch = (
+                db.query(OccupancyEvent)
+                .filter(
+                    OccupancyEvent.timestamp >= start,
+                    OccupancyEvent.timestamp < end,
+                    OccupancyEvent.id > last_id,
+                )
+                .order_by(OccupancyEvent.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for event in batch:
+                _accumulate(rollups, event)
+                if fh is not None:
+                    fh.write(json.dumps(_serialize(event), default=str))
+                    fh.write("\n")
+            exported += len(batch)
+            last_id = batch[-1].id
+            db.expunge_all()
+    finally:
+        if fh is not None:
+            fh.close()
+
+    if dry_run:
+        return exported, last_id, rollups, None
+    if not exported:
+        os.remove(tmp_path)
+        return 0, last_id, rollups, None
+    with open(tmp_path, "rb") as raw:
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    return exported, last_id, rollups, path
+
+
+def run_retention(
+    db: Session,
+    now: Optional[datetime] = None,
+    retention_days: Optional[int] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Archiva, agrega y borra los eventos vencidos. Devuelve un resumen por mes."""
+    retention_days = settings.OCCUPANCY_RAW_RETENTION_DAYS if retention_days is None else retention_days
+    now = now or datetime.utcnow()
+    # Cortar en hora exacta: ningún agregado horario queda partido entre pasadas
+    cutoff = _hour(now - timedelta(days=retention_days))
+    archive_dir = settings.OCCUPANCY_ARCHIVE_DIR
+    os.makedirs(archive_dir, exist_ok=True)
+
+    engine = db.get_bind()
+    partitioning.ensure_monthly_partitions(engine, settings.OCCUPANCY_PARTITION_MONTHS_AHEAD, now=now)
+
+    oldest = db.query(OccupancyEvent.timestamp).order_by(OccupancyEvent.timestamp).first()
+    summary: Dict[str, Any] = {"cutoff": cutoff.isoformat(), "dry_run": dry_run, "months": []}
+    if oldest is None or oldest[0] >= cutoff:
+        return summary
+
+    month = partitioning.month_start(oldest[0])
+    while month < cutoff:
+        next_month = partitioning.add_months(month, 1)
+        window_end = min(next_month, cutoff)
+        exported, last_id, rollups, path = _archive_window(
+            db, month, window_end, archive_dir, settings.OCCUPANCY_ARCHIVE_BATCH_SIZE, dry_run
+        )
+        entry = {
+            "month": f"{month:%Y-%m}",
+            "events": exported,
+            "rollup_buckets": len(rollups),
+            "archive": path,
+            "dropped_partition": False,
+        }
+        if exported and not dry_run:
+            _merge_rollups(db, rollups)
+            connection = db.connection()
+            partition = partitioning.partition_name(month)
+            window = (
+                OccupancyEvent.timestamp >= month,
+                OccupancyEvent.timestamp < window_end,
+            )
+            # Filas insertadas durante la exportación no están en el archivo: se quedan
+            late_rows = db.query(OccupancyEvent.id).filter(*window, OccupancyEvent.id > last_id).first()
+            if (
+                next_month <= cutoff
+                and late_rows is None
+                and partitioning.is_partitioned(connection)
+                and partition in {name for name, _ in partitioning.list_partitions(connection)}
+            ):
+                partitioning.drop_partition(connection, partition)
+                entry["dropped_partition"] = True
+            # La partición DEFAULT (o la tabla sin particionar) se limpia por rango
+            db.query(OccupancyEvent).filter(*window, OccupancyEvent.id <= last_id).delete(
+                synchronize_session=False
+            )
+            db.commit()
+            logger.info("Archived %s occupancy events of %s into %s", exported, entry["month"], path)
+        summary["months"].append(entry)
+        month = next_month
+    return summary
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Archivado y retención de occupancy_events")
+    parser.add_argument("--retention-days", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        summary = run_retention(db, retention_days=args.retention_days, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional
+
+from app.core.config import settings
+
+
+class ProgressReporter:
+    """
+    Progreso de un procesamiento en curso. El bucle de frames llama a
+    ``advance`` en cada frame; solo se publica en el store cada
+    ``min_interval`` segundos, así que el coste por frame es una comparación.
+    """
+
+    def __init__(self, store: "ProgressStore", key: Hashable, min_interval: float):
+        self.store = store
+        self.key = key
+        self.min_interval = min_interval
+        self.total_frames: Optional[int] = None
+        self.frames_done = 0
+        self.peak_count = 0
+        self.status = "PROCESSING"
+        self.error: Optional[str] = None
+        self.started_at = datetime.utcnow()
+        self._started = time.monotonic()
+        self._next_publish = 0.0
+
+    def set_total(self, total_frames: Optional[int]) -> None:
+        # CAP_PROP_FRAME_COUNT puede venir en 0 o negativo si el contenedor no lo indica
+        self.total_frames = total_frames if total_frames and total_frames > 0 else None
+        self.publish()
+
+    def advance(self, count: int) -> None:
+        self.frames_done += 1
+        if count > self.peak_count:
+            self.peak_count = count
+        if time.monotonic() >= self._next_publish:
+            self.publish()
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.publish()
+
+    def publish(self) -> None:
+        now = time.monotonic()
+        self._next_publish = now + self.min_interval
+        elapsed = now - self._started
+        fps = self.frames_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        percent = None
+        if self.total_frames:
+            remaining = max(self.total_frames - self.frames_done, 0)
+            percent = min(self.frames_done / self.total_frames * 100.0, 100.0)
+            if fps > 0 and self.status == "PROCESSING":
+                eta = remaining / fps
+        if self.status == "COMPLETED":
+            percent, eta = 100.0, 0.0
+        self.store.put(
+            self.key,
+            {
+                "status": self.status,
+                "frames_done": self.frames_done,
+                "total_frames": self.total_frames,
+                "percent": percent,
+                "fps": fps,
+                "eta_seconds": eta,
+                "peak_count": self.peak_count,
+                "elapsed_seconds": elapsed,
+                "started_at": self.started_at,
+                "updated_at": datetime.utcnow(),
+                "error": self.error,
+            },
+        )
+
+
+class ProgressStore:
+    """
+    Store en memoria del progreso por clave (p. ej. id de sesión). Cada
+    entrada lleva una versión creciente para que los streams de push solo
+    emitan cuando hay cambios; las terminadas se purgan tras ``ttl`` segundos.
+    """
+
+    FINAL_STATUSES = ("COMPLETED", "FAILED")
+
+    def __init__(self, ttl: float = 600.0, min_interval: float = 0.5):
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self._entries: Dict[Hashable, Dict[str, Any]] = {}
+        self._finished_at: Dict[Hashable, float] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def start(self, key: Hashable) -> ProgressReporter:
+        reporter = ProgressReporter(self, key, self.min_interval)
+        reporter.publish()
+        return reporter
+
+    def put(self, key: Hashable, snapshot: Dict[str, Any]) -> None:
+        with self._lock:
+            self._version += 1
+            snapshot["version"] = self._version
+            self._entries[key] = snapshot
+            if snapshot["status"] in self.FINAL_STATUSES:
+                self._finished_at[key] = time.monotonic()
+            else:
+                self._finished_at.pop(key, None)
+            self._purge()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def _purge(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, finished in self._finished_at.items() if finished < cutoff]:
+            self._finished_at.pop(key, None)
+            self._entries.pop(key, None)
+
+
+processing_progress = ProgressStore(
+    ttl=settings.PROGRESS_TTL_SECONDS,
+    min_interval=settings.PROGRESS_PUBLISH_INTERVAL_SECONDS,
+)
@@ -0,0 +1,465 @@
+"""
+Reprocesamiento por lotes de sesiones de validación con una nueva versión del
+modelo (p. ej. tras reentrenar ``best.pt``).
+
+Selecciona sesiones por filtro, procesa su ``original_video_path`` en un pool
+de procesos (cada proceso carga el modelo una vez) y guarda el resultado en
+``validation_model_results`` bajo la etiqueta ``--tag``, sin tocar el
+resultado original de la sesión. El timeline completo se escribe como JSON
+gzip en ``REPROCESS_RESULTS_DIR/<tag>/<session_id>.json.gz``.
+
+Es reanudable: las sesiones ya COMPLETED para esa etiqueta se saltan, y las
+que quedaron en PROCESSING por una interrupción se vuelven a lanzar cuando
+vence su reclamo (``REPROCESS_LEASE_SECONDS``); las FAILED solo con
+``--retry-failed``. Cada ejecución reclama sus filas con un ``run_id`` propio,
+así dos ejecuciones simultáneas con la misma etiqueta no procesan la misma
+sesión ni pisan el resultado de la otra.
+
+Al final (o solo eso, con ``--report-only``) genera un informe por sesión
+con pico y promedio de conteo del modelo original frente al nuevo.
+
+Uso (desde ``backend/``)::
+
+    python -m app.services.reprocessing --model app/model/best_v2.pt --tag v2 \\
+        --status COMPLETED --since 2026-01-01 --workers 4 --report reports/v2.csv
+"""
+import argparse
+import csv
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.validation import ValidationFrameStat, ValidationModelResult, ValidationSession
+from app.services.media_delivery import media_path_for
+from app.services.roi import load_inference_region
+
+logger = logging.getLogger(__name__)
+
+_TAG_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,100}$")
+
+
+def timeline_path_for(tag: str, session_id: int) -> str:
+    return os.path.join(settings.REPROCESS_RESULTS_DIR, tag, f"{session_id}.json.gz")
+
+
+def select_sessions(
+    db: Session,
+    session_ids: Optional[List[int]] = None,
+    bus_id: Optional[int] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[ValidationSession]:
+    query = db.query(ValidationSession).filter(ValidationSession.original_video_path.isnot(None))
+    if session_ids:
+        query = query.filter(ValidationSession.id.in_(session_ids))
+    if bus_id is not None:
+        query = query.filter(ValidationSession.bus_id == bus_id)
+    if status:
+        query = query.filter(ValidationSession.status == status)
+    if since is not None:
+        query = query.filter(ValidationSession.created_at >= since)
+    if until is not None:
+        query = query.filter(ValidationSession.created_at < until)
+    query = query.order_by(ValidationSession.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def _result_row(db: Session, session_id: int, tag: str) -> ValidationModelResult:
+    query = db.query(ValidationModelResult).filter(
+        ValidationModelResult.validation_session_id == session_id,
+        ValidationModelResult.model_version == tag,
+    )
+    row = query.first()
+    if row is None:
+        db.add(ValidationModelResult(validation_session_id=session_id, model_version=tag, status="PENDING"))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # otra ejecución la creó a la vez
+        row = query.one()
+    return row
+
+
+def _claim(db: Session, row_id: int, run_id: str, model_path: str, retry_failed: bool, lease_seconds: float) -> bool:
+    """
+    Pasa la fila a PROCESSING a nombre de ``run_id`` con un UPDATE
+    condicional: solo gana una ejecución aunque compitan por la misma fila.
+    Una fila PROCESSING de otra ejecución solo se toma si su reclamo venció.
+    """
+    claimable = ["PENDING", "FAILED"] if retry_failed else ["PENDING"]
+    stale_before = datetime.utcnow() - timedelta(seconds=lease_seconds)
+    claimed = (
+        db.query(ValidationModelResult)
+        .filter(
+            ValidationModelResult.id == row_id,
+            or_(
+                ValidationModelResult.status.in_(claimable),
+                and_(
+                    ValidationModelResult.status == "PROCESSING",
+                    or_(
+                        ValidationModelResult.processing_started_at.is_(None),
+                        ValidationModelResult.processing_started_at < stale_before,
+                    ),
+                ),
+            ),
+        )
+        .update(
+            {
+                "status": "PROCESSING",
+                "run_id": run_id,
+                "model_path": model_path,
+                "error": None,
+                "processing_started_at": datetime.utcnow(),
+                "processing_finished_at": None,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return claimed == 1
+
+
+def plan_jobs(
+    db: Session,
+    sessions: List[ValidationSession],
+    tag: str,
+    model_path: str,
+    render: bool = False,
+    retry_failed: bool = False,
+    run_id: Optional[str] = None,
+    lease_seconds: float = settings.REPROCESS_LEASE_SECONDS,
+) -> List[Dict[str, Any]]:
+    """
+    Crea/recupera las filas de resultado, reclama para ``run_id`` las
+    pendientes y devuelve sus trabajos. Las que tiene otra ejecución en curso
+    se saltan.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    jobs = []
+    for session in sessions:
+        row = _result_row(db, session.id, tag)
+        if not _claim(db, row.id, run_id, model_path, retry_failed, lease_seconds):
+            if row.status == "PROCESSING":
+                logger.info("Session %s is being reprocessed by run %s, skipping", session.id, row.run_id)
+            continue
+        video_path = media_path_for(session.original_video_path)
+        if not video_path or not os.path.exists(video_path):
+            _store_outcome(
+                db,
+                tag,
+                {
+                    "session_id": session.id,
+                    "run_id": run_id,
+                    "status": "FAILED",
+                    "error": f"Video original no encontrado: {session.original_video_path}",
+                },
+            )
+            continue
+        region = load_inference_region(db, bus_id=session.bus_id) if session.bus_id is not None else None
+        jobs.append(
+            {
+                "session_id": session.id,
+                "run_id": run_id,
+                "video_path": video_path,
+                "max_capacity": session.max_capacity_declared,
+                "region": region,
+                "render": render,
+                "output_filename": f"{session.id}_{tag}.mp4",
+                "timeline_path": timeline_path_for(tag, session.id),
+            }
+        )
+    return jobs
+
+
+# --- procesos hijos -------------------------------------------------------------
+
+
+def _init_worker(model_path: str, threads: Optional[int]) -> None:
+    """Carga el modelo una vez por proceso del pool."""
+    if threads:
+        # Antes de importar torch: cada proceso usa solo su parte de la CPU
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+    logging.basicConfig(level=logging.WARNING)
+
+    from ultralytics import YOLO
+
+    from app.services import video_processing
+
+    video_processing.set_model(YOLO(model_path))
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def _reprocess_one(job: Dict[str, Any]) -> Dict[str, Any]:
+    from app.services.video_processing import process_video_with_yolo
+
+    outcome: Dict[str, Any] = {"session_id": job["session_id"], "run_id": job["run_id"]}
+    try:
+        result = process_video_with_yolo(
+            job["video_path"],
+            max_capacity=job["max_capacity"],
+            output_filename=job["output_filename"],
+            region=job["region"],
+            render=job["render"],
+        )
+        timeline = result["timeline"]
+        # Atómico: un archivo a medias nunca queda con el nombre final
+        os.makedirs(os.path.dirname(job["timeline_path"]), exist_ok=True)
+        tmp_path = f"{job['timeline_path']}.part"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            json.dump(result, fh, default=str)
+        os.replace(tmp_path, job["timeline_path"])
+        outcome.update(
+            status="COMPLETED",
+            total_frames=result["total_frames"],
+            peak_count=result["peak_count"],
+            avg_count=sum(frame["count"] for frame in timeline) / len(timeline) if timeline else 0.0,
+            avg_confidence=result["avg_confidence"],
+            processed_video_path=result["video_url"],
+        )
+    except Exception as exc:  # noqa: BLE001 - se registra en la fila y sigue el lote
+        outcome.update(status="FAILED", error=str(exc))
+    return outcome
+
+
+def _store_outcome(db: Session, tag: str, outcome: Dict[str, Any]) -> bool:
+    """Guarda el resultado solo si la fila sigue reclamada por esta ejecución."""
+    values: Dict[str, Any] = {
+        "status": outcome["status"],
+        "error": outcome.get("error"),
+        "processing_finished_at": datetime.utcnow(),
+    }
+    if outcome["status"] == "COMPLETED":
+        values.update(
+            total_frames=outcome["total_frames"],
+            peak_count=outcome["peak_count"],
+            avg_count=outcome["avg_count"],
+            avg_confidence=outcome["avg_confidence"],
+            processed_video_path=outcome["processed_video_path"],
+            timeline_path=timeline_path_for(tag, outcome["session_id"]),
+        )
+    stored = (
+        db.query(ValidationModelResult)
+        .filter(
+            ValidationModelResult.validation_session_id == outcome["session_id"],
+            ValidationModelResult.model_version == tag,
+            ValidationModelResult.run_id == outcome["run_id"],
+            ValidationModelResult.status == "PROCESSING",
+        )
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    if not stored:
+        logger.warning(
+            "Session %s was reclaimed by another run, discarding result of run %s",
+            outcome["session_id"],
+            outcome["run_id"],
+        )
+    return stored == 1
+
+
+def run_jobs(
+    db: Session,
+    jobs: List[Dict[str, Any]],
+    tag: str,
+    model_path: str,
+    workers: int,
+    threads_per_worker: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Ejecuta los trabajos en un pool ``spawn`` y guarda cada resultado en cuanto
+    llega, así una interrupción solo pierde las sesiones en curso.
+    """
+    counts = {"completed": 0, "failed": 0}
+    if not jobs:
+        return counts
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(
+        processes=min(workers, len(jobs)),
+        initializer=_init_worker,
+        initargs=(model_path, threads_per_worker),
+        maxtasksperchild=20,  # acota fugas de memoria de OpenCV/torch en lotes largos
+    ) as pool:
+        for outcome in pool.imap_unordered(_reprocess_one, jobs):
+            _store_outcome(db, tag, outcome)
+            key = "completed" if outcome["status"] == "COMPLETED" else "failed"
+            counts[key] += 1
+            logger.info(
+                "Session %s reprocessed with %s: %s (%s/%s)",
+                outcome["session_id"],
+                tag,
+                outcome["status"],
+                counts["completed"] + counts["failed"],
+                len(jobs),
+            )
+    return counts
+
+
+# --- informe --------------------------------------------------------------------
+
+
+def comparison_report(db: Session, tag: str, session_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Pico y promedio por sesión: modelo original frente a ``tag``."""
+    query = (
+        db.query(ValidationSession, ValidationModelResult)
+        .join(ValidationModelResult, ValidationModelResult.validation_session_id == ValidationSession.id)
+        .filter(ValidationModelResult.model_version == tag)
+    )
+    if session_ids is not None:
+        query = query.filter(ValidationSession.id.in_(session_ids))
+    pairs = query.order_by(ValidationSession.id).all()
+
+    ids = [session.id for session, _ in pairs]
+    old_avgs = dict(
+        db.query(ValidationFrameStat.validation_session_id, func.avg(ValidationFrameStat.detected_passengers))
+        .filter(ValidationFrameStat.validation_session_id.in_(ids))
+        .group_by(ValidationFrameStat.validation_session_id)
+        .all()
+    ) if ids else {}
+
+    report = []
+    for session, result in pairs:
+        old_avg = old_avgs.get(session.id)
+        old_avg = float(old_avg) if old_avg is not None else None
+        old_peak = session.detected_max_occupancy
+        report.append(
+            {
+                "session_id": session.id,
+                "bus_id": session.bus_id,
+                "max_capacity": session.max_capacity_declared,
+                "status": result.status,
+                "old_peak": old_peak,
+                "new_peak": result.peak_count,
+                "peak_delta": result.peak_count - old_peak
+                if result.peak_count is not None and old_peak is not None
+                else None,
+                "old_avg": old_avg,
+                "new_avg": result.avg_count,
+                "avg_delta": result.avg_count - old_avg
+                if result.avg_count is not None and old_avg is not None
+                else None,
+                "error": result.error,
+            }
+        )
+    return report
+
+
+def write_report(report: List[Dict[str, Any]], path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            fieldnames = list(report[0]) if report else ["session_id"]
+            writer = csv.DictWriter(fh, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(report)
+        return
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, default=str)
+
+
+def summarize(report: List[Dict[str, Any]]) -> Dict[str, Any]:
+    compared = [row for row in report if row["peak_delta"] is not None]
+    avg_deltas = [row["avg_delta"] for row in report if row["avg_delta"] is not None]
+    return {
+        "sessions": len(report),
+        "compared": len(compared),
+        "failed": sum(1 for row in report if row["status"] == "FAILED"),
+        "peak_changed": sum(1 for row in compared if row["peak_delta"] != 0),
+        "mean_abs_peak_delta": sum(abs(row["peak_delta"]) for row in compared) / len(compared) if compared else None,
+        "mean_avg_delta": sum(avg_deltas) / len(avg_deltas) if avg_deltas else None,
+    }
+
+
+# --- CLI ------------------------------------------------------------------------
+
+
+def _date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Reprocesa sesiones de validación con otro modelo")
+    parser.add_argument("--model", help="Ruta del modelo YOLO nuevo (requerido salvo --report-only)")
+    parser.add_argument("--tag", required=True, help="Versión con la que se guardan los resultados")
+    parser.add_argument("--session-ids", type=lambda value: [int(item) for item in value.split(",") if item])
+    parser.add_argument("--bus-id", type=int)
+    parser.add_argument("--status", default="COMPLETED", help="Estado de la sesión original ('' = todos)")
+    parser.add_argument("--since", type=_date, help="Sesiones creadas desde (ISO 8601)")
+    parser.add_argument("--until", type=_date, help="Sesiones creadas antes de (ISO 8601)")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--workers", type=int, default=settings.REPROCESS_WORKERS)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--render", action="store_true", help="Generar también el video anotado")
+    parser.add_argument("--retry-failed", action="store_true")
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=settings.REPROCESS_LEASE_SECONDS,
+        help="Antigüedad a partir de la cual una fila PROCESSING de otra ejecución se retoma",
+    )
+    parser.add_argument("--report", help="Archivo del informe (.json o .csv)")
+    parser.add_argument("--report-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not _TAG_PATTERN.match(args.tag):
+        parser.error("--tag solo admite letras, números, '.', '_' y '-'")
+    if not args.report_only and not args.model:
+        parser.error("--model es obligatorio salvo con --report-only")
+
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[ValidationModelResult.__table__])
+    db = SessionLocal()
+    try:
+        sessions = select_sessions(
+            db,
+            session_ids=args.session_ids,
+            bus_id=args.bus_id,
+            status=args.status or None,
+            since=args.since,
+            until=args.until,
+            limit=args.limit,
+        )
+        session_ids = [session.id for session in sessions]
+        if not args.report_only:
+            jobs = plan_jobs(
+                db,
+                sessions,
+                args.tag,
+                args.model,
+                render=args.render,
+                retry_failed=args.retry_failed,
+                lease_seconds=args.lease_seconds,
+            )
+            logger.info("%s sessions selected, %s to reprocess with %s", len(sessions), len(jobs), args.tag)
+            run_jobs(db, jobs, args.tag, args.model, args.workers, args.threads_per_worker)
+        report = comparison_report(db, args.tag, session_ids)
+    finally:
+        db.close()
+
+    if args.report:
+        write_report(report, args.report)
+    print(json.dumps(summarize(report), indent=2))
+
+
+if __name__ == "__main__":
+    main()
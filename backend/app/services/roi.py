@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.bus_camera import BusCamera
+
+DEFAULT_IMGSZ = 640
+
+
+@dataclass
+class InferenceRegion:
+    """
+    Región de interés de una cámara: recorte rectangular + polígonos de
+    máscara (coordenadas normalizadas 0..1) y resolución de entrada del
+    modelo. Sin recorte ni máscara se usa el frame completo.
+    """
+
+    crop: Optional[Sequence[float]] = None
+    mask_polygons: List[Sequence[Sequence[float]]] = field(default_factory=list)
+    imgsz: int = DEFAULT_IMGSZ
+
+    @classmethod
+    def from_camera(cls, camera: BusCamera) -> "InferenceRegion":
+        return cls(
+            crop=camera.crop_json,
+            mask_polygons=camera.mask_polygons_json or [],
+            imgsz=camera.inference_imgsz or DEFAULT_IMGSZ,
+        )
+
+    def prepare(self, width: int, height: int) -> "PreparedRegion":
+        if self.crop:
+            x1, y1, x2, y2 = self.crop
+            crop = (
+                int(max(0.0, min(x1, 1.0)) * width),
+                int(max(0.0, min(y1, 1.0)) * height),
+                int(max(0.0, min(x2, 1.0)) * width),
+                int(max(0.0, min(y2, 1.0)) * height),
+            )
+            if crop[2] - crop[0] < 2 or crop[3] - crop[1] < 2:
+                raise ValueError("La región de recorte es demasiado pequeña")
+        else:
+            crop = (0, 0, width, height)
+
+        mask = None
+        if self.mask_polygons:
+            crop_w, crop_h = crop[2] - crop[0], crop[3] - crop[1]
+            mask = np.zeros((crop_h, crop_w), dtype=np.uint8)
+            for polygon in self.mask_polygons:
+                points = np.array(
+                    [[x * width - crop[0], y * height - crop[1]] for x, y in polygon],
+                    dtype=np.int32,
+                )
+                cv2.fillPoly(mask, [points], 255)
+        return PreparedRegion(
+            crop=crop,
+            mask=mask,
+            imgsz=self.imgsz,
+            full_frame=crop == (0, 0, width, height) and mask is None,
+        )
+
+
+@dataclass
+class PreparedRegion:
+    """Región ya traducida a píxeles para un tamaño de frame concreto."""
+
+    crop: Tuple[int, int, int, int]
+    mask: Optional[Any]
+    imgsz: int
+    full_frame: bool = False
+
+    def apply(self, frame):
+        if self.full_frame:
+            return frame
+        x1, y1, x2, y2 = self.crop
+        view = frame[y1:y2, x1:x2]
+        if self.mask is not None:
+            return cv2.bitwise_and(view, view, mask=self.mask)
+        # Copia contigua: el recorte es lo único que ve el modelo
+        return np.ascontiguousarray(view)
+
+    def to_full_frame(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        x_offset, y_offset = self.crop[0], self.crop[1]
+        if x_offset == 0 and y_offset == 0:
+            return detections
+        for detection in detections:
+            detection["x"] += x_offset
+            detection["y"] += y_offset
+        return detections
+
+
+def load_inference_region(
+    db: Session, bus_id: Optional[int] = None, camera_id: Optional[int] = None
+) -> Optional[InferenceRegion]:
+    """
+    Devuelve la región de la cámara indicada o, si solo se da ``bus_id``, la
+    de su cámara por defecto (o la primera registrada).
+    """
+    query = db.query(BusCamera)
+    if camera_id is not None:
+        camera = query.filter(BusCamera.id == camera_id).first()
+    elif bus_id is not None:
+        camera = (
+            query.filter(BusCamera.bus_id == bus_id)
+            .order_by(BusCamera.is_default.desc(), BusCamera.id)
+            .first()
+        )
+    else:
+        camera = None
+    return InferenceRegion.from_camera(camera) if camera else None
+
+
+def draw_detections(frame, detections: List[Dict[str, Any]], region: Optional[PreparedRegion] = None):
+    """Dibuja detecciones (ya en coordenadas del frame completo) y la ROI."""
+    annotated = frame.copy()
+    for d in detections:
+        x1, y1 = int(d["x"]), int(d["y"])
+        x2, y2 = int(d["x"] + d["width"]), int(d["y"] + d["height"])
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 128, 0), 2)
+        cv2.putText(
+            annotated,
+            f"{d['confidence']:.2f}",
+            (x1, max(y1 - 6, 12)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            (255, 128, 0),
+            1,
+        )
+    if region is not None:
+        x1, y1, x2, y2 = region.crop
+        cv2.rectangle(annotated, (x1, y1), (x2 - 1, y2 - 1), (0, 255, 255), 1)
+    return annotated
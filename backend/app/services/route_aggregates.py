@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.bus import Bus
+from app.models.bus_assignment import BusAssignment
+from app.models.bus_state import BusState
+
+logger = logging.getLogger(__name__)
+
+OCCUPANCY_LEVELS = ("POCA", "MEDIA", "LLENA")
+
+
+class RouteAggregates:
+    """
+    Agregados por ruta mantenidos en memoria: cada bus aporta su último estado
+    (pasajeros, capacidad, nivel) a la ruta en la que está. Un evento resta la
+    aportación anterior del bus y suma la nueva, así que tanto la
+    actualización como la lectura de una ruta son O(1); si el bus cambió de
+    ruta la aportación se mueve de una a otra.
+    """
+
+    def __init__(self):
+        # bus_id -> (route_id, pasajeros, capacidad, nivel, timestamp)
+        self._buses: Dict[int, Tuple[Optional[int], int, int, str, datetime]] = {}
+        self._routes: Dict[Optional[int], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def _route(self, route_id: Optional[int]) -> Dict[str, Any]:
+        totals = self._routes.get(route_id)
+        if totals is None:
+            totals = self._routes[route_id] = {
+                "bus_count": 0,
+                "total_passengers": 0,
+                "total_capacity": 0,
+                "levels": {level: 0 for level in OCCUPANCY_LEVELS},
+                "last_update": None,
+            }
+        return totals
+
+    def _apply(self, contribution, sign: int) -> None:
+        route_id, passengers, capacity, level, timestamp = contribution
+        totals = self._route(route_id)
+        totals["bus_count"] += sign
+        totals["total_passengers"] += sign * passengers
+        totals["total_capacity"] += sign * capacity
+        totals["levels"][level] = totals["levels"].get(level, 0) + sign
+        if sign > 0 and (totals["last_update"] is None or timestamp > totals["last_update"]):
+            totals["last_update"] = timestamp
+        if totals["bus_count"] == 0:
+            del self._routes[route_id]
+
+    def update(
+        self,
+        bus_id: int,
+        route_id: Optional[int],
+        total_passengers: int,
+        max_capacity: int,
+        occupancy_level: str,
+        timestamp: datetime,
+    ) -> None:
+        contribution = (route_id, total_passengers, max_capacity, occupancy_level, timestamp)
+        with self._lock:
+            previous = self._buses.get(bus_id)
+            if previous is not None:
+                self._apply(previous, -1)
+            self._buses[bus_id] = contribution
+            self._apply(contribution, 1)
+
+    def load(self, rows: List[Tuple[int, Optional[int], int, int, str, datetime]]) -> None:
+        """(bus_id, route_id, pasajeros, capacidad, nivel, timestamp) por bus."""
+        with self._lock:
+            self._buses.clear()
+            self._routes.clear()
+            for bus_id, route_id, passengers, capacity, level, timestamp in rows:
+                contribution = (route_id, passengers, capacity, level, timestamp)
+                self._buses[bus_id] = contribution
+                self._apply(contribution, 1)
+            self.ready = True
+
+    def snapshot(self, route_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if route_id is not None:
+                items = [(route_id, self._routes[route_id])] if route_id in self._routes else []
+            else:
+                items = list(self._routes.items())
+            return [_describe(key, totals) for key, totals in items]
+
+
+def _describe(route_id: Optional[int], totals: Dict[str, Any]) -> Dict[str, Any]:
+    bus_count = totals["bus_count"]
+    capacity = totals["total_capacity"]
+    return {
+        "route_id": route_id,
+        "bus_count": bus_count,
+        "total_passengers": totals["total_passengers"],
+        "avg_passengers": totals["total_passengers"] / bus_count if bus_count else 0.0,
+        "total_capacity": capacity,
+        "load_percent": totals["total_passengers"] / capacity * 100.0 if capacity else None,
+        "full_count": totals["levels"].get("LLENA", 0),
+        "levels": dict(totals["levels"]),
+        "last_update": totals["last_update"],
+    }
+
+
+route_aggregates = RouteAggregates()
+
+
+def use_aggregates() -> bool:
+    return settings.ROUTE_AGGREGATES_ENABLED and route_aggregates.ready
+
+
+def _bus_state_rows(db: Session, route_id: Optional[int] = None):
+    query = db.query(
+        BusState.bus_id,
+        BusState.route_id,
+        BusState.total_passengers,
+        Bus.max_capacity,
+        BusState.occupancy_level,
+        BusState.last_update,
+    ).join(Bus, BusState.bus_id == Bus.id)
+    if route_id is not None:
+        query = query.filter(BusState.route_id == route_id)
+    return query.all()
+
+
+def load_route_aggregates(db: Session) -> None:
+    route_aggregates.load([tuple(row) for row in _bus_state_rows(db)])
+
+
+def load_route_aggregates_on_startup() -> None:
+    if not settings.ROUTE_AGGREGATES_ENABLED:
+        return
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        load_route_aggregates(db)
+    except Exception:  # noqa: BLE001 - sin agregados se responde desde BD
+        logger.exception("Could not load route aggregates; /dashboard/routes/state will use the database")
+    finally:
+        db.close()
+
+
+def db_route_aggregates(db: Session, route_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Mismo resultado calculado desde ``bus_state`` (agregados en memoria desactivados)."""
+    scratch = RouteAggregates()
+    scratch.load([tuple(row) for row in _bus_state_rows(db, route_id)])
+    return scratch.snapshot(route_id)
+
+
+# --- ruta vigente por asignación ------------------------------------------------
+
+
+class AssignmentCache:
+    """
+    Ruta asignada a cada bus según ``BusAssignment``, cacheada ``ttl``
+    segundos junto con su ventana de vigencia para no consultar la BD en cada
+    evento sin ``route_id``.
+
+    La API no escribe asignaciones (se cargan directamente en BD), así que no
+    hay nada que invalide la caché: un cambio de asignación se ve como mucho
+    ``ttl`` segundos tarde, o antes si el evento cae fuera de la ventana
+    cacheada. La aportación del bus a los agregados cambia de ruta con su
+    siguiente evento.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        # bus_id -> (route_id, desde, hasta, caduca_en)
+        self._entries: Dict[int, Tuple[Optional[int], Optional[datetime], Optional[datetime], float]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, db: Session, bus_id: int, timestamp: datetime) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(bus_id)
+        if entry is not None:
+            route_id, start, end, expires_at = entry
+            in_window = (start is None or start <= timestamp) and (end is None or timestamp < end)
+            if now < expires_at and in_window:
+                return route_id
+
+        assignment = (
+            db.query(BusAssignment.route_id, BusAssignment.assigned_from, BusAssignment.assigned_to)
+            .filter(
+                BusAssignment.bus_id == bus_id,
+                BusAssignment.assigned_from <= timestamp,
+                or_(BusAssignment.assigned_to.is_(None), BusAssignment.assigned_to > timestamp),
+            )
+            .order_by(BusAssignment.assigned_from.desc())
+            .first()
+        )
+        if assignment is None:
+            # Negativo acotado hasta la próxima asignación conocida
+            upcoming = (
+                db.query(BusAssignment.assigned_from)
+                .filter(and_(BusAssignment.bus_id == bus_id, BusAssignment.assigned_from > timestamp))
+                .order_by(BusAssignment.assigned_from)
+                .first()
+            )
+            entry = (None, timestamp, upcoming[0] if upcoming else None, now + self.ttl)
+        else:
+            entry = (assignment[0], assignment[1], assignment[2], now + self.ttl)
+        with self._lock:
+            self._entries[bus_id] = entry
+        return entry[0]
+
+
+route_assignments = AssignmentCache(ttl=settings.ROUTE_ASSIGNMENT_CACHE_SECONDS)
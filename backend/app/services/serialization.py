@@ -0,0 +1,222 @@
+"""
+Capa de respuesta para los endpoints con payloads grandes (timeline de
+``/validation/process-video`` y ``/frame-stats``).
+
+Negociación por ``Accept``:
+
+- ``application/json`` (por defecto): orjson si está instalado, si no ``json``.
+- ``application/msgpack`` (o ``application/x-msgpack``): MessagePack.
+- ``application/vnd.ptd.packed+json`` / ``application/vnd.ptd.packed+msgpack``:
+  listas de registros empaquetadas por columnas,
+  ``{"columns": [...], "rows": [[...], ...]}``, que evita repetir las claves
+  en cada frame.
+
+Y por ``Accept-Encoding``: brotli (si está instalado) o gzip cuando el cuerpo
+supera ``RESPONSE_COMPRESSION_MIN_BYTES``.
+
+Los payloads se construyen con dicts/tuplas planos: nada de modelos Pydantic
+por fila.
+"""
+import gzip
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+PACKED_JSON = "application/vnd.ptd.packed+json"
+PACKED_MSGPACK = "application/vnd.ptd.packed+msgpack"
+
+_ALIASES = {"application/x-msgpack": MSGPACK}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "item"):  # escalares de numpy
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def dumps_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, default=_default, use_bin_type=True)
+
+
+# --- negociación ----------------------------------------------------------------
+
+
+def _parse_accept(header: Optional[str]) -> List[Tuple[str, float]]:
+    """Media types de ``Accept`` ordenados por calidad (estable ante empates)."""
+    entries = []
+    for position, part in enumerate((header or "").split(",")):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        entries.append((position, _ALIASES.get(media_type, media_type), quality))
+    entries.sort(key=lambda entry: (-entry[2], entry[0]))
+    return [(media_type, quality) for _, media_type, quality in entries]
+
+
+def available_media_types() -> List[str]:
+    types = [JSON, PACKED_JSON]
+    if msgpack is not None:
+        types += [MSGPACK, PACKED_MSGPACK]
+    return types
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    available = available_media_types()
+    for media_type, quality in _parse_accept(accept):
+        if quality <= 0:
+            continue
+        if media_type in available:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    return JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    offered = {media_type: quality for media_type, quality in _parse_accept(accept_encoding)}
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+
+
+# --- empaquetado por columnas ---------------------------------------------------
+
+
+def pack_rows(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> Dict[str, Any]:
+    return {"columns": list(columns), "rows": [list(row) for row in rows]}
+
+
+def pack_records(records: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Lista de dicts -> columnas + filas. Las claves faltantes quedan en None."""
+    columns: List[str] = []
+    seen = set()
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    return pack_rows(columns, ([record.get(key) for key in columns] for record in records))
+
+
+def pack_timeline(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resultado de ``process_video_with_yolo`` con el timeline por columnas; las
+    detecciones de cada frame también van como filas de ``detection_columns``.
+    """
+    timeline = result.get("timeline") or []
+    detection_columns: List[str] = []
+    for frame in timeline:
+        for detection in frame.get("detections") or ():
+            for key in detection:
+                if key not in detection_columns:
+                    detection_columns.append(key)
+    frames = [
+        dict(
+            frame,
+            detections=[[detection.get(key) for key in detection_columns] for detection in frame.get("detections") or ()],
+        )
+        for frame in timeline
+    ]
+    packed = pack_records(frames)
+    packed["detection_columns"] = detection_columns
+    return {**result, "timeline": packed}
+
+
+def records_from_rows(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    return [dict(zip(columns, row)) for row in rows]
+
+
+# --- respuesta ------------------------------------------------------------------
+
+
+def encode_payload(
+    payload: Any,
+    media_type: str,
+    accept_encoding: Optional[str],
+    packer: Optional[Callable[[Any], Any]] = None,
+) -> Response:
+    """
+    Serializa ``payload`` en ``media_type``. ``packer`` convierte el payload a
+    su forma por columnas para los formatos ``packed``.
+    """
+    if media_type in (PACKED_JSON, PACKED_MSGPACK) and packer is not None:
+        payload = packer(payload)
+    body = dumps_msgpack(payload) if media_type in (MSGPACK, PACKED_MSGPACK) else dumps_json(payload)
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def negotiated_response(request: Request, payload: Any, packer: Optional[Callable[[Any], Any]] = None) -> Response:
+    """Respuesta según los encabezados ``Accept`` / ``Accept-Encoding`` de la petición."""
+    return encode_payload(
+        payload,
+        negotiate_media_type(request.headers.get("accept")),
+        request.headers.get("accept-encoding"),
+        packer,
+    )
+
+
+def rows_response(request: Request, columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> Response:
+    """
+    Filas de una consulta por columnas (sin objetos ORM ni Pydantic): como
+    lista de objetos en JSON/MessagePack, o tal cual en los formatos ``packed``.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    if media_type in (PACKED_JSON, PACKED_MSGPACK):
+        payload = pack_rows(columns, rows)
+    else:
+        payload = records_from_rows(columns, rows)
+    return encode_payload(payload, media_type, request.headers.get("accept-encoding"))
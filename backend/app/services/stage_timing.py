@@ -0,0 +1,77 @@
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+from app.services import metrics
+
+_NULL_CONTEXT = nullcontext()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class StageTimings:
+    """
+    Acumula duraciones por etapa del pipeline (decode, infer, plot, encode,
+    persist...) para reportar percentiles.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result: Dict[str, Dict[str, float]] = {}
+        for name, values in self.samples.items():
+            ordered = sorted(values)
+            total = sum(ordered)
+            result[name] = {
+                "count": len(ordered),
+                "total_s": total,
+                "mean_ms": total / len(ordered) * 1000 if ordered else 0.0,
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            }
+        return result
+
+
+@contextmanager
+def _observed_stage(timings: Optional[StageTimings], name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if timings is not None:
+            timings.record(name, elapsed)
+        if metrics.profiling_enabled():
+            metrics.observe_stage(name, elapsed)
+
+
+def timed(timings: Optional[StageTimings], name: str):
+    """
+    ``with timed(timings, "infer"):`` mide la etapa para ``timings`` y, con
+    profiling activo, para ``/metrics``. Sin ninguno de los dos no hace nada.
+    """
+    if timings is None and not metrics.profiling_enabled():
+        return _NULL_CONTEXT
+    return _observed_stage(timings, name)
@@ -0,0 +1,274 @@
+import statistics
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+
+Box = List[float]  # [x1, y1, x2, y2]
+
+
+class CountSmoother:
+    """
+    Suavizado temporal de conteos.
+
+    - ``median``: mediana móvil de los últimos ``window`` valores (filtra
+      falsos positivos de un solo frame).
+    - ``ema``: media móvil exponencial con factor ``alpha``.
+    - ``none``: devuelve el valor tal cual.
+    """
+
+    def __init__(self, window: int = 5, method: str = "median", alpha: float = 0.3):
+        if method not in ("median", "ema", "none"):
+            raise ValueError(f"Método de suavizado desconocido: {method}")
+        self.method = method
+        self.alpha = alpha
+        self._values: Deque[int] = deque(maxlen=max(window, 1))
+        self._ema: Optional[float] = None
+
+    def update(self, count: int) -> int:
+        if self.method == "none":
+            return count
+        if self.method == "ema":
+            self._ema = count if self._ema is None else self.alpha * count + (1 - self.alpha) * self._ema
+            return int(round(self._ema))
+        self._values.append(count)
+        return int(round(statistics.median(self._values)))
+
+
+def _iou(a: Sequence[float], b: Sequence[float]) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    if inter <= 0:
+        return 0.0
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _greedy_match(
+    tracks: List["Track"], boxes: List[Box], iou_threshold: float
+) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """Asociación greedy por IoU descendente (sin dependencias de scipy)."""
+    pairs = []
+    for ti, track in enumerate(tracks):
+        for di, box in enumerate(boxes):
+            score = _iou(track.box, box)
+            if score >= iou_threshold:
+                pairs.append((score, ti, di))
+    pairs.sort(reverse=True)
+
+    matched: List[Tuple[int, int]] = []
+    used_tracks, used_dets = set(), set()
+    for _, ti, di in pairs:
+        if ti in used_tracks or di in used_dets:
+            continue
+        matched.append((ti, di))
+        used_tracks.add(ti)
+        used_dets.add(di)
+    unmatched_tracks = [i for i in range(len(tracks)) if i not in used_tracks]
+    unmatched_dets = [i for i in range(len(boxes)) if i not in used_dets]
+    return matched, unmatched_tracks, unmatched_dets
+
+
+def _detection_box(detection: Dict[str, float]) -> Box:
+    return [
+        detection["x"],
+        detection["y"],
+        detection["x"] + detection["width"],
+        detection["y"] + detection["height"],
+    ]
+
+
+class Track:
+    """Una persona seguida en el tiempo, con velocidad constante estimada."""
+
+    def __init__(self, track_id: int, box: Box, confidence: float, frame_index: int):
+        self.track_id = track_id
+        self.box = list(box)
+        self.confidence = confidence
+        self.velocity = [0.0, 0.0, 0.0, 0.0]  # px/frame
+        self.hits = 1
+        self.confirmed = False
+        self.last_box = list(box)
+        self.last_frame = frame_index
+        self.crossed: Optional[str] = None  # "in" / "out": último cruce contado
+
+    @property
+    def center_y(self) -> float:
+        return (self.box[1] + self.box[3]) / 2
+
+    def predict(self, frame_index: int) -> None:
+        dt = frame_index - self.last_frame
+        self.box = [v + dv * dt for v, dv in zip(self.last_box, self.velocity)]
+
+    def update(self, box: Box, confidence: float, frame_index: int, alpha: float = 0.5) -> None:
+        dt = max(frame_index - self.last_frame, 1)
+        observed_velocity = [(n - o) / dt for n, o in zip(box, self.last_box)]
+        self.velocity = [
+            alpha * ov + (1 - alpha) * v for ov, v in zip(observed_velocity, self.velocity)
+        ]
+        self.box = list(box)
+        self.last_box = list(box)
+        self.last_frame = frame_index
+        self.confidence = confidence
+        self.hits += 1
+
+
+class ByteTracker:
+    """
+    Tracker multi-objeto al estilo ByteTrack, pensado para CPU:
+
+    1. Las detecciones de confianza alta se asocian por IoU con todos los
+       tracks (predichos con velocidad constante).
+    2. Las de confianza baja solo rescatan tracks confirmados sin asociar
+       (personas parcialmente ocluidas).
+    3. Las altas sin asociar abren tracks tentativos, que se confirman tras
+       ``min_hits`` apariciones; un track confirmado sobrevive ``max_age``
+       frames sin verse antes de eliminarse.
+
+    Solo cuentan (y se devuelven) los tracks confirmados asociados en el
+    último keyframe; los perdidos se conservan únicamente para reasociarlos
+    si la persona reaparece, no inflan la ocupación.
+
+    Opcionalmente cuenta cruces de una línea horizontal de puerta
+    (``door_line`` en fracción de la altura) como subidas/bajadas.
+    """
+
+    def __init__(
+        self,
+        frame_height: int,
+        high_conf: float = 0.5,
+        match_iou: float = 0.3,
+        min_hits: int = 3,
+        max_age: int = 30,
+        door_line: Optional[float] = None,
+        entry_direction: str = "down",
+    ):
+        self.high_conf = high_conf
+        self.match_iou = match_iou
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.door_line_y = door_line * frame_height if door_line is not None else None
+        self.entry_direction = entry_direction
+        self.tracks: List[Track] = []
+        self.boarded = 0
+        self.alighted = 0
+        self._next_id = 1
+        self._last_update: Optional[int] = None  # último keyframe procesado
+
+    def confirmed_tracks(self) -> List[Track]:
+        return [t for t in self.tracks if t.confirmed]
+
+    def active_tracks(self) -> List[Track]:
+        """Confirmados y asociados en el último keyframe."""
+        return [t for t in self.tracks if t.confirmed and t.last_frame == self._last_update]
+
+    def predict(self, frame_index: int) -> List[Track]:
+        """Avanza los tracks a un frame sin inferencia (stride > 1)."""
+        for track in self.tracks:
+            track.predict(frame_index)
+        return self.active_tracks()
+
+    def update(self, detections: List[Dict[str, float]], frame_index: int) -> List[Track]:
+        for track in self.tracks:
+            track.predict(frame_index)
+
+        high = [d for d in detections if d["confidence"] >= self.high_conf]
+        low = [d for d in detections if d["confidence"] < self.high_conf]
+
+        # Etapa 1: detecciones de confianza alta contra todos los tracks
+        high_boxes = [_detection_box(d) for d in high]
+        matched, unmatched_tracks, unmatched_high = _greedy_match(
+            self.tracks, high_boxes, self.match_iou
+        )
+        for ti, di in matched:
+            self._apply_match(self.tracks[ti], high_boxes[di], high[di]["confidence"], frame_index)
+            high[di]["track_id"] = self.tracks[ti].track_id
+
+        # Etapa 2: detecciones de confianza baja solo contra confirmados sin asociar
+        remaining = [self.tracks[i] for i in unmatched_tracks if self.tracks[i].confirmed]
+        low_boxes = [_detection_box(d) for d in low]
+        matched_low, _, _ = _greedy_match(remaining, low_boxes, self.match_iou)
+        for ti, di in matched_low:
+            self._apply_match(remaining[ti], low_boxes[di], low[di]["confidence"], frame_index)
+            low[di]["track_id"] = remaining[ti].track_id
+
+        # Nuevos tracks tentativos
+        for di in unmatched_high:
+            track = Track(self._next_id, high_boxes[di], high[di]["confidence"], frame_index)
+            if self.min_hits <= 1:
+                track.confirmed = True
+            high[di]["track_id"] = track.track_id
+            self._next_id += 1
+            self.tracks.append(track)
+
+        # Limpieza: tentativos no vistos se descartan, confirmados tras max_age
+        self.tracks = [
+            t
+            for t in self.tracks
+            if t.last_frame == frame_index
+            or (t.confirmed and frame_index - t.last_frame <= self.max_age)
+        ]
+        self._last_update = frame_index
+        return self.active_tracks()
+
+    def _apply_match(self, track: Track, box: Box, confidence: float, frame_index: int) -> None:
+        previous_center = (track.last_box[1] + track.last_box[3]) / 2
+        track.update(box, confidence, frame_index)
+        if not track.confirmed and track.hits >= self.min_hits:
+            track.confirmed = True
+        if self.door_line_y is not None and track.confirmed:
+            self._check_crossing(track, previous_center, track.center_y)
+
+    def _check_crossing(self, track: Track, before: float, after: float) -> None:
+        line = self.door_line_y
+        if before < line <= after:
+            direction = "down"
+        elif before >= line > after:
+            direction = "up"
+        else:
+            return
+        kind = "in" if direction == self.entry_direction else "out"
+        if track.crossed == kind:
+            return  # ya contado en este sentido
+        track.crossed = kind
+        if kind == "in":
+            self.boarded += 1
+        else:
+            self.alighted += 1
+
+
+def draw_tracks(frame, tracks: List[Track], door_line_y: Optional[float] = None):
+    """Dibuja los tracks confirmados (caja + id) sobre una copia del frame."""
+    annotated = frame.copy()
+    for track in tracks:
+        x1, y1, x2, y2 = (int(v) for v in track.box)
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 200, 0), 2)
+        cv2.putText(
+            annotated,
+            f"#{track.track_id}",
+            (x1, max(y1 - 6, 12)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            (0, 200, 0),
+            1,
+        )
+    if door_line_y is not None:
+        y = int(door_line_y)
+        cv2.line(annotated, (0, y), (annotated.shape[1], y), (0, 0, 255), 2)
+    return annotated
+
+
+def tracks_as_detections(tracks: List[Track]) -> List[Dict[str, Any]]:
+    """Convierte tracks (p. ej. predichos entre keyframes) al formato timeline."""
+    return [
+        {
+            "x": float(t.box[0]),
+            "y": float(t.box[1]),
+            "width": float(t.box[2] - t.box[0]),
+            "height": float(t.box[3] - t.box[1]),
+            "confidence": float(t.confidence),
+            "track_id": t.track_id,
+        }
+        for t in tracks
+    ]
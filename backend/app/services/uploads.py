@@ -0,0 +1,269 @@
+import logging
+import os
+import shutil
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # pragma: no cover - python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo de cada campo de texto del formulario (no del archivo)
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """El cuerpo recibido supera el límite configurado."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"El archivo supera el tamaño máximo permitido ({max_bytes} bytes)")
+        self.max_bytes = max_bytes
+
+
+class MultipartUploadError(Exception):
+    """Cuerpo multipart mal formado o sin el archivo esperado."""
+
+
+def get_upload_tmp_dir() -> str:
+    tmp_dir = settings.UPLOAD_TMP_DIR
+    os.makedirs(tmp_dir, exist_ok=True)
+    return tmp_dir
+
+
+def safe_filename(filename: Optional[str], default: str = "video.mp4") -> str:
+    """Elimina componentes de ruta del nombre enviado por el cliente."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        return default
+    return name
+
+
+def check_content_length(request: Optional[Request], max_bytes: Optional[int] = None) -> None:
+    """Rechaza antes de leer el cuerpo si Content-Length ya excede el límite."""
+    if request is None:
+        return
+    limit = max_bytes or settings.UPLOAD_MAX_BYTES
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise UploadTooLargeError(limit)
+
+
+def remove_quietly(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+async def write_stream_to_path(
+    chunks: AsyncIterator[bytes],
+    destination_path: str,
+    max_bytes: Optional[int] = None,
+) -> int:
+    """
+    Escribe un flujo de bytes en disco trozo a trozo, sin acumular el archivo
+    en memoria. La escritura se hace en un hilo para no bloquear el event loop
+    y sobre un archivo ``.part`` que solo se renombra al terminar bien.
+
+    Devuelve el número de bytes escritos.
+    """
+    limit = max_bytes or settings.UPLOAD_MAX_BYTES
+    os.makedirs(os.path.dirname(destination_path) or ".", exist_ok=True)
+    partial_path = f"{destination_path}.{uuid.uuid4().hex}.part"
+
+    written = 0
+    destination = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        async for chunk in chunks:
+            written += len(chunk)
+            if written > limit:
+                raise UploadTooLargeError(limit)
+            await run_in_threadpool(destination.write, chunk)
+        await run_in_threadpool(destination.close)
+        await run_in_threadpool(os.replace, partial_path, destination_path)
+    except BaseException:
+        destination.close()
+        remove_quietly(partial_path)
+        raise
+
+    logger.info("Stored upload at %s (%s bytes)", destination_path, written)
+    return written
+
+
+def temp_upload_path(filename: Optional[str]) -> str:
+    """Ruta nueva en el directorio temporal de uploads, con la extensión del archivo enviado."""
+    suffix = os.path.splitext(safe_filename(filename))[1] or ".mp4"
+    return os.path.join(get_upload_tmp_dir(), f"{uuid.uuid4().hex}{suffix}")
+
+
+@dataclass
+class ReceivedUpload:
+    path: str
+    filename: str
+    size: int
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+class _MultipartReceiver:
+    """
+    Callbacks del parser multipart. Los campos de texto se acumulan (acotados
+    a ``MAX_FORM_FIELD_BYTES``); los datos de la parte ``file_field`` quedan
+    en ``file_chunks`` hasta que el llamador los escribe en disco.
+    """
+
+    def __init__(self, file_field: str):
+        self.file_field = file_field
+        self.filename: Optional[str] = None
+        self.fields: Dict[str, str] = {}
+        self.file_chunks: List[bytes] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part: Optional[str] = None  # "file", "field" o None (se ignora)
+        self._field_name = ""
+        self._field_value = bytearray()
+        self.complete = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._part = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._part = "field"
+            self._field_name = name
+            self._field_value = bytearray()
+        elif name == self.file_field and self.filename is None:
+            self._part = "file"
+            self.filename = filename.decode("utf-8", "replace")
+        # Otros archivos se descartan sin guardarlos
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part == "file":
+            self.file_chunks.append(data[start:end])
+        elif self._part == "field":
+            self._field_value += data[start:end]
+            if len(self._field_value) > MAX_FORM_FIELD_BYTES:
+                raise MultipartUploadError(f"El campo '{self._field_name}' es demasiado grande")
+
+    def _on_part_end(self) -> None:
+        if self._part == "field":
+            self.fields[self._field_name] = self._field_value.decode("utf-8", "replace")
+        self._part = None
+
+    def _on_end(self) -> None:
+        self.complete = True
+
+
+async def receive_multipart_upload(
+    request: Request,
+    destination_for: Callable[[str], str],
+    file_field: str = "file",
+    max_bytes: Optional[int] = None,
+) -> ReceivedUpload:
+    """
+    Lee el cuerpo ``multipart/form-data`` de ``request.stream()`` a medida
+    que llega y escribe la parte ``file_field`` en
+    ``destination_for(filename)``. Es la única copia en disco del archivo: no
+    pasa por el ``SpooledTemporaryFile`` de Starlette, y ``max_bytes`` se
+    comprueba con cada trozo aunque el cliente no envíe Content-Length.
+
+    Se escribe en un hilo sobre un ``.part`` en ``UPLOAD_TMP_DIR`` (fuera de
+    ``MEDIA_ROOT``) y se mueve al destino al terminar bien. Los campos de texto se devuelven en
+    ``fields``. Los endpoints que lo usan no deben declarar parámetros
+    ``File``/``Form``: FastAPI consumiría el cuerpo antes del handler.
+    """
+    limit = max_bytes or settings.UPLOAD_MAX_BYTES
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise MultipartUploadError("Se esperaba un cuerpo multipart/form-data")
+
+    receiver = _MultipartReceiver(file_field)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    destination_path = partial_path = None
+    destination = None
+    written = 0
+
+    async def open_destination():
+        nonlocal destination_path, partial_path
+        destination_path = destination_for(receiver.filename)
+        os.makedirs(os.path.dirname(destination_path) or ".", exist_ok=True)
+        # El archivo a medias no se escribe junto al destino, que puede estar bajo /media
+        partial_path = os.path.join(get_upload_tmp_dir(), f"{uuid.uuid4().hex}.part")
+        return await run_in_threadpool(open, partial_path, "wb")
+
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError as exc:
+                raise MultipartUploadError("Cuerpo multipart mal formado") from exc
+            if not receiver.file_chunks:
+                continue
+            data = b"".join(receiver.file_chunks)
+            receiver.file_chunks.clear()
+            written += len(data)
+            if written > limit:
+                raise UploadTooLargeError(limit)
+            if destination is None:
+                destination = await open_destination()
+            await run_in_threadpool(destination.write, data)
+
+        # ``finalize`` no valida el cierre: un cuerpo cortado no llega a ``on_end``
+        if not receiver.complete:
+            raise MultipartUploadError("Cuerpo multipart incompleto")
+        if receiver.filename is None:
+            raise MultipartUploadError(f"Falta el archivo '{file_field}'")
+        if destination is None:  # archivo vacío
+            destination = await open_destination()
+        await run_in_threadpool(destination.close)
+        # rename si comparten sistema de archivos; si no, copia
+        await run_in_threadpool(shutil.move, partial_path, destination_path)
+    except BaseException:
+        if destination is not None:
+            destination.close()
+            remove_quietly(partial_path)
+        raise
+
+    logger.info("Stored upload at %s (%s bytes)", destination_path, written)
+    return ReceivedUpload(path=destination_path, filename=receiver.filename, size=written, fields=receiver.fields)
@@ -1,40 +1,195 @@
 import logging
 import os
+import threading
 import uuid
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 import cv2
-from ultralytics import YOLO
 
+from app.core.config import settings
 from app.models.validation import ValidationFrameStat, ValidationSession
+from app.services.inference_scheduler import InferenceScheduler, PRIORITY_VALIDATION
+from app.services.media_delivery import media_url_for, prepare_for_delivery
+from app.services.occupancy_intervals import index_session, timeline_points
+from app.services.processing_progress import ProgressReporter, processing_progress
+from app.services.roi import (
+    DEFAULT_IMGSZ,
+    InferenceRegion,
+    PreparedRegion,
+    draw_detections,
+    load_inference_region,
+)
+from app.services.stage_timing import StageTimings, timed
+from app.services.tracking import ByteTracker, CountSmoother, draw_tracks, tracks_as_detections
 
 # Logger configuration
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 # Carpeta base donde se guardan los archivos servidos al frontend
-MEDIA_ROOT = os.getenv("MEDIA_ROOT", "media")
+MEDIA_ROOT = settings.MEDIA_ROOT
 PROCESSED_DIR = os.path.join(MEDIA_ROOT, "processed_videos")
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
-# Carga del modelo YOLO con trazas explícitas
+# Carga del modelo YOLO con trazas explícitas. Se hace en el primer uso (la
+# app lo precarga al arrancar) para poder sustituirlo con ``set_model``, p. ej.
+# por el modelo stub de los benchmarks.
 MODEL_PATH = os.getenv("YOLO_MODEL_PATH", "app/model/best.pt")
-logger.info("Loading YOLO model from %s", MODEL_PATH)
-MODEL = YOLO(MODEL_PATH)
-logger.info("YOLO model loaded successfully")
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from ultralytics import YOLO
+
+                logger.info("Loading YOLO model from %s", MODEL_PATH)
+                _model = YOLO(MODEL_PATH)
+                logger.info("YOLO model loaded successfully")
+    return _model
+
+
+def set_model(model) -> None:
+    global _model
+    _model = model
+
+
+def _run_model_batch(frames: List[Any], imgsz: Optional[int] = None) -> List[Any]:
+    return list(get_model()(frames, imgsz=imgsz or DEFAULT_IMGSZ, conf=0.3, verbose=False))
+
+
+# Planificador compartido: agrupa frames de varias fuentes en una sola llamada
+inference_scheduler = InferenceScheduler(
+    run_batch=_run_model_batch,
+    max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+    max_latency=settings.INFERENCE_MAX_LATENCY_SECONDS,
+    max_queue_per_source=settings.INFERENCE_MAX_QUEUE_PER_SOURCE,
+)
+
+
+def extract_detections(results) -> Tuple[List[Dict[str, float]], int]:
+    """Convierte el resultado de YOLO en detecciones serializables + conteo."""
+    boxes = results.boxes
+    detections: List[Dict[str, float]] = []
+    for b in boxes:
+        x1, y1, x2, y2 = b.xyxy[0].tolist()
+        conf = float(b.conf[0])
+        detections.append(
+            {
+                "x": float(x1),
+                "y": float(y1),
+                "width": float(x2 - x1),
+                "height": float(y2 - y1),
+                "confidence": conf,
+            }
+        )
+        if hasattr(b, "cls"):
+            detections[-1]["class_id"] = int(b.cls[0])
+
+    # Conteo de personas (suponiendo clase 0 = persona/cabeza)
+    if hasattr(boxes, "cls"):
+        persons = int((boxes.cls == 0).sum().item())
+    else:
+        persons = len(detections)
+    return detections, persons
+
+
+def _iter_inference_results(
+    cap,
+    source_id: str,
+    stride: int = 1,
+    region: Optional[PreparedRegion] = None,
+    timings: Optional[StageTimings] = None,
+):
+    """
+    Lee frames de ``cap`` y produce (frame, resultado YOLO) en orden. Con
+    ``stride > 1`` solo se infiere uno de cada ``stride`` frames (keyframes);
+    el resto sale con resultado None. Con el planificador activo mantiene
+    varios frames en vuelo para que puedan agruparse en lotes con los de
+    otras fuentes. Con ``region`` el modelo solo ve el recorte/máscara de la
+    cámara, a su resolución de entrada.
+    """
+    imgsz = region.imgsz if region else DEFAULT_IMGSZ
+    frame_number = 0
+    if not settings.INFERENCE_BATCHING_ENABLED:
+        model = get_model()
+        while True:
+            with timed(timings, "decode"):
+                ret, frame = cap.read()
+            if not ret:
+                return
+            if frame_number % stride == 0:
+                with timed(timings, "infer"):
+                    model_input = region.apply(frame) if region else frame
+                    results = model(model_input, imgsz=imgsz, conf=0.3, verbose=False)[0]
+                yield frame, results
+            else:
+                yield frame, None
+            frame_number += 1
+
+    in_flight = deque()
+    keyframes_in_flight = 0
+    exhausted = False
+    while not exhausted or in_flight:
+        if not exhausted:
+            with timed(timings, "decode"):
+                ret, frame = cap.read()
+            if ret:
+                future = None
+                if frame_number % stride == 0:
+                    model_input = region.apply(frame) if region else frame
+                    future = inference_scheduler.submit(
+                        model_input, source_id, PRIORITY_VALIDATION, batch_key=imgsz
+                    )
+                    keyframes_in_flight += 1
+                in_flight.append((frame, future))
+                frame_number += 1
+            else:
+                exhausted = True
+        if in_flight and (exhausted or keyframes_in_flight >= settings.INFERENCE_MAX_BATCH_SIZE):
+            pending_frame, future = in_flight.popleft()
+            if future is None:
+                yield pending_frame, None
+            else:
+                keyframes_in_flight -= 1
+                with timed(timings, "infer"):
+                    results = future.result()
+                yield pending_frame, results
 
 
 def process_video_with_yolo(
     file_path: str,
     max_capacity: int = 50,
     output_filename: Optional[str] = None,
-    log_every_n_frames: int = 1,
+    log_every_n_frames: Optional[int] = None,
+    tracking: Optional[bool] = None,
+    stride: Optional[int] = None,
+    region: Optional[InferenceRegion] = None,
+    render: bool = True,
+    timings: Optional[StageTimings] = None,
+    progress: Optional[ProgressReporter] = None,
 ) -> Dict[str, Any]:
     """
     Procesa un video con YOLO, genera un MP4 anotado y una línea de tiempo
     con conteo de personas y detecciones por frame.
 
+    Con ``tracking`` el conteo sale de tracks estables (ByteTrack) en lugar
+    de las cajas crudas de cada frame, se registran subidas/bajadas si hay
+    línea de puerta configurada y se puede inferir solo cada ``stride``
+    frames, prediciendo el movimiento de los tracks entre keyframes.
+
+    Con ``region`` (ROI de la cámara) la inferencia corre solo sobre el
+    recorte/máscara y las cajas se trasladan a coordenadas del frame completo.
+
+    ``render=False`` omite el video anotado (solo timeline y métricas) y
+    ``timings`` acumula la duración de cada etapa (decode, infer, annotate, encode,
+    deliver). ``progress`` recibe frames procesados y pico de conteo.
+
     Devuelve:
       - ruta absoluta y URL pública del video procesado
       - métricas del procesamiento
@@ -48,61 +203,95 @@ def process_video_with_yolo(
     fps = cap.get(cv2.CAP_PROP_FPS) or 25
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if progress is not None:
+        progress.set_total(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
 
     video_id = uuid.uuid4().hex
     chosen_output_name = output_filename or f"{video_id}_processed.mp4"
     output_path = os.path.join(PROCESSED_DIR, chosen_output_name)
 
-    # Prefer H.264/avc1 for broad browser support; fallback to mp4v if unavailable
-    preferred_fourcc = cv2.VideoWriter_fourcc(*"avc1")
-    out = cv2.VideoWriter(output_path, preferred_fourcc, fps, (width, height))
-    if not out.isOpened():
-        logger.warning("Falling back to mp4v codec for processed video output")
-        fallback_fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out = cv2.VideoWriter(output_path, fallback_fourcc, fps, (width, height))
+    out = None
+    if render:
+        # Prefer H.264/avc1 for broad browser support; fallback to mp4v if unavailable
+        preferred_fourcc = cv2.VideoWriter_fourcc(*"avc1")
+        out = cv2.VideoWriter(output_path, preferred_fourcc, fps, (width, height))
+        if not out.isOpened():
+            logger.warning("Falling back to mp4v codec for processed video output")
+            fallback_fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+            out = cv2.VideoWriter(output_path, fallback_fourcc, fps, (width, height))
 
     timeline: List[Dict[str, Any]] = []
     frame_index = 0
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Inferencia con YOLO
-        logger.info("Processing frame %s", frame_index)
-        results = MODEL(frame, imgsz=640, conf=0.3)[0]
-        boxes = results.boxes
-
-        detections: List[Dict[str, float]] = []
-        for b in boxes:
-            x1, y1, x2, y2 = b.xyxy[0].tolist()
-            conf = float(b.conf[0])
-            detections.append(
-                {
-                    "x": float(x1),
-                    "y": float(y1),
-                    "width": float(x2 - x1),
-                    "height": float(y2 - y1),
-                    "confidence": conf,
-                }
-            )
+    prepared_region = region.prepare(width, height) if region else None
+
+    use_tracking = settings.TRACKING_ENABLED if tracking is None else tracking
+    effective_stride = max(stride or settings.TRACKING_STRIDE, 1) if use_tracking else 1
+    tracker = (
+        ByteTracker(
+            frame_height=height,
+            high_conf=settings.TRACKING_HIGH_CONF,
+            match_iou=settings.TRACKING_MATCH_IOU,
+            min_hits=settings.TRACKING_MIN_HITS,
+            max_age=settings.TRACKING_MAX_AGE_FRAMES,
+            door_line=settings.TRACKING_DOOR_LINE,
+            entry_direction=settings.TRACKING_DOOR_ENTRY_DIRECTION,
+        )
+        if use_tracking
+        else None
+    )
+    smoother = CountSmoother(
+        window=settings.COUNT_SMOOTHING_WINDOW,
+        method=settings.COUNT_SMOOTHING_METHOD,
+        alpha=settings.COUNT_SMOOTHING_ALPHA,
+    )
 
-        # Conteo de personas (suponiendo clase 0 = persona/cabeza)
-        if hasattr(boxes, "cls"):
-            persons = int((boxes.cls == 0).sum().item())
+    # Inferencia con YOLO (directa o a través del planificador por lotes)
+    frame_results = _iter_inference_results(
+        cap,
+        source_id=f"video:{video_id}",
+        stride=effective_stride,
+        region=prepared_region,
+        timings=timings,
+    )
+    # Log muestreado: uno cada N frames en lugar de uno por frame
+    log_every = max(log_every_n_frames or settings.LOG_FRAME_SAMPLE_EVERY, 1)
+    for frame, results in frame_results:
+        is_keyframe = results is not None
+        raw_persons: Optional[int] = None
+        if is_keyframe:
+            detections, raw_persons = extract_detections(results)
+            if prepared_region:
+                detections = prepared_region.to_full_frame(detections)
+
+        if tracker:
+            if is_keyframe:
+                person_detections = [d for d in detections if d.get("class_id", 0) == 0]
+                tracks = tracker.update(person_detections, frame_index)
+            else:
+                tracks = tracker.predict(frame_index)
+                detections = tracks_as_detections(tracks)
+            persons = smoother.update(len(tracks))
         else:
-            persons = len(detections)
-
-        if frame_index % log_every_n_frames == 0:
-            logger.info("Detections found: %s persons on frame %s", persons, frame_index)
-
-        # Frame anotado
-        annotated = results.plot()
-        if annotated.shape[1] != width or annotated.shape[0] != height:
-            annotated = cv2.resize(annotated, (width, height))
-
-        out.write(annotated)
+            persons = smoother.update(raw_persons)
+
+        if frame_index % log_every == 0:
+            logger.info("Frame %s of %s: %s persons detected", frame_index, file_path, persons)
+
+        if out is not None:
+            # Frame anotado
+            with timed(timings, "annotate"):
+                if tracker:
+                    annotated = draw_tracks(frame, tracks, tracker.door_line_y)
+                elif prepared_region and not prepared_region.full_frame:
+                    annotated = draw_detections(frame, detections, prepared_region)
+                else:
+                    annotated = results.plot()
+                if annotated.shape[1] != width or annotated.shape[0] != height:
+                    annotated = cv2.resize(annotated, (width, height))
+
+            with timed(timings, "encode"):
+                out.write(annotated)
 
         timestamp = frame_index / fps
         avg_conf = (
@@ -118,13 +307,25 @@ def process_video_with_yolo(
                 "confidence": avg_conf,
                 "detections": detections,
                 "is_over_capacity": persons > max_capacity,
+                "raw_count": raw_persons,
+                "is_keyframe": is_keyframe,
             }
         )
+        if tracker:
+            timeline[-1]["boarded"] = tracker.boarded
+            timeline[-1]["alighted"] = tracker.alighted
+        if progress is not None:
+            progress.advance(persons)
 
         frame_index += 1
 
     cap.release()
-    out.release()
+    hls_playlist_path = None
+    if out is not None:
+        out.release()
+        # moov al inicio (y HLS opcional) para reproducción progresiva
+        with timed(timings, "deliver"):
+            hls_playlist_path = prepare_for_delivery(output_path)
 
     duration = frame_index / fps if fps else 0.0
     peak_count = max((item["count"] for item in timeline), default=0)
@@ -135,12 +336,16 @@ def process_video_with_yolo(
     )
 
     # Ruta que el frontend usará (la serviremos desde FastAPI)
-    video_url = f"/media/processed_videos/{chosen_output_name}"
-    logger.info("Processed video saved to %s", output_path)
+    video_url = f"/media/processed_videos/{chosen_output_name}" if out is not None else None
+    if out is not None:
+        logger.info("Processed video saved to %s", output_path)
+    else:
+        output_path = None
 
     return {
         "video_path": output_path,  # ruta en el servidor
         "video_url": video_url,  # URL pública para el frontend
+        "hls_url": media_url_for(hls_playlist_path) if hls_playlist_path else None,
         "fps": fps,
         "width": width,
         "height": height,
@@ -149,6 +354,10 @@ def process_video_with_yolo(
         "max_capacity": max_capacity,
         "peak_count": peak_count,
         "avg_confidence": avg_conf_overall,
+        "tracking": tracker is not None,
+        "stride": effective_stride,
+        "boarded_total": tracker.boarded if tracker else None,
+        "alighted_total": tracker.alighted if tracker else None,
         "timeline": timeline,  # AQUÍ está todo para estadísticas y BD
     }
 
@@ -158,8 +367,14 @@ def process_and_persist_validation_session(
     validation_session: ValidationSession,
     source_video_path: str,
     max_capacity: Optional[int] = None,
+    region: Optional[InferenceRegion] = None,
+    render: bool = True,
+    timings: Optional[StageTimings] = None,
 ) -> ValidationSession:
-    """Procesa un video de validación y guarda resultados en BD."""
+    """
+    Procesa un video de validación y guarda resultados en BD. Si no se pasa
+    ``region`` se usa la ROI de la cámara por defecto del bus de la sesión.
+    """
     logger.info(
         "Starting validation processing for session %s with video %s",
         validation_session.id,
@@ -171,12 +386,41 @@ def process_and_persist_validation_session(
     ).delete()
     db_session.commit()
 
-    result = process_video_with_yolo(
-        source_video_path,
-        max_capacity=max_capacity or validation_session.max_capacity_declared,
-        output_filename=f"{validation_session.id}.mp4",
+    progress = processing_progress.start(validation_session.id)
+    try:
+        if region is None and validation_session.bus_id is not None:
+            region = load_inference_region(db_session, bus_id=validation_session.bus_id)
+
+        result = process_video_with_yolo(
+            source_video_path,
+            max_capacity=max_capacity or validation_session.max_capacity_declared,
+            output_filename=f"{validation_session.id}.mp4",
+            region=region,
+            render=render,
+            timings=timings,
+            progress=progress,
+        )
+        progress.set_status("PERSISTING")
+        _persist_validation_results(db_session, validation_session, result, timings)
+    except Exception as exc:
+        progress.set_status("FAILED", str(exc))
+        raise
+    progress.set_status("COMPLETED")
+
+    logger.info(
+        "Validation session %s completed. Processed video at %s",
+        validation_session.id,
+        validation_session.processed_video_path,
     )
+    return validation_session
+
 
+def _persist_validation_results(
+    db_session,
+    validation_session: ValidationSession,
+    result: Dict[str, Any],
+    timings: Optional[StageTimings] = None,
+) -> None:
     validation_session.processed_video_path = result["video_url"]
     validation_session.total_frames = result["total_frames"]
     validation_session.detected_max_occupancy = result["peak_count"]
@@ -184,23 +428,19 @@ def process_and_persist_validation_session(
     validation_session.processing_finished_at = datetime.utcnow()
 
     # Guardar estadísticas por frame
-    for idx, frame in enumerate(result["timeline"]):
-        stat = ValidationFrameStat(
-            validation_session_id=validation_session.id,
-            frame_index=idx,
-            timestamp_relative=frame.get("timestamp"),
-            detected_passengers=frame.get("count", 0),
-            raw_metadata_json=frame,
-        )
-        db_session.add(stat)
+    with timed(timings, "persist"):
+        for idx, frame in enumerate(result["timeline"]):
+            stat = ValidationFrameStat(
+                validation_session_id=validation_session.id,
+                frame_index=idx,
+                timestamp_relative=frame.get("timestamp"),
+                detected_passengers=frame.get("count", 0),
+                raw_metadata_json=frame,
+            )
+            db_session.add(stat)
+        # Tramos sobre capacidad / umbral para la búsqueda entre sesiones
+        index_session(db_session, validation_session, timeline_points(result["timeline"]))
 
-    db_session.add(validation_session)
-    db_session.commit()
+        db_session.add(validation_session)
+        db_session.commit()
     db_session.refresh(validation_session)
-
-    logger.info(
-        "Validation session %s completed. Processed video at %s",
-        validation_session.id,
-        validation_session.processed_video_path,
-    )
-    return validation_session
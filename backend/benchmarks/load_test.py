@@ -0,0 +1,361 @@
+"""
+Prueba de carga de la ingesta de ocupación y del dashboard.
+
+Siembra la BD con N buses y rutas, reproduce telemetría simulada de la flota
+contra ``POST /events/occupancy`` a una tasa fija (carga de lazo abierto)
+mientras consulta ``GET /dashboard/buses/state``, y reporta por endpoint:
+throughput, latencias p50/p95/p99 y consultas SQL por petición.
+
+Por defecto la app corre en el mismo proceso (httpx + ASGI) sobre un SQLite
+temporal. ``--database-url`` apunta a otra BD (p. ej. un PostgreSQL local
+dedicado, con ``--reset-db``) y ``--base-url`` a un servidor ya levantado
+(en ese caso no hay conteo de consultas).
+
+Uso (desde ``backend/``)::
+
+    python -m benchmarks.load_test --buses 50,500 --rate 200 \\
+        --dashboard-rate 5 --duration 20 --output load.json \\
+        --baseline load_prev.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+INGEST_ENDPOINT = "POST /events/occupancy"
+DASHBOARD_ENDPOINT = "GET /dashboard/buses/state"
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.queries: List[int] = []
+        self.errors = 0
+        self.max_lag = 0.0
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        from app.services.stage_timing import percentile
+
+        ordered = sorted(self.latencies)
+        total = len(ordered) + self.errors
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "throughput_rps": len(ordered) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p95_ms": percentile(ordered, 95) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            # Retraso máximo respecto al instante programado (saturación)
+            "max_schedule_lag_ms": self.max_lag * 1000,
+            "queries_per_request": (sum(self.queries) / len(self.queries)) if self.queries else None,
+            "max_queries_per_request": max(self.queries) if self.queries else None,
+        }
+
+
+class FleetSimulator:
+    """Telemetría sintética: posición y pasajeros hacen un paseo aleatorio."""
+
+    def __init__(self, buses: List[Dict[str, Any]], seed: int = 7):
+        self.rng = random.Random(seed)
+        self.buses = buses
+        self.state = {
+            bus["id"]: {
+                "lat": -12.05 + self.rng.uniform(-0.1, 0.1),
+                "lon": -77.04 + self.rng.uniform(-0.1, 0.1),
+                "passengers": self.rng.randint(0, bus["max_capacity"]),
+            }
+            for bus in buses
+        }
+
+    def next_event(self, index: int) -> Dict[str, Any]:
+        bus = self.buses[index % len(self.buses)]
+        state = self.state[bus["id"]]
+        state["lat"] += self.rng.uniform(-0.0005, 0.0005)
+        state["lon"] += self.rng.uniform(-0.0005, 0.0005)
+        boarded = self.rng.randint(0, 3)
+        alighted = min(self.rng.randint(0, 3), state["passengers"])
+        state["passengers"] = max(0, min(bus["max_capacity"], state["passengers"] + boarded - alighted))
+        return {
+            "bus_id": bus["id"],
+            "route_id": bus["route_id"],
+            "timestamp": datetime.utcnow().isoformat(),
+            "boarded": boarded,
+            "alighted": alighted,
+            "total_passengers": state["passengers"],
+            "latitude": state["lat"],
+            "longitude": state["lon"],
+            "source_id": f"loadtest-{bus['id']}",
+        }
+
+
+def seed_database(n_buses: int, n_routes: int, reset: bool) -> Dict[str, Any]:
+    from app.core.security import create_access_token, get_password_hash
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+    from app.models.bus import Bus
+    from app.models.route import Route
+    from app.models.user import User
+
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        if db.query(Bus).count():
+            raise SystemExit("La BD ya tiene buses; usa una BD dedicada con --reset-db")
+        routes = [Route(code=f"LT-R{i:03d}", name=f"Ruta de carga {i}") for i in range(n_routes)]
+        db.add_all(routes)
+        db.flush()
+        buses = [
+            Bus(
+                internal_code=f"LT-{i:05d}",
+                plate=f"LT{i:06d}",
+                max_capacity=60,
+                status="active",
+            )
+            for i in range(n_buses)
+        ]
+        db.add_all(buses)
+        user = User(
+            name="Load test",
+            email="loadtest@example.com",
+            password_hash=get_password_hash("loadtest"),
+            role="admin",
+        )
+        db.add(user)
+        db.commit()
+        return {
+            "buses": [
+                {"id": bus.id, "route_id": routes[i % n_routes].id, "max_capacity": bus.max_capacity}
+                for i, bus in enumerate(buses)
+            ],
+            "token": create_access_token(user.id),
+        }
+    finally:
+        db.close()
+
+
+def count_rows() -> Dict[str, int]:
+    from app.db.session import SessionLocal
+    from app.models.bus_state import BusState
+    from app.models.occupancy_event import OccupancyEvent
+
+    db = SessionLocal()
+    try:
+        return {
+            "occupancy_events": db.query(OccupancyEvent).count(),
+            "bus_state": db.query(BusState).count(),
+        }
+    finally:
+        db.close()
+
+
+async def _timed_request(
+    client,
+    semaphore: asyncio.Semaphore,
+    stats: EndpointStats,
+    scheduled: float,
+    method: str,
+    url: str,
+    **kwargs,
+):
+    from app.services.metrics import count_queries
+
+    delay = scheduled - time.perf_counter()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    async with semaphore:
+        started = time.perf_counter()
+        stats.max_lag = max(stats.max_lag, started - scheduled)
+        with count_queries() as counter:
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code < 400
+            except Exception:  # noqa: BLE001 - un fallo de red cuenta como error
+                ok = False
+    if not ok:
+        stats.errors += 1
+        return
+    stats.latencies.append(time.perf_counter() - started)
+    stats.queries.append(counter[0])
+
+
+async def run_load(client, seed: Dict[str, Any], args, count_queries: bool) -> Dict[str, Any]:
+    prefix = args.api_prefix
+    simulator = FleetSimulator(seed["buses"], seed=args.seed)
+    stats = {INGEST_ENDPOINT: EndpointStats(), DASHBOARD_ENDPOINT: EndpointStats()}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    headers = {"Authorization": f"Bearer {seed['token']}"}
+
+    start = time.perf_counter() + 0.1
+    tasks = []
+    for i in range(int(args.rate * args.duration)):
+        tasks.append(
+            _timed_request(
+                client,
+                semaphore,
+                stats[INGEST_ENDPOINT],
+                start + i / args.rate,
+                "POST",
+                f"{prefix}/events/occupancy",
+                json=simulator.next_event(i),
+            )
+        )
+    if args.dashboard_rate > 0:
+        for i in range(int(args.dashboard_rate * args.duration)):
+            tasks.append(
+                _timed_request(
+                    client,
+                    semaphore,
+                    stats[DASHBOARD_ENDPOINT],
+                    start + i / args.dashboard_rate,
+                    "GET",
+                    f"{prefix}/dashboard/buses/state",
+                    headers=headers,
+                )
+            )
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name, endpoint_stats in stats.items():
+        summary = endpoint_stats.summary(elapsed)
+        if not count_queries:
+            summary["queries_per_request"] = summary["max_queries_per_request"] = None
+        endpoints[name] = summary
+    return {"elapsed_s": elapsed, "endpoints": endpoints}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Diferencias relativas de throughput y p95 frente a un reporte anterior."""
+    previous = {
+        (run["buses"], name): stats
+        for run in baseline.get("runs", [])
+        for name, stats in run["endpoints"].items()
+    }
+    rows = []
+    for run in report["runs"]:
+        for name, stats in run["endpoints"].items():
+            before = previous.get((run["buses"], name))
+            if not before:
+                continue
+            row = {"buses": run["buses"], "endpoint": name}
+            for key in ("throughput_rps", "p95_ms", "p99_ms", "queries_per_request"):
+                old, new = before.get(key), stats.get(key)
+                row[key] = {
+                    "baseline": old,
+                    "current": new,
+                    "change_pct": ((new - old) / old * 100) if old and new is not None else None,
+                }
+            rows.append(row)
+    return rows
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Prueba de carga de ingesta y dashboard")
+    parser.add_argument("--buses", default="50", help="tamaños de flota, p. ej. 50,500,2000")
+    parser.add_argument("--routes", type=int, default=0, help="por defecto buses/10")
+    parser.add_argument("--rate", type=float, default=100.0, help="eventos de ocupación por segundo")
+    parser.add_argument("--dashboard-rate", type=float, default=2.0, help="consultas al dashboard por segundo")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por tamaño de flota")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", default=None, help="por defecto SQLite temporal")
+    parser.add_argument("--reset-db", action="store_true", help="borra y recrea las tablas antes de sembrar")
+    parser.add_argument("--base-url", default=None, help="servidor externo en lugar de la app en proceso")
+    parser.add_argument("--api-prefix", default=None)
+    parser.add_argument("--baseline", default=None, help="reporte JSON anterior para comparar")
+    parser.add_argument("--output", default=None, help="archivo JSON (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="cpatbus-load-")
+    reset = args.reset_db
+    if args.database_url:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = args.database_url
+    else:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+        reset = True  # BD temporal propia
+    os.environ.setdefault("MEDIA_ROOT", os.path.join(workdir, "media"))
+
+    import httpx
+
+    from app.core.config import settings
+    from app.db.session import engine
+    from app.services.metrics import instrument_engine
+
+    if args.api_prefix is None:
+        args.api_prefix = settings.API_V1_PREFIX
+    count_queries = args.base_url is None
+    if count_queries:
+        instrument_engine(engine)
+
+    runs = []
+    for n_buses in [int(v) for v in args.buses.split(",") if v.strip()]:
+        n_routes = args.routes or max(n_buses // 10, 1)
+        seed = seed_database(n_buses, n_routes, reset)
+        # Con varios tamaños de flota hay que resembrar desde cero
+        reset = True
+
+        async def _run():
+            if args.base_url:
+                client = httpx.AsyncClient(base_url=args.base_url, timeout=30.0)
+            else:
+                from app.main import app
+
+                client = httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=30.0
+                )
+            async with client:
+                return await run_load(client, seed, args, count_queries)
+
+        result = asyncio.run(_run())
+        result.update({"buses": n_buses, "routes": n_routes, "db_rows": count_rows()})
+        runs.append(result)
+        for name, stats in result["endpoints"].items():
+            print(
+                f"[load] buses={n_buses} {name}: {stats['throughput_rps']:.1f} rps, "
+                f"p95={stats['p95_ms']:.1f} ms, errors={stats['errors']}",
+                file=sys.stderr,
+            )
+
+    report: Dict[str, Any] = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": engine.dialect.name,
+            "in_process": args.base_url is None,
+        },
+        "config": {
+            "rate": args.rate,
+            "dashboard_rate": args.dashboard_rate,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+    if args.baseline:
+        with open(args.baseline) as fh:
+            report["comparison"] = compare(report, json.load(fh))
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(payload)
+    else:
+        print(payload)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Benchmark del pipeline de procesamiento de video.
+
+Genera un video sintético y ejecuta ``process_video_with_yolo`` (o
+``process_and_persist_validation_session`` con ``--persist``) para cada
+combinación de parámetros, cada una en un proceso nuevo para medir el pico
+de RSS de forma aislada. El reporte es JSON: fps, percentiles por etapa
+(decode, infer, annotate, encode, deliver, persist) y memoria.
+
+Uso (desde ``backend/``)::
+
+    python -m benchmarks.pipeline --frames 300 --width 640 --height 360 \\
+        --backends direct,scheduler --batch-sizes 1,8 --strides 1,3 \\
+        --render full,none --persist --output bench.json
+
+Por defecto usa el modelo stub (``--model stub``), que no necesita pesos;
+``--model app/model/best.pt`` mide el modelo real.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Se ejecuta en un proceso hijo: configura el entorno e importa la app."""
+    os.environ.update(job["env"])
+
+    from app.core.config import settings
+    from app.services import video_processing
+    from app.services.stage_timing import StageTimings
+
+    if job["model"] == "stub":
+        from benchmarks.stub_model import StubYOLO
+
+        video_processing.set_model(StubYOLO())
+
+    settings.INFERENCE_BATCHING_ENABLED = job["backend"] == "scheduler"
+    settings.INFERENCE_MAX_BATCH_SIZE = job["batch_size"]
+    video_processing.inference_scheduler.max_batch_size = job["batch_size"]
+    settings.TRACKING_ENABLED = job["tracking"]
+    settings.TRACKING_STRIDE = job["stride"]
+
+    # Cargar el modelo fuera de la medición
+    video_processing.get_model()
+
+    timings = StageTimings()
+    started = time.perf_counter()
+    if job["persist"]:
+        from app.db.base import Base
+        from app.db.session import SessionLocal, engine
+        from app.models.validation import ValidationSession
+
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            session = ValidationSession(max_capacity_declared=50, status="PROCESSING")
+            db.add(session)
+            db.commit()
+            db.refresh(session)
+            video_processing.process_and_persist_validation_session(
+                db, session, job["video_path"], render=job["render"], timings=timings
+            )
+            total_frames = session.total_frames
+            peak_count = session.detected_max_occupancy
+        finally:
+            db.close()
+    else:
+        result = video_processing.process_video_with_yolo(
+            job["video_path"],
+            render=job["render"],
+            tracking=job["tracking"],
+            stride=job["stride"],
+            timings=timings,
+        )
+        total_frames = result["total_frames"]
+        peak_count = result["peak_count"]
+    wall_seconds = time.perf_counter() - started
+    video_processing.inference_scheduler.stop()
+
+    return {
+        "config": {
+            key: job[key]
+            for key in ("backend", "batch_size", "stride", "tracking", "render", "persist", "model")
+        },
+        "frames": total_frames,
+        "wall_seconds": wall_seconds,
+        "fps": total_frames / wall_seconds if wall_seconds else 0.0,
+        "peak_count": peak_count,
+        "stages": timings.summary(),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _csv(value: str, cast=str) -> List[Any]:
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def build_jobs(args, video_path: str, workdir: str) -> List[Dict[str, Any]]:
+    jobs: List[Dict[str, Any]] = []
+    seen = set()
+    combos = itertools.product(
+        _csv(args.backends), _csv(args.batch_sizes, int), _csv(args.strides, int), _csv(args.render)
+    )
+    for backend, batch_size, stride, render in combos:
+        if backend not in ("direct", "scheduler"):
+            raise SystemExit(f"Backend desconocido: {backend}")
+        if render not in ("full", "none"):
+            raise SystemExit(f"Modo de render desconocido: {render}")
+        if backend == "direct":
+            batch_size = 1  # sin planificador no hay lotes
+        key = (backend, batch_size, stride, render)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        index = len(jobs)
+        env = {
+            "MEDIA_ROOT": os.path.join(workdir, "media"),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, f'bench_{index}.db')}",
+        }
+        if args.model != "stub":
+            env["YOLO_MODEL_PATH"] = args.model
+        jobs.append(
+            {
+                "env": env,
+                "model": args.model,
+                "video_path": video_path,
+                "backend": backend,
+                "batch_size": batch_size,
+                "stride": stride,
+                # stride > 1 solo tiene sentido con tracking
+                "tracking": args.tracking or stride > 1,
+                "render": render == "full",
+                "persist": args.persist,
+            }
+        )
+    return jobs
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de video")
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--passengers", type=int, default=12)
+    parser.add_argument("--backends", default="direct", help="direct,scheduler")
+    parser.add_argument("--batch-sizes", default="1", help="p. ej. 1,4,8 (solo scheduler)")
+    parser.add_argument("--strides", default="1", help="p. ej. 1,2,4 (>1 activa tracking)")
+    parser.add_argument("--render", default="full", help="full,none")
+    parser.add_argument("--tracking", action="store_true", help="tracking también con stride 1")
+    parser.add_argument("--persist", action="store_true", help="incluye la escritura en BD (SQLite)")
+    parser.add_argument("--model", default="stub", help="'stub' o ruta a pesos YOLO")
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--output", default=None, help="archivo JSON (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cpatbus-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    from benchmarks.synthetic_video import generate_synthetic_video
+
+    video_path = os.path.join(workdir, f"synthetic_{args.width}x{args.height}_{args.frames}.mp4")
+    if not os.path.exists(video_path):
+        generate_synthetic_video(
+            video_path,
+            frames=args.frames,
+            width=args.width,
+            height=args.height,
+            fps=args.fps,
+            max_passengers=args.passengers,
+        )
+
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for job in build_jobs(args, video_path, workdir):
+        with ctx.Pool(1) as pool:
+            runs.append(pool.apply(_run_job, (job,)))
+        print(
+            f"[bench] {runs[-1]['config']} -> {runs[-1]['fps']:.1f} fps",
+            file=sys.stderr,
+        )
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "video": {
+            "path": video_path,
+            "frames": args.frames,
+            "width": args.width,
+            "height": args.height,
+            "fps": args.fps,
+        },
+        "runs": runs,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(payload)
+    else:
+        print(payload)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Modelo stub con la misma interfaz que ``ultralytics.YOLO`` que usa el
+pipeline (``model(frames, imgsz=..., conf=...)`` -> resultados con
+``.boxes`` y ``.plot()``). Detecta los rectángulos claros de los videos
+sintéticos con umbral + contornos, así que corre en CI sin pesos ni torch.
+"""
+from typing import Any, List
+
+import cv2
+import numpy as np
+
+
+class _StubBox:
+    def __init__(self, xyxy, conf: float, cls: int):
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+        self.conf = np.array([conf], dtype=np.float32)
+        self.cls = np.array([cls], dtype=np.float32)
+
+
+class _StubBoxes:
+    def __init__(self, boxes: List[_StubBox]):
+        self._boxes = boxes
+        self.cls = np.array([b.cls[0] for b in boxes], dtype=np.float32)
+
+    def __iter__(self):
+        return iter(self._boxes)
+
+    def __len__(self):
+        return len(self._boxes)
+
+
+class _StubResults:
+    def __init__(self, orig_img, boxes: List[_StubBox]):
+        self.orig_img = orig_img
+        self.boxes = _StubBoxes(boxes)
+
+    def plot(self):
+        annotated = self.orig_img.copy()
+        for box in self.boxes:
+            x1, y1, x2, y2 = (int(v) for v in box.xyxy[0])
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        return annotated
+
+
+class StubYOLO:
+    def __init__(self, min_area: int = 150):
+        self.min_area = min_area
+
+    def _detect(self, frame, imgsz: int, conf: float) -> _StubResults:
+        height, width = frame.shape[:2]
+        scale = min(imgsz / max(height, width), 1.0)
+        small = cv2.resize(frame, (int(width * scale), int(height * scale))) if scale < 1.0 else frame
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h * (1 / (scale * scale)) < self.min_area:
+                continue
+            confidence = min(0.99, 0.5 + (w * h) / float(small.shape[0] * small.shape[1]) * 10)
+            if confidence < conf:
+                continue
+            boxes.append(
+                _StubBox(
+                    [x / scale, y / scale, (x + w) / scale, (y + h) / scale],
+                    confidence,
+                    0,
+                )
+            )
+        return _StubResults(frame, boxes)
+
+    def __call__(self, source: Any, imgsz: int = 640, conf: float = 0.25, verbose: bool = True, **_):
+        frames = source if isinstance(source, list) else [source]
+        return [self._detect(frame, imgsz, conf) for frame in frames]
@@ -0,0 +1,78 @@
+"""
+Genera videos sintéticos reproducibles para benchmarks: fondo tipo cabina
+con ruido y "pasajeros" (rectángulos claros) que entran, se mueven y salen.
+"""
+import os
+import random
+from dataclasses import dataclass
+from typing import List
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class _Passenger:
+    x: float
+    y: float
+    w: int
+    h: int
+    vx: float
+    vy: float
+    enter_frame: int
+    exit_frame: int
+
+
+def generate_synthetic_video(
+    path: str,
+    frames: int = 300,
+    width: int = 640,
+    height: int = 360,
+    fps: float = 25.0,
+    max_passengers: int = 12,
+    seed: int = 7,
+) -> str:
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"No se pudo crear el video sintético en {path}")
+
+    passengers: List[_Passenger] = []
+    for _ in range(max_passengers):
+        w = rng.randint(width // 20, width // 10)
+        h = int(w * rng.uniform(1.6, 2.4))
+        enter = rng.randint(0, max(frames - 1, 0))
+        passengers.append(
+            _Passenger(
+                x=rng.uniform(0, width - w),
+                y=rng.uniform(0, height - h),
+                w=w,
+                h=h,
+                vx=rng.uniform(-1.5, 1.5),
+                vy=rng.uniform(-0.8, 0.8),
+                enter_frame=enter,
+                exit_frame=min(frames, enter + rng.randint(frames // 4 + 1, frames)),
+            )
+        )
+
+    background = np.full((height, width, 3), 40, dtype=np.uint8)
+    cv2.rectangle(background, (0, 0), (width, height // 6), (70, 70, 70), -1)  # techo
+    np_rng = np.random.default_rng(seed)
+
+    try:
+        for index in range(frames):
+            frame = background.copy()
+            noise = np_rng.integers(0, 12, size=(height, width, 1), dtype=np.uint8)
+            frame += noise
+            for p in passengers:
+                if not p.enter_frame <= index < p.exit_frame:
+                    continue
+                p.x = min(max(p.x + p.vx, 0), width - p.w)
+                p.y = min(max(p.y + p.vy, 0), height - p.h)
+                x1, y1 = int(p.x), int(p.y)
+                cv2.rectangle(frame, (x1, y1), (x1 + p.w, y1 + p.h), (220, 220, 220), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
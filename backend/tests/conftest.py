@@ -0,0 +1,36 @@
+import os
+
+# Los tests corren contra SQLite; debe fijarse antes de importar app.db.session
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.db.base import Base  # noqa: E402
+from app.models.bus import Bus  # noqa: E402
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def _enable_foreign_keys(connection, _):
+        connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    """Sesiones sobre una BD en memoria con el bus 1 (capacidad 40)."""
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add(Bus(id=1, internal_code="B-1", plate="ABC-123", max_capacity=40))
+    db.commit()
+    db.close()
+    return factory
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.bus import Bus
+from app.models.bus_alert import BusAlert
+from app.services.alerts import OFFLINE, AlertEngine, persist_transitions
+
+
+def test_offline_cleared_before_its_raise_is_persisted_stays_closed():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Bus(id=1, internal_code="B-1", plate="ABC-123", max_capacity=40))
+    db.commit()
+
+    alerts = AlertEngine(stale_seconds=0)
+    alerts.load([(1, None, 40, datetime(2024, 1, 1, 8, 0))], [])
+    raised = alerts.sweep()
+    assert [t.alert.alert_type for t in raised] == [OFFLINE]
+
+    # Llega un evento y la ingesta guarda el cierre antes que el barrido guarde el alta
+    cleared = alerts.observe(1, None, 5, 40, datetime(2024, 1, 1, 8, 5))
+    persist_transitions(db, cleared)
+    persist_transitions(db, raised)
+
+    rows = db.query(BusAlert).all()
+    assert len(rows) == 1
+    assert rows[0].cleared_at == datetime(2024, 1, 1, 8, 5)
+    db.close()
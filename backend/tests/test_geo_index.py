@@ -0,0 +1,89 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from app.models.bus import Bus
+from app.models.bus_state import BusState
+from app.services.geo_index import BusPositionIndex, db_nearest, db_within_radius, haversine_km
+
+NOW = datetime(2026, 6, 1, 8, 0)
+CENTER = (-12.05, -77.04)
+
+
+@pytest.fixture
+def positions():
+    rng = random.Random(7)
+    return {
+        bus_id: (CENTER[0] + rng.uniform(-0.2, 0.2), CENTER[1] + rng.uniform(-0.2, 0.2))
+        for bus_id in range(1, 301)
+    }
+
+
+@pytest.fixture
+def index(positions):
+    index = BusPositionIndex(cell_degrees=0.01)
+    index.load((bus_id, lat, lon, NOW) for bus_id, (lat, lon) in positions.items())
+    return index
+
+
+def _brute_nearest(positions, lat, lon, k, max_km=None):
+    distances = sorted((haversine_km(lat, lon, *p), bus_id) for bus_id, p in positions.items())
+    if max_km is not None:
+        distances = [item for item in distances if item[0] <= max_km]
+    return [bus_id for _, bus_id in distances[:k]]
+
+
+def test_bbox_matches_brute_force(index, positions):
+    box = (-12.10, -77.10, -12.00, -77.00)
+    expected = {
+        bus_id for bus_id, (lat, lon) in positions.items()
+        if box[0] <= lat <= box[2] and box[1] <= lon <= box[3]
+    }
+
+    assert set(index.within_bbox(*box)) == expected
+    # Caja que cubre todo: camino que recorre solo las celdas ocupadas
+    assert set(index.within_bbox(-13, -78, -11, -76)) == set(positions)
+
+
+@pytest.mark.parametrize("point", [CENTER, (-11.90, -76.90), (-12.60, -77.04)])
+def test_nearest_matches_brute_force(index, positions, point):
+    assert [bus_id for bus_id, _ in index.nearest(*point, k=5)] == _brute_nearest(positions, *point, 5)
+    assert [bus_id for bus_id, _ in index.nearest(*point, k=5, max_km=3)] == _brute_nearest(
+        positions, *point, 5, max_km=3
+    )
+
+
+def test_radius_results_are_sorted_and_within_radius(index, positions):
+    matches = index.within_radius(*CENTER, radius_km=4)
+
+    expected = {bus_id for bus_id, p in positions.items() if haversine_km(*CENTER, *p) <= 4}
+    assert {bus_id for bus_id, _ in matches} == expected
+    assert [d for _, d in matches] == sorted(d for _, d in matches)
+
+
+def test_update_moves_bus_between_cells(index):
+    index.update(1, 10.0, 10.0, NOW)
+    assert index.nearest(10.0, 10.0, k=1)[0][0] == 1
+
+    index.update(1, None, None, NOW)
+    assert 1 not in [bus_id for bus_id, _ in index.nearest(10.0, 10.0, k=300)]
+
+
+def test_database_fallback_agrees_with_index(session_factory, index, positions):
+    db = session_factory()
+    try:
+        chosen = {bus_id: positions[bus_id] for bus_id in range(1, 41)}
+        for bus_id, (lat, lon) in chosen.items():
+            if bus_id != 1:
+                db.add(Bus(id=bus_id, internal_code=f"B-{bus_id}", plate=f"P-{bus_id}", max_capacity=40))
+            db.add(BusState(bus_id=bus_id, last_update=NOW, total_passengers=0, occupancy_level="POCA",
+                            latitude=lat, longitude=lon))
+        db.commit()
+        small = BusPositionIndex()
+        small.load((bus_id, lat, lon, NOW) for bus_id, (lat, lon) in chosen.items())
+
+        assert [b for b, _ in db_nearest(db, *CENTER, k=5)] == [b for b, _ in small.nearest(*CENTER, k=5)]
+        assert [b for b, _ in db_within_radius(db, *CENTER, 8)] == [b for b, _ in small.within_radius(*CENTER, 8)]
+    finally:
+        db.close()
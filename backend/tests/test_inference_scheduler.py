@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from app.services.inference_scheduler import PRIORITY_LIVE, PRIORITY_VALIDATION, InferenceScheduler
+
+
+@pytest.fixture
+def gated_scheduler():
+    """Planificador cuyo primer lote queda bloqueado hasta abrir la compuerta."""
+    gate = threading.Event()
+    started = threading.Event()
+    batches = []
+
+    def run_batch(frames, batch_key):
+        if not started.is_set():
+            started.set()
+            gate.wait(timeout=5)
+        else:
+            batches.append((list(frames), batch_key))
+        return frames
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=4, max_latency=0.01)
+    scheduler.submit("blocker", "warmup")
+    assert started.wait(timeout=5)
+    yield scheduler, gate, batches
+    gate.set()
+    scheduler.stop()
+
+
+def _drain(futures):
+    return [future.result(timeout=5) for future in futures]
+
+
+def test_live_frames_fill_the_batch_before_validation(gated_scheduler):
+    scheduler, gate, batches = gated_scheduler
+    futures = [scheduler.submit(f"v{i}", "validation", PRIORITY_VALIDATION) for i in range(8)]
+    futures += [scheduler.submit(f"{cam}{i}", f"live-{cam}", PRIORITY_LIVE) for i in range(2) for cam in "ab"]
+
+    gate.set()
+    _drain(futures)
+
+    assert sorted(batches[0][0]) == ["a0", "a1", "b0", "b1"]
+    assert [frame for frames, _ in batches[1:] for frame in frames] == [f"v{i}" for i in range(8)]
+
+
+def test_round_robin_between_sources_of_same_priority(gated_scheduler):
+    scheduler, gate, batches = gated_scheduler
+    futures = [scheduler.submit(f"long{i}", "long-job", PRIORITY_VALIDATION) for i in range(8)]
+    futures += [scheduler.submit(f"short{i}", "short-job", PRIORITY_VALIDATION) for i in range(2)]
+
+    gate.set()
+    _drain(futures)
+
+    first = batches[0][0]
+    assert sorted(first) == ["long0", "long1", "short0", "short1"]
+
+
+def test_frames_with_different_batch_keys_are_not_mixed(gated_scheduler):
+    scheduler, gate, batches = gated_scheduler
+    futures = [scheduler.submit(f"hd{i}", "cam-hd", PRIORITY_LIVE, batch_key=(1280, 720)) for i in range(2)]
+    futures += [scheduler.submit(f"sd{i}", "cam-sd", PRIORITY_LIVE, batch_key=(640, 480)) for i in range(2)]
+
+    gate.set()
+    _drain(futures)
+
+    for frames, key in batches:
+        assert {frame[:2] for frame in frames} == ({"hd"} if key == (1280, 720) else {"sd"})
+    assert sum(len(frames) for frames, _ in batches) == 4
@@ -0,0 +1,42 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.core.config import settings
+from app.services.media_delivery import MediaStaticFiles
+
+PAYLOAD = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "processed_videos").mkdir()
+    (tmp_path / "processed_videos" / "1_processed.mp4").write_bytes(PAYLOAD)
+    (tmp_path / "validation").mkdir()
+    (tmp_path / "validation" / "raw.mp4").write_bytes(PAYLOAD)
+    app = Starlette(routes=[Mount("/media", MediaStaticFiles(directory=str(tmp_path)))])
+    return TestClient(app)
+
+
+def test_range_request_returns_partial_content(client):
+    response = client.get("/media/processed_videos/1_processed.mp4", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.content == PAYLOAD[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(PAYLOAD)}"
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/media/processed_videos/1_processed.mp4", headers={"Range": "bytes=5000-"})
+
+    assert response.status_code == 416
+
+
+def test_public_cache_only_for_processed_videos(client):
+    processed = client.get("/media/processed_videos/1_processed.mp4")
+    raw = client.get("/media/validation/raw.mp4")
+
+    assert processed.headers["cache-control"] == f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    assert "public" not in raw.headers["cache-control"]
+    assert raw.content == PAYLOAD
@@ -0,0 +1,68 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import deps
+from app.api.endpoints import metrics as metrics_endpoints
+from app.models.user import User
+from app.services import metrics
+
+
+@pytest.fixture
+def client_as():
+    app = FastAPI()
+    app.include_router(metrics_endpoints.router)
+    previous = metrics.profiling_enabled()
+
+    def make(role: str) -> TestClient:
+        app.dependency_overrides[deps.get_current_user] = lambda: User(id=1, email="u@x", role=role)
+        return TestClient(app)
+
+    yield make
+    metrics.set_profiling(previous)
+
+
+def test_profiling_toggle_requires_admin(client_as):
+    metrics.set_profiling(False)
+
+    response = client_as("operator").put("/metrics/profiling", json={"enabled": True})
+
+    assert response.status_code == 403
+    assert metrics.profiling_enabled() is False
+
+
+def test_admin_can_toggle_profiling(client_as):
+    metrics.set_profiling(False)
+
+    response = client_as("admin").put("/metrics/profiling", json={"enabled": True})
+
+    assert response.status_code == 200
+    assert response.json() == {"enabled": True}
+    assert metrics.profiling_enabled() is True
+
+
+def test_count_queries_sees_queries_under_profiling_middleware(engine):
+    from sqlalchemy import text
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(engine)  # idempotente: no cuenta doble
+
+    def handler(request):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return PlainTextResponse("ok")
+
+    app = metrics.MetricsMiddleware(Starlette(routes=[Route("/q", handler)]))
+    previous = metrics.profiling_enabled()
+    try:
+        for enabled in (False, True):
+            metrics.set_profiling(enabled)
+            with TestClient(app) as client, metrics.count_queries() as counter:
+                client.get("/q")
+            assert counter[0] == 2
+    finally:
+        metrics.set_profiling(previous)
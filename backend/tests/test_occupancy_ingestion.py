@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, create_engine, inspect
+
+from app.db import partitioning
+from app.models.bus_state import BusState
+from app.models.occupancy_event import OccupancyEvent
+from app.schemas.occupancy import OccupancyEventIn
+from app.services import occupancy_ingestion
+from app.services.occupancy_ingestion import RecentKeyFilter, ingest_occupancy_batch, ingest_occupancy_event
+
+T0 = datetime(2024, 1, 1, 8, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def fresh_key_cache(monkeypatch):
+    cache = RecentKeyFilter(max_size=1000, ttl=3600)
+    monkeypatch.setattr(occupancy_ingestion, "recent_event_keys", cache)
+    return cache
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+def _event(seconds: float = 0, total: int = 10, **extra) -> OccupancyEventIn:
+    return OccupancyEventIn(bus_id=1, timestamp=T0 + timedelta(seconds=seconds), total_passengers=total, **extra)
+
+
+def test_retry_with_same_event_id_and_new_timestamp_is_ignored(db, fresh_key_cache):
+    assert ingest_occupancy_event(db, _event(0, event_id="evt-1")) is True
+    assert ingest_occupancy_event(db, _event(3, total=99, event_id="evt-1")) is False
+    # Sin la caché en memoria (otro proceso o reinicio) lo descarta el índice único
+    fresh_key_cache._keys.clear()
+    assert ingest_occupancy_event(db, _event(7, total=99, event_id="evt-1")) is False
+
+    assert db.query(OccupancyEvent).count() == 1
+    assert db.query(BusState).one().total_passengers == 10
+
+
+def test_source_readings_dedupe_on_timestamp(db, fresh_key_cache):
+    assert ingest_occupancy_event(db, _event(0, source_id="cam-1")) is True
+    fresh_key_cache._keys.clear()
+    assert ingest_occupancy_event(db, _event(0, source_id="cam-1")) is False
+    assert ingest_occupancy_event(db, _event(1, source_id="cam-1")) is True
+    assert db.query(OccupancyEvent).count() == 2
+
+
+def test_keyless_events_are_always_stored(db):
+    assert ingest_occupancy_event(db, _event(0)) is True
+    assert ingest_occupancy_event(db, _event(0)) is True
+    assert db.query(OccupancyEvent).count() == 2
+
+
+def test_batch_skips_duplicates_and_keeps_latest_state(db):
+    events = [
+        _event(0, total=5, event_id="a"),
+        _event(1, total=6, event_id="a"),
+        _event(2, total=7, event_id="b"),
+    ]
+    assert ingest_occupancy_batch(db, events) == 2
+    assert ingest_occupancy_batch(db, events) == 0
+    assert db.query(OccupancyEvent).count() == 2
+    assert db.query(BusState).one().total_passengers == 7
+
+
+def test_schema_upgrade_drops_timestamp_from_event_id_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    metadata = MetaData()
+    Table(
+        OccupancyEvent.__tablename__,
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("bus_id", Integer),
+        Column("route_id", Integer),
+        Column("timestamp", DateTime),
+        Column("total_passengers", Integer),
+        Column("source_id", String(100)),
+        Column("event_id", String(64)),
+        Index(partitioning.EVENT_ID_INDEX, "bus_id", "event_id", "timestamp", unique=True),
+    )
+    metadata.create_all(engine)
+
+    partitioning.ensure_occupancy_schema(engine)
+
+    indexes = {index["name"]: index for index in inspect(engine).get_indexes(OccupancyEvent.__tablename__)}
+    assert indexes[partitioning.EVENT_ID_INDEX]["column_names"] == ["bus_id", "event_id"]
+    assert indexes[partitioning.EVENT_ID_INDEX]["unique"]
@@ -0,0 +1,25 @@
+from app.models.validation import ValidationSession
+from app.services.occupancy_intervals import OVER_CAPACITY, THRESHOLD, build_intervals
+
+
+def _points():
+    # 60 s a 41 pasajeros y luego 0.2 s a 43 (10 fps)
+    points = [(i, i / 10, 41) for i in range(600)]
+    points += [(600 + i, 60.0 + i / 10, 43) for i in range(2)]
+    return points
+
+
+def test_threshold_interval_covers_only_frames_at_that_level():
+    session = ValidationSession(id=1, bus_id=7, max_capacity_declared=42)
+    intervals = build_intervals(session, _points(), max_gap=0.15)
+    by_level = {(item.kind, item.threshold): item for item in intervals}
+
+    exact = by_level[(THRESHOLD, 43)]
+    assert (exact.start_time, exact.end_time) == (60.0, 60.1)
+    assert exact.peak_count == 43
+
+    assert by_level[(THRESHOLD, 41)].start_time == 0.0
+    assert sorted(level for kind, level in by_level if kind == THRESHOLD) == list(range(1, 44))
+
+    over = by_level[(OVER_CAPACITY, 42)]
+    assert (over.start_time, over.end_time) == (60.0, 60.1)
@@ -0,0 +1,79 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.models.occupancy_event import OccupancyEvent
+from app.models.occupancy_rollup import OccupancyRollupHourly
+from app.services.occupancy_retention import run_retention
+
+NOW = datetime(2026, 6, 15, 12, 30)
+
+
+@pytest.fixture
+def db(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OCCUPANCY_ARCHIVE_DIR", str(tmp_path / "archive"))
+    db = session_factory()
+    yield db
+    db.close()
+
+
+def _event(timestamp: datetime, passengers: int, boarded: int = 0) -> OccupancyEvent:
+    return OccupancyEvent(bus_id=1, timestamp=timestamp, total_passengers=passengers, boarded=boarded, alighted=0)
+
+
+def _archived_ids(summary) -> list:
+    ids = []
+    for month in summary["months"]:
+        if month["archive"]:
+            with gzip.open(month["archive"], "rt", encoding="utf-8") as fh:
+                ids += [json.loads(line)["id"] for line in fh]
+    return ids
+
+
+def test_expired_events_are_archived_rolled_up_and_deleted(db):
+    db.add_all(
+        [
+            _event(datetime(2026, 1, 10, 8, 5), 10, boarded=3),
+            _event(datetime(2026, 1, 10, 8, 40), 20, boarded=2),
+            _event(datetime(2026, 2, 1, 9, 0), 5),
+            _event(datetime(2026, 6, 1, 9, 0), 7),  # dentro de la retención
+        ]
+    )
+    db.commit()
+
+    summary = run_retention(db, now=NOW, retention_days=90)
+
+    assert [(m["month"], m["events"]) for m in summary["months"]] == [("2026-01", 2), ("2026-02", 1), ("2026-03", 0)]
+    assert sorted(_archived_ids(summary)) == [1, 2, 3]
+    assert [e.timestamp for e in db.query(OccupancyEvent).all()] == [datetime(2026, 6, 1, 9, 0)]
+    rollup = db.query(OccupancyRollupHourly).filter_by(bucket_start=datetime(2026, 1, 10, 8)).one()
+    assert (rollup.samples, rollup.passengers_sum, rollup.passengers_max, rollup.boarded_sum) == (2, 30, 20, 5)
+
+
+def test_late_event_merges_into_existing_rollup(db):
+    db.add(_event(datetime(2026, 1, 10, 8, 5), 10, boarded=3))
+    db.commit()
+    run_retention(db, now=NOW, retention_days=90)
+
+    db.add(_event(datetime(2026, 1, 10, 8, 50), 25, boarded=1))
+    db.commit()
+    run_retention(db, now=NOW, retention_days=90)
+
+    rollup = db.query(OccupancyRollupHourly).one()
+    assert (rollup.samples, rollup.passengers_sum, rollup.passengers_max, rollup.boarded_sum) == (2, 35, 25, 4)
+    assert db.query(OccupancyEvent).count() == 0
+
+
+def test_dry_run_keeps_everything(db):
+    db.add(_event(datetime(2026, 1, 10, 8, 5), 10))
+    db.commit()
+
+    summary = run_retention(db, now=NOW, retention_days=90, dry_run=True)
+
+    assert summary["months"][0]["events"] == 1
+    assert summary["months"][0]["archive"] is None
+    assert db.query(OccupancyEvent).count() == 1
+    assert db.query(OccupancyRollupHourly).count() == 0
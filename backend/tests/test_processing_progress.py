@@ -0,0 +1,41 @@
+from app.services.processing_progress import ProgressStore
+
+
+def test_publishes_at_most_once_per_interval():
+    store = ProgressStore(ttl=600, min_interval=3600)
+    reporter = store.start("s1")
+    reporter.set_total(100)
+    version = store.get("s1")["version"]
+
+    for count in (1, 5, 3):
+        reporter.advance(count)
+
+    snapshot = store.get("s1")
+    assert snapshot["version"] == version
+    assert snapshot["frames_done"] == 0
+
+    reporter.set_status("COMPLETED")
+    snapshot = store.get("s1")
+    assert (snapshot["frames_done"], snapshot["peak_count"], snapshot["percent"]) == (3, 5, 100.0)
+    assert snapshot["version"] > version
+
+
+def test_unknown_total_has_no_percent_or_eta():
+    store = ProgressStore(ttl=600, min_interval=0)
+    reporter = store.start("s1")
+    reporter.set_total(0)
+    reporter.advance(2)
+
+    snapshot = store.get("s1")
+    assert (snapshot["total_frames"], snapshot["percent"], snapshot["eta_seconds"]) == (None, None, None)
+
+
+def test_finished_entries_are_purged_after_ttl():
+    store = ProgressStore(ttl=0, min_interval=0)
+    store.start("done").set_status("FAILED", error="boom")
+    running = store.start("running")
+
+    running.advance(1)
+
+    assert store.get("done") is None
+    assert store.get("running")["frames_done"] == 1
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.validation import ValidationModelResult, ValidationSession
+from app.services import reprocessing
+
+
+@pytest.fixture
+def db(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MEDIA_ROOT", str(tmp_path))
+    video = tmp_path / "validation" / "1" / "bus.mp4"
+    video.parent.mkdir(parents=True)
+    video.write_bytes(b"mp4")
+    db = session_factory()
+    db.add(ValidationSession(id=1, max_capacity_declared=40, original_video_path="/media/validation/1/bus.mp4"))
+    db.commit()
+    yield db
+    db.close()
+
+
+def _completed(run_id: str) -> dict:
+    return {
+        "session_id": 1,
+        "run_id": run_id,
+        "status": "COMPLETED",
+        "total_frames": 10,
+        "peak_count": 7,
+        "avg_count": 3.5,
+        "avg_confidence": 0.8,
+        "processed_video_path": None,
+    }
+
+
+def test_concurrent_run_skips_sessions_claimed_by_another(db):
+    sessions = db.query(ValidationSession).all()
+
+    first = reprocessing.plan_jobs(db, sessions, "v2", "best_v2.pt", run_id="run-a")
+    second = reprocessing.plan_jobs(db, sessions, "v2", "best_v2.pt", run_id="run-b")
+
+    assert [job["session_id"] for job in first] == [1]
+    assert second == []
+    row = db.query(ValidationModelResult).one()
+    assert (row.status, row.run_id) == ("PROCESSING", "run-a")
+
+
+def test_stale_claim_is_retaken_and_old_run_cannot_overwrite(db):
+    sessions = db.query(ValidationSession).all()
+    reprocessing.plan_jobs(db, sessions, "v2", "best_v2.pt", run_id="run-a")
+    row = db.query(ValidationModelResult).one()
+    row.processing_started_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    jobs = reprocessing.plan_jobs(db, sessions, "v2", "best_v2.pt", run_id="run-b", lease_seconds=60)
+
+    assert [job["run_id"] for job in jobs] == ["run-b"]
+    assert reprocessing._store_outcome(db, "v2", _completed("run-a")) is False
+    assert reprocessing._store_outcome(db, "v2", _completed("run-b")) is True
+    db.expire_all()
+    row = db.query(ValidationModelResult).one()
+    assert (row.status, row.run_id, row.peak_count) == ("COMPLETED", "run-b", 7)
+
+
+def test_missing_video_fails_without_job(db, tmp_path):
+    (tmp_path / "validation" / "1" / "bus.mp4").unlink()
+
+    jobs = reprocessing.plan_jobs(db, db.query(ValidationSession).all(), "v2", "best_v2.pt")
+
+    assert jobs == []
+    assert db.query(ValidationModelResult).one().status == "FAILED"
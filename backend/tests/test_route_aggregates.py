@@ -0,0 +1,74 @@
+import random
+from datetime import datetime, timedelta
+
+from app.models.bus_assignment import BusAssignment
+from app.models.route import Route
+from app.services.route_aggregates import OCCUPANCY_LEVELS, AssignmentCache, RouteAggregates
+
+T0 = datetime(2026, 6, 1, 8, 0)
+
+
+def _by_route(snapshot):
+    return {item["route_id"]: item for item in snapshot}
+
+
+def test_incremental_updates_match_full_recompute():
+    rng = random.Random(3)
+    aggregates = RouteAggregates()
+    latest = {}
+    for step in range(500):
+        bus_id = rng.randint(1, 30)
+        row = (
+            bus_id,
+            rng.choice([None, 1, 2, 3]),
+            rng.randint(0, 60),
+            40 + bus_id % 3 * 10,
+            rng.choice(OCCUPANCY_LEVELS),
+            T0 + timedelta(seconds=step),
+        )
+        aggregates.update(*row)
+        latest[bus_id] = row
+
+    recomputed = RouteAggregates()
+    recomputed.load(list(latest.values()))
+
+    assert _by_route(aggregates.snapshot()) == _by_route(recomputed.snapshot())
+
+
+def test_bus_changing_route_moves_its_contribution():
+    aggregates = RouteAggregates()
+    aggregates.update(1, 10, 30, 40, "MEDIA", T0)
+    aggregates.update(2, 10, 40, 40, "LLENA", T0)
+
+    aggregates.update(1, 20, 12, 40, "POCA", T0 + timedelta(minutes=1))
+
+    route_10, route_20 = aggregates.snapshot(10)[0], aggregates.snapshot(20)[0]
+    assert (route_10["bus_count"], route_10["total_passengers"], route_10["full_count"]) == (1, 40, 1)
+    assert route_10["load_percent"] == 100.0
+    assert (route_20["bus_count"], route_20["total_passengers"], route_20["levels"]["POCA"]) == (1, 12, 1)
+
+    aggregates.update(2, 20, 0, 40, "POCA", T0 + timedelta(minutes=2))
+    assert aggregates.snapshot(10) == []
+    assert aggregates.snapshot(20)[0]["avg_passengers"] == 6.0
+
+
+def test_assignment_cache_follows_assignment_windows(session_factory):
+    db = session_factory()
+    try:
+        db.add_all([Route(id=1, code="R1", name="Ruta 1"), Route(id=2, code="R2", name="Ruta 2")])
+        db.add_all(
+            [
+                BusAssignment(bus_id=1, route_id=1, assigned_from=T0, assigned_to=T0 + timedelta(hours=2)),
+                BusAssignment(bus_id=1, route_id=2, assigned_from=T0 + timedelta(hours=3)),
+            ]
+        )
+        db.commit()
+        cache = AssignmentCache(ttl=3600)
+
+        assert cache.resolve(db, 1, T0 - timedelta(minutes=1)) is None
+        assert cache.resolve(db, 1, T0 + timedelta(minutes=30)) == 1
+        # Fuera de la ventana cacheada se vuelve a consultar aunque no haya caducado
+        assert cache.resolve(db, 1, T0 + timedelta(hours=2, minutes=30)) is None
+        assert cache.resolve(db, 1, T0 + timedelta(hours=4)) == 2
+    finally:
+        db.close()
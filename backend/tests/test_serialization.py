@@ -0,0 +1,89 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.services import serialization
+from app.services.serialization import (
+    JSON,
+    MSGPACK,
+    PACKED_JSON,
+    PACKED_MSGPACK,
+    encode_payload,
+    negotiate_encoding,
+    negotiate_media_type,
+    pack_timeline,
+)
+
+RESULT = {
+    "total_frames": 2,
+    "timeline": [
+        {"frame": 0, "count": 1, "detections": [{"x": 1.0, "y": 2.0, "confidence": 0.9}]},
+        {"frame": 1, "count": 0, "detections": [], "time": datetime(2026, 6, 1, 8, 0)},
+    ],
+}
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, JSON),
+        ("*/*", JSON),
+        ("text/html", JSON),
+        ("application/x-msgpack", MSGPACK),
+        ("application/json;q=0.5, application/msgpack", MSGPACK),
+        (f"{PACKED_MSGPACK};q=0, {PACKED_JSON}", PACKED_JSON),
+        ("application/msgpack;q=0.8, application/json;q=0.8", MSGPACK),  # empate: gana el primero
+    ],
+)
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(accept) == expected
+
+
+def test_msgpack_not_offered_without_the_package(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+
+    assert negotiate_media_type("application/msgpack, application/json;q=0.1") == JSON
+
+
+def test_negotiate_encoding_prefers_brotli_and_respects_q0(monkeypatch):
+    assert negotiate_encoding("gzip, br") == ("br" if serialization.brotli is not None else "gzip")
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("identity") is None
+    monkeypatch.setattr(serialization, "brotli", None)
+    assert negotiate_encoding("br") is None
+
+
+def test_packed_timeline_round_trips_to_records():
+    packed = pack_timeline(RESULT)["timeline"]
+
+    columns = packed["columns"]
+    frames = [dict(zip(columns, row)) for row in packed["rows"]]
+    assert [frame["count"] for frame in frames] == [1, 0]
+    assert frames[1]["time"] == datetime(2026, 6, 1, 8, 0)
+    assert [dict(zip(packed["detection_columns"], d)) for d in frames[0]["detections"]] == RESULT["timeline"][0]["detections"]
+
+
+def test_large_payload_is_compressed_small_is_not(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_COMPRESSION_MIN_BYTES", 64)
+    large = {"values": list(range(100))}
+
+    compressed = encode_payload(large, JSON, "gzip")
+    small = encode_payload({"a": 1}, JSON, "gzip")
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(compressed.body)) == large
+    assert "content-encoding" not in small.headers
+    assert compressed.headers["vary"] == "Accept, Accept-Encoding"
+
+
+def test_msgpack_payload_decodes_to_same_data():
+    msgpack = pytest.importorskip("msgpack")
+
+    response = encode_payload(RESULT, PACKED_MSGPACK, None, packer=pack_timeline)
+
+    decoded = msgpack.unpackb(response.body)
+    assert response.media_type == PACKED_MSGPACK
+    assert decoded["timeline"]["rows"][1][-1] == "2026-06-01T08:00:00"
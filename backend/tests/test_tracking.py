@@ -0,0 +1,48 @@
+from app.services.tracking import ByteTracker, CountSmoother
+
+
+def _person(x: float, confidence: float = 0.9) -> dict:
+    return {"x": x, "y": 100.0, "width": 40.0, "height": 100.0, "confidence": confidence, "class_id": 0}
+
+
+def test_tracker_counts_only_people_seen_in_the_current_keyframe():
+    tracker = ByteTracker(frame_height=480, min_hits=2, max_age=30)
+    for frame in range(3):
+        tracks = tracker.update([_person(10), _person(200)], frame)
+    assert len(tracks) == 2
+
+    # Una persona baja: el track perdido sigue vivo para reasociarse, pero no cuenta
+    tracks = tracker.update([_person(10)], 3)
+    assert len(tracks) == 1
+    assert len(tracker.confirmed_tracks()) == 2
+    assert len(tracker.predict(4)) == 1
+
+    # Reaparece dentro de max_age: recupera su id
+    lost_id = next(t.track_id for t in tracker.confirmed_tracks() if t.last_frame == 2)
+    tracks = tracker.update([_person(10), _person(200)], 5)
+    assert sorted(t.track_id for t in tracks) == sorted([1, lost_id])
+
+
+def test_tentative_tracks_do_not_count_until_confirmed():
+    tracker = ByteTracker(frame_height=480, min_hits=3)
+    assert tracker.update([_person(10)], 0) == []
+    assert tracker.update([_person(10)], 1) == []
+    assert len(tracker.update([_person(10)], 2)) == 1
+
+
+def test_low_confidence_detection_keeps_an_occluded_track():
+    tracker = ByteTracker(frame_height=480, min_hits=1, high_conf=0.5)
+    tracker.update([_person(10)], 0)
+    tracks = tracker.update([_person(12, confidence=0.2)], 1)
+    assert [t.track_id for t in tracks] == [1]
+    # Una baja confianza sola no abre tracks nuevos
+    assert tracker.update([_person(300, confidence=0.2)], 2) == []
+
+
+def test_smoother_methods():
+    median = CountSmoother(window=3, method="median")
+    assert [median.update(v) for v in (5, 5, 20, 5, 5)] == [5, 5, 5, 5, 5]
+    ema = CountSmoother(method="ema", alpha=0.5)
+    assert [ema.update(v) for v in (10, 0, 0)] == [10, 5, 2]
+    none = CountSmoother(method="none")
+    assert [none.update(v) for v in (3, 9)] == [3, 9]
@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+import pytest
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.services.uploads import MultipartUploadError, UploadTooLargeError, receive_multipart_upload
+
+BOUNDARY = b"BOUNDARY"
+
+
+def _request(body: bytes, chunk_size: int = 7) -> Request:
+    messages = [
+        {"type": "http.request", "body": body[i:i + chunk_size], "more_body": True}
+        for i in range(0, len(body), chunk_size)
+    ]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)],
+    }
+    return Request(scope, receive)
+
+
+def _body(payload: bytes, filename: str = "bus.mp4") -> bytes:
+    return (
+        b"--" + BOUNDARY + b'\r\nContent-Disposition: form-data; name="file"; filename="'
+        + filename.encode() + b'"\r\nContent-Type: video/mp4\r\n\r\n' + payload
+        + b"\r\n--" + BOUNDARY + b'\r\nContent-Disposition: form-data; name="max_capacity"\r\n\r\n42\r\n--'
+        + BOUNDARY + b"--\r\n"
+    )
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path / "tmp"))
+    return tmp_path / "media", tmp_path / "tmp"
+
+
+def _receive(request, media, **kwargs):
+    return asyncio.run(
+        receive_multipart_upload(request, lambda name: os.path.join(media, os.path.basename(name)), **kwargs)
+    )
+
+
+def test_file_is_streamed_to_destination_with_form_fields(dirs):
+    media, tmp = dirs
+    payload = os.urandom(5000)
+    upload = _receive(_request(_body(payload)), media)
+    assert open(upload.path, "rb").read() == payload
+    assert (upload.filename, upload.size, upload.fields) == ("bus.mp4", 5000, {"max_capacity": "42"})
+    assert os.listdir(media) == ["bus.mp4"]
+    assert os.listdir(tmp) == []
+
+
+def test_limit_is_enforced_while_streaming(dirs):
+    media, tmp = dirs
+    with pytest.raises(UploadTooLargeError):
+        _receive(_request(_body(os.urandom(5000))), media, max_bytes=1000)
+    assert not media.exists() or os.listdir(media) == []
+    assert os.listdir(tmp) == []
+
+
+def test_truncated_body_leaves_nothing_behind(dirs):
+    media, tmp = dirs
+    with pytest.raises(MultipartUploadError):
+        _receive(_request(_body(os.urandom(5000))[:3000]), media)
+    assert not media.exists() or os.listdir(media) == []
+    assert os.listdir(tmp) == []
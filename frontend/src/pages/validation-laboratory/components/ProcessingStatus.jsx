@@ -6,6 +6,8 @@ const ProcessingStatus = ({
   progress = 0, 
   stage = 'Preparando análisis...', 
   estimatedTime = null,
+  framesDone = null,
+  peakCount = null,
   onCancel 
 }) => {
   const formatTime = (seconds) => {
@@ -108,15 +110,15 @@ const ProcessingStatus = ({
         <div className="grid grid-cols-2 gap-4 pt-4 border-t border-border">
           <div className="text-center">
             <div className="text-lg font-semibold text-foreground">
-              {Math.round(progress * 0.8)}
+              {framesDone ?? 0}
             </div>
             <div className="text-xs text-muted-foreground">Frames procesados</div>
           </div>
           <div className="text-center">
             <div className="text-lg font-semibold text-foreground">
-              {Math.round(progress * 0.3)}
+              {peakCount ?? 0}
             </div>
-            <div className="text-xs text-muted-foreground">Personas detectadas</div>
+            <div className="text-xs text-muted-foreground">Pico de personas detectadas</div>
           </div>
         </div>
       </div>
@@ -154,7 +154,9 @@ const VideoUploadZone = ({
               </p>
               <p className="text-xs text-muted-foreground">
                 {processingPhase === 'processing'
-                  ? `Tiempo estimado: ${formatCountdown(processingCountdown ?? 180)}`
+                  ? processingCountdown != null
+                    ? `Tiempo estimado: ${formatCountdown(processingCountdown)}`
+                    : 'Calculando tiempo estimado...'
                   : 'Analizando contenido para detección de pasajeros'}
               </p>
             </div>
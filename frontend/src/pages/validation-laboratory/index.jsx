@@ -7,7 +7,13 @@ import ConfigurationPanel from './components/ConfigurationPanel';
 import ProcessingStatus from './components/ProcessingStatus';
 import ValidationSessionsTable from './components/ValidationSessionsTable';
 import useValidationSessions from '../../hooks/useValidationSessions';
-import { createValidationSession, exportValidationReport, getValidationSession, uploadSessionVideo } from '../../services/validation';
+import {
+  createValidationSession,
+  exportValidationReport,
+  getValidationProgress,
+  getValidationSession,
+  uploadSessionVideoChunked,
+} from '../../services/validation';
 
 const ValidationLaboratory = () => {
   const navigate = useNavigate();
@@ -16,12 +22,11 @@ const ValidationLaboratory = () => {
   const [processingStage, setProcessingStage] = useState('');
   const [estimatedTime, setEstimatedTime] = useState(null);
   const [processingPhase, setProcessingPhase] = useState('idle');
-  const [processingCountdown, setProcessingCountdown] = useState(180);
+  const [processingCountdown, setProcessingCountdown] = useState(null);
+  const [processingStats, setProcessingStats] = useState(null);
   const [currentFile, setCurrentFile] = useState(null);
   const [activeSessionId, setActiveSessionId] = useState(null);
   const [toast, setToast] = useState(null);
-  const processingIntervalRef = useRef(null);
-  const countdownIntervalRef = useRef(null);
   const statusPollingRef = useRef(null);
   const completionTimeoutRef = useRef(null);
   const {
@@ -46,14 +51,6 @@ const ValidationLaboratory = () => {
   });
 
   const clearProcessingIntervals = () => {
-    if (processingIntervalRef.current) {
-      clearInterval(processingIntervalRef.current);
-      processingIntervalRef.current = null;
-    }
-    if (countdownIntervalRef.current) {
-      clearInterval(countdownIntervalRef.current);
-      countdownIntervalRef.current = null;
-    }
     if (statusPollingRef.current) {
       clearInterval(statusPollingRef.current);
       statusPollingRef.current = null;
@@ -77,8 +74,13 @@ const ValidationLaboratory = () => {
       setProcessingStage('Subiendo video al servidor...');
       setProcessingProgress(10);
       setIsProcessing(true);
-  
-      await uploadSessionVideo(session.id, file);
+
+      // El backend procesa al finalizar la subida: el progreso real se consulta en paralelo
+      startSessionPolling(session.id);
+
+      await uploadSessionVideoChunked(session.id, file, {
+        onProgress: (ratio) => setProcessingProgress(10 + Math.round(ratio * 10)),
+      });
       await refreshSessions();
 
       return session.id;
@@ -106,7 +108,6 @@ const ValidationLaboratory = () => {
     const sessionId = await createAndUploadValidationSession(file, configuration.maxCapacity);
     if (sessionId) {
       setActiveSessionId(sessionId);
-      startProcessing(sessionId);
     } else {
       setIsProcessing(false);
       setProcessingPhase('idle');
@@ -119,27 +120,6 @@ const ValidationLaboratory = () => {
     setTimeout(() => setToast(null), 4000);
   };
 
-  const startCountdown = (initialSeconds = 180) => {
-    if (countdownIntervalRef.current) {
-      clearInterval(countdownIntervalRef.current);
-    }
-
-    setProcessingCountdown(initialSeconds);
-    setEstimatedTime(initialSeconds);
-
-    countdownIntervalRef.current = setInterval(() => {
-      setProcessingCountdown((prev) => {
-        const next = Math.max(prev - 1, 0);
-        setEstimatedTime(next);
-        if (next === 0 && countdownIntervalRef.current) {
-          clearInterval(countdownIntervalRef.current);
-          countdownIntervalRef.current = null;
-        }
-        return next;
-      });
-    }, 1000);
-  };
-
   const handleProcessingCompleted = (sessionId, latestSession) => {
     clearProcessingIntervals();
     setProcessingPhase('completed');
@@ -168,29 +148,62 @@ const ValidationLaboratory = () => {
       setProcessingProgress(0);
       setProcessingStage('');
       setEstimatedTime(null);
-      setProcessingCountdown(180);
+      setProcessingCountdown(null);
+      setProcessingStats(null);
     }, 2500);
   };
 
+  const applyProgress = (progress) => {
+    if (progress?.status === 'PROCESSING') {
+      setProcessingPhase('processing');
+      const percent = progress?.percent ?? 0;
+      // 20% para la subida, 75% para los frames y el resto para guardar resultados
+      setProcessingProgress(20 + Math.round(percent * 0.75));
+      const framesLabel = progress?.total_frames
+        ? `${progress.frames_done} de ${progress.total_frames}`
+        : `${progress?.frames_done ?? 0}`;
+      const fpsLabel = progress?.fps ? ` (${progress.fps.toFixed(1)} fps)` : '';
+      setProcessingStage(`Analizando fotogramas: ${framesLabel}${fpsLabel}`);
+      const eta = progress?.eta_seconds != null ? Math.round(progress.eta_seconds) : null;
+      setEstimatedTime(eta);
+      setProcessingCountdown(eta);
+    } else if (progress?.status === 'PERSISTING') {
+      setProcessingPhase('processing');
+      setProcessingProgress(95);
+      setProcessingStage('Guardando métricas y resultados...');
+      setEstimatedTime(null);
+      setProcessingCountdown(0);
+    }
+    setProcessingStats({
+      framesDone: progress?.frames_done ?? 0,
+      peakCount: progress?.peak_count ?? 0,
+    });
+  };
+
+  // Consulta el endpoint ligero de progreso (no la sesión completa)
   const startSessionPolling = (sessionId) => {
     if (!sessionId) return;
 
     const checkStatus = async () => {
       try {
-        const session = await getValidationSession(sessionId);
-        const status = session?.status?.toLowerCase?.();
-        if (status === 'completed') {
+        const progress = await getValidationProgress(sessionId);
+        const status = progress?.status;
+        if (status === 'COMPLETED') {
+          clearProcessingIntervals();
+          const session = await getValidationSession(sessionId);
           handleProcessingCompleted(sessionId, session);
-        } else if (status === 'failed') {
+        } else if (status === 'FAILED') {
           clearProcessingIntervals();
           setIsProcessing(false);
           setProcessingPhase('idle');
           setProcessingStage('');
+          setProcessingStats(null);
           showToast('Hubo un error procesando el video. Inténtalo nuevamente.', 'error');
+        } else if (status !== 'PENDING') {
+          applyProgress(progress);
         }
       } catch (error) {
-        console.error('Error verificando estado de la sesión', error);
-        showToast('No se pudo verificar el estado de la sesión.', 'error');
+        console.error('Error verificando el progreso de la sesión', error);
       }
     };
 
@@ -200,39 +213,7 @@ const ValidationLaboratory = () => {
       clearInterval(statusPollingRef.current);
     }
 
-    statusPollingRef.current = setInterval(checkStatus, 3000);
-  };
-
-  const startProcessing = (sessionId) => {
-    setIsProcessing(true);
-    setProcessingPhase('processing');
-    setProcessingProgress((prev) => (prev < 20 ? 20 : prev));
-    setProcessingStage('El video se está procesando... Tiempo estimado: 3:00 min');
-
-    startCountdown(180);
-
-    const stages = [
-      { progress: 30, stage: 'Analizando fotogramas del video...', time: 150 },
-      { progress: 55, stage: 'Aplicando algoritmos de detección...', time: 120 },
-      { progress: 75, stage: 'Contando personas detectadas...', time: 90 },
-      { progress: 90, stage: 'Generando métricas y reportes...', time: 45 },
-    ];
-
-    let currentStageIndex = 0;
-    if (processingIntervalRef.current) {
-      clearInterval(processingIntervalRef.current);
-    }
-
-    processingIntervalRef.current = setInterval(() => {
-      if (currentStageIndex < stages?.length) {
-        const stage = stages?.[currentStageIndex];
-        setProcessingProgress(stage?.progress);
-        setProcessingStage(stage?.stage);
-        currentStageIndex++;
-      }
-    }, 2500);
-
-    startSessionPolling(sessionId);
+    statusPollingRef.current = setInterval(checkStatus, 1000);
   };
 
   // Merge de configuración (lo que ya tenías mejorado)
@@ -250,7 +231,8 @@ const ValidationLaboratory = () => {
     setProcessingStage('');
     setEstimatedTime(null);
     setProcessingPhase('idle');
-    setProcessingCountdown(180);
+    setProcessingCountdown(null);
+    setProcessingStats(null);
     clearProcessingIntervals();
   };
 
@@ -427,6 +409,8 @@ const ValidationLaboratory = () => {
               progress={processingProgress}
               stage={processingStage}
               estimatedTime={estimatedTime}
+              framesDone={processingStats?.framesDone}
+              peakCount={processingStats?.peakCount}
               onCancel={handleCancelProcessing}
             />
           )}
@@ -43,6 +43,72 @@ export const uploadSessionVideo = async (sessionId, file) => {
   return response.data;
 };
 
+// Progreso en vivo del procesamiento (no carga la sesión completa)
+export const getValidationProgress = async (sessionId) => {
+  const response = await apiClient.get(`/validation/sessions/${sessionId}/progress`);
+  return response.data;
+};
+
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const CHUNK_MAX_RETRIES = 5;
+
+const sha256Hex = async (blob) => {
+  const buffer = await blob.arrayBuffer();
+  const digest = await crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Subida reanudable: solo se reenvían las partes que el servidor no tiene.
+export const uploadSessionVideoChunked = async (sessionId, file, { onProgress, uploadId } = {}) => {
+  let status;
+  if (uploadId) {
+    const response = await apiClient.get(`/validation/sessions/${sessionId}/uploads/${uploadId}`);
+    status = response.data;
+  } else {
+    const response = await apiClient.post(`/validation/sessions/${sessionId}/uploads`, {
+      filename: file.name,
+      total_size: file.size,
+      chunk_size: CHUNK_SIZE,
+    });
+    status = response.data;
+  }
+
+  for (const index of status.missing_chunks) {
+    const start = index * status.chunk_size;
+    const chunk = file.slice(start, Math.min(start + status.chunk_size, file.size));
+    const checksum = await sha256Hex(chunk);
+
+    for (let attempt = 0; ; attempt++) {
+      try {
+        const response = await apiClient.put(
+          `/validation/sessions/${sessionId}/uploads/${status.upload_id}/chunks/${index}`,
+          chunk,
+          {
+            headers: {
+              'Content-Type': 'application/octet-stream',
+              'X-Chunk-SHA256': checksum,
+            },
+          },
+        );
+        onProgress?.(response.data.received_bytes / response.data.total_size, status.upload_id);
+        break;
+      } catch (error) {
+        if (attempt >= CHUNK_MAX_RETRIES || error?.response?.status === 404) throw error;
+        await wait(Math.min(1000 * 2 ** attempt, 15000));
+      }
+    }
+  }
+
+  const response = await apiClient.post(
+    `/validation/sessions/${sessionId}/uploads/${status.upload_id}/finalize`,
+  );
+  return response.data;
+};
+
 export const getValidationSession = async (sessionId) => {
   const response = await apiClient.get(`/validation/sessions/${sessionId}`);
   return response.data;